@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Scan Logging Benchmark
+Per-cycle cost of turning a synthetic feed into flight dicts with the old
+print-every-aircraft scanner output against level-gated logging, with and
+without the sampled payload debug channel
+
+Run from milspot_bot/:  python3 -m benchmarks.bench_logging --size 20000
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+from benchmarks.synthetic import TrafficGenerator, scratch_state
+from core.scanner import FlightScanner, payload_logger
+
+
+def legacy_get_flightradar24_api_data(data: Dict) -> List[Dict]:
+    """Original FlightScanner.get_flightradar24_api_data output, minus the request itself"""
+    print(f"API Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+    flights = []
+    if isinstance(data, dict):
+        print(f"Top-level keys: {list(data.keys())}")
+        if 'data' in data and isinstance(data['data'], list):
+            for aircraft in data['data']:
+                print(f"Aircraft entry: {aircraft}")
+                flight = FlightScanner._parse_api_aircraft(aircraft)
+                if flight:
+                    flights.append(flight)
+        else:
+            print(f"No 'data' key with a list value found in API response. Full response: {json.dumps(data)[:500]}")
+    print(f"API processed {len(flights)} flights")
+    return flights
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scanner logging cost per cycle")
+    parser.add_argument('--size', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample', type=float, default=0.01, help="payload channel share for the sampled run")
+    parser.add_argument('--sink', default=os.devnull,
+                        help="where stdout and log output go (default: /dev/null, i.e. formatting cost only)")
+    parser.add_argument('--output', metavar='FILE', help="also write the results as JSON")
+    args = parser.parse_args()
+
+    payload = TrafficGenerator().payload(args.size)
+
+    with scratch_state(), open(args.sink, 'w', encoding='utf-8') as sink:
+        scanner = FlightScanner()
+        scanner.fetch_flightradar24_api_payload = lambda bounds=None: payload
+
+        # Same handler setup as run_bot.py, pointed at the sink
+        root = logging.getLogger()
+        root.handlers[:] = [logging.StreamHandler(sink)]
+        root.handlers[0].setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+        root.setLevel(logging.INFO)
+
+        with contextlib.redirect_stdout(sink):
+            before = best_of(lambda: legacy_get_flightradar24_api_data(payload), args.repeat)
+
+        scanner.payload_sample = 0.0
+        after = best_of(scanner.get_flightradar24_api_data, args.repeat)
+
+        scanner.payload_sample = args.sample
+        payload_logger.setLevel(logging.DEBUG)
+        sampled = best_of(scanner.get_flightradar24_api_data, args.repeat)
+        payload_logger.setLevel(logging.NOTSET)
+
+    results = {
+        'benchmark': 'logging',
+        'size': args.size,
+        'sink': args.sink,
+        'print_every_aircraft_ms': round(before * 1000, 2),
+        'level_gated_ms': round(after * 1000, 2),
+        'payload_sampled_ms': round(sampled * 1000, 2),
+        'payload_sample': args.sample,
+        'speedup': round(before / after, 1),
+    }
+    print(f"{args.size} aircraft per cycle, output to {args.sink}")
+    print(f"  print every aircraft   {results['print_every_aircraft_ms']:9.1f} ms")
+    print(f"  level-gated logging    {results['level_gated_ms']:9.1f} ms  ({results['speedup']}x)")
+    print(f"  {f'+ {args.sample:.0%} payload sampling':22s} {results['payload_sampled_ms']:9.1f} ms")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Runs synthetic 1k/20k/100k-aircraft feeds through the parse, classify, score,
+analyze and format stages and reports throughput, latency percentiles and
+memory as JSON. Memory is the process-wide RSS high-water mark, so each stage's
+figure is cumulative (never below the stages before it); rss_growth_mb is how
+far that stage pushed the mark up
+
+Run from milspot_bot/:
+    python3 -m benchmarks.bench_pipeline --output results.json
+    python3 -m benchmarks.bench_pipeline --baseline results.json   # exit 1 on regressions
+"""
+
+import argparse
+import json
+import logging
+import math
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from benchmarks.synthetic import MILITARY_SHARE, SIZES, TrafficGenerator, scratch_state
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far; only ever rises"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict:
+    """
+    Time repeat runs of one stage; the first run is reported as cold (rule
+    caches empty), percentiles cover the warm runs
+    """
+    rss_before = peak_rss_mb()
+    runs = []
+    result = None
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    warm = sorted(runs[1:]) or runs
+    rss_after = peak_rss_mb()
+    return {
+        'result': result,
+        'cold_ms': round(runs[0] * 1000, 3),
+        'p50_ms': round(percentile(warm, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(warm, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(warm, 0.99) * 1000, 3),
+        'min_ms': round(warm[0] * 1000, 3),
+        'max_ms': round(warm[-1] * 1000, 3),
+        'max_rss_so_far_mb': rss_after,
+        'rss_growth_mb': None if rss_before is None else round(rss_after - rss_before, 1),
+    }
+
+
+def item_latencies(fn: Callable[[Dict], object], items: List[Dict]) -> Dict:
+    """Per-flight latency percentiles from one individually timed pass"""
+    clock = time.perf_counter
+    samples = []
+    for item in items:
+        start = clock()
+        fn(item)
+        samples.append(clock() - start)
+    samples.sort()
+    return {
+        'item_p50_us': round(percentile(samples, 0.50) * 1e6, 2),
+        'item_p99_us': round(percentile(samples, 0.99) * 1e6, 2),
+        'item_max_us': round(samples[-1] * 1e6, 2) if samples else 0.0,
+    }
+
+
+def bench_size(size: int, military_share: float, repeat: int, seed: int) -> Dict:
+    """All stages for one feed size, against throwaway state files"""
+    from core.rules import get_rule_engine
+
+    body = TrafficGenerator(military_share, seed).body(size)
+
+    # Empty the memoized rule evaluations so cold numbers mean something for every size
+    get_rule_engine().current.identity.cache_clear()
+    with scratch_state():
+        return _bench_stages(size, body, repeat)
+
+
+def _bench_stages(size: int, body: bytes, repeat: int) -> Dict:
+    """Stage timings for one payload, with the scanner's state kept in the scratch directory"""
+    from core.columnar import FlightBatch
+    from core.flight_analyzer import FlightAnalyzer
+    from core.scanner import FlightScanner
+    from core.scoring import FlightScorer
+    from core.whatsapp_sender import DryRunSender
+
+    scanner = FlightScanner()
+    scorer = FlightScorer()
+    analyzer = FlightAnalyzer()
+    sender = DryRunSender()
+    parse_aircraft = FlightScanner._parse_api_aircraft
+
+    def parse():
+        return [flight for flight in map(parse_aircraft, json.loads(body)['data']) if flight]
+
+    def parse_columnar():
+        return FlightBatch.from_api_payload(json.loads(body))
+
+    stages = {}
+    stages['parse'] = measure(parse, repeat)
+    flights = stages['parse']['result']
+    stages['parse_columnar'] = measure(parse_columnar, repeat)
+
+    is_military_flight = scanner.is_military_flight
+    stages['classify'] = measure(lambda: [f for f in flights if is_military_flight(f)], repeat)
+    military = stages['classify']['result']
+
+    score_flight = scorer.score_flight
+    stages['score'] = measure(lambda: [score_flight(f) for f in military], repeat)
+    scores = stages['score']['result']
+
+    summarize = analyzer.generate_intelligence_summary
+    stages['analyze'] = measure(lambda: [summarize(f, s) for f, s in zip(military, scores)], repeat)
+    summaries = stages['analyze']['result']
+
+    def format_messages():
+        sender.sent.clear()
+        for flight, summary in zip(military, summaries):
+            sender.send_flight_notification(flight, f"https://www.flightradar24.com/{flight.callsign}", summary)
+        return len(sender.sent)
+
+    stages['format'] = measure(format_messages, repeat)
+
+    counts = {'parse': size, 'parse_columnar': size, 'classify': len(flights),
+              'score': len(military), 'analyze': len(military), 'format': len(military)}
+    per_item = {
+        'classify': item_latencies(is_military_flight, flights),
+        'score': item_latencies(score_flight, military),
+        'analyze': item_latencies(lambda f: summarize(f, 0), military),
+    }
+    for name, stage in stages.items():
+        del stage['result']
+        stage['items'] = counts[name]
+        stage['items_per_second'] = round(counts[name] / (stage['p50_ms'] / 1000)) if stage['p50_ms'] else None
+        stage.update(per_item.get(name, {}))
+    if scanner.metadata is not None:
+        scanner.metadata.close()
+    return {
+        'size': size,
+        'military': len(military),
+        'payload_bytes': len(body),
+        'stages': stages,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Stages whose warm p50 is more than tolerance slower than the baseline run"""
+    previous = {(run['size'], name): stage['p50_ms']
+                for run in baseline.get('runs', []) for name, stage in run['stages'].items()}
+    regressions = []
+    for run in results['runs']:
+        for name, stage in run['stages'].items():
+            before = previous.get((run['size'], name))
+            if before and stage['p50_ms'] > before * (1 + tolerance):
+                regressions.append(f"{run['size']:>7} {name:15s} p50 {before:.2f} -> {stage['p50_ms']:.2f} ms "
+                                   f"(+{(stage['p50_ms'] / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict):
+    print(f"{'size':>7} {'stage':15s} {'items':>7} {'cold ms':>9} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'items/s':>11} {'item p99 us':>11} {'max RSS so far MB':>17}")
+    for run in results['runs']:
+        for name, stage in run['stages'].items():
+            item_p99 = stage.get('item_p99_us')
+            print(f"{run['size']:>7} {name:15s} {stage['items']:>7} {stage['cold_ms']:>9.2f} {stage['p50_ms']:>9.2f} "
+                  f"{stage['p99_ms']:>9.2f} {stage['items_per_second'] or 0:>11,} "
+                  f"{'' if item_p99 is None else f'{item_p99:.2f}':>11} {stage['max_rss_so_far_mb'] or 0:>17.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic traffic")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--military-share', type=float, default=MILITARY_SHARE)
+    parser.add_argument('--repeat', type=int, default=5, help="warm runs per stage")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON ('-' for stdout)")
+    parser.add_argument('--baseline', metavar='FILE', help="earlier --output to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed p50 slowdown against the baseline (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Keep the scanner's per-request chatter and the dry-run sender's logging out of the timings
+    logging.disable(logging.INFO)
+
+    results = {
+        'benchmark': 'pipeline',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'military_share': args.military_share,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'runs': [bench_size(size, args.military_share, args.repeat, args.seed) for size in args.sizes],
+    }
+
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_table(results)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No stage slower than baseline by more than {args.tolerance:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Sharded Classification Benchmark
+Times decode + parse + classify of one flight-positions body in-process and
+across 1..N shard workers, checks every run finds the same military rows in
+the same order, and reports the speed-up per worker count
+
+Run from milspot_bot/:  python3 -m benchmarks.bench_sharding --sizes 20000 100000 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import List, Tuple
+from benchmarks.synthetic import TrafficGenerator
+from core.columnar import FlightBatch
+from core.rules import get_rule_engine
+from core.sharding import ShardedClassifier
+
+
+def rows(batch: FlightBatch) -> List[Tuple]:
+    return [(batch.ids[i], batch.callsign[i], batch.registration[i], float(batch.lat[i]), float(batch.lon[i]))
+            for i in range(len(batch))]
+
+
+def serial(body: bytes, classifier) -> FlightBatch:
+    batch = FlightBatch.from_api_payload(json.loads(body))
+    return batch.filter(batch.military_mask(classifier)).compact()
+
+
+def timed(fn, repeat: int) -> Tuple[float, object]:
+    """Median wall-clock seconds over repeat calls, and the last result"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process vs sharded decode/parse/classify")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20000, 100000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = get_rule_engine()
+    classifier = engine.current.classifier
+    print(f"{os.cpu_count()} CPU(s) available")
+    print(f"{'size':>7} {'workers':>8} {'p50 ms':>9} {'speed-up':>9} {'military':>9}  identical")
+    for size in args.sizes:
+        body = json.dumps(TrafficGenerator(seed=args.seed).payload(size), separators=(',', ':')).encode('utf-8')
+        baseline, expected = timed(lambda: serial(body, classifier), args.repeat)
+        expected = rows(expected)
+        print(f"{size:>7} {'serial':>8} {baseline * 1000:>9.1f} {1.0:>8.2f}x {len(expected):>9}  -")
+        for workers in args.workers:
+            pool = ShardedClassifier(workers, engine, min_bytes=0)
+            pool.warm()
+            try:
+                # A single worker does the serial work plus the hand-off, which is the overhead measured
+                elapsed, result = timed(lambda: pool.classify(body), args.repeat)
+            finally:
+                pool.close()
+            found = rows(result.batch.filter(result.mask))
+            print(f"{size:>7} {workers:>8} {elapsed * 1000:>9.1f} {baseline / elapsed:>8.2f}x {len(found):>9}  "
+                  f"{'yes' if found == expected else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
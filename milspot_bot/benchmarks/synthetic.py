@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Synthetic Global Traffic
+Generates FR24 live flight-positions payloads of any size: airline traffic
+spread around the world's hubs plus a configurable share of military aircraft
+drawn from the rules file, clustered over the areas the analyzer watches
+
+Write replayable snapshots from milspot_bot/:
+    python3 -m benchmarks.synthetic --size 20000 --snapshots snapshots/ --count 10
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+from config import Config
+
+SIZES = (1000, 20000, 100000)
+MILITARY_SHARE = 0.02
+
+# (lat, lon, IATA, ICAO) of busy hubs; airline traffic is spread around them
+HUBS = [
+    (33.64, -84.43, 'ATL', 'KATL'), (41.98, -87.90, 'ORD', 'KORD'), (32.90, -97.04, 'DFW', 'KDFW'),
+    (33.94, -118.41, 'LAX', 'KLAX'), (40.64, -73.78, 'JFK', 'KJFK'), (39.86, -104.67, 'DEN', 'KDEN'),
+    (51.47, -0.45, 'LHR', 'EGLL'), (49.01, 2.55, 'CDG', 'LFPG'), (50.03, 8.57, 'FRA', 'EDDF'),
+    (52.31, 4.76, 'AMS', 'EHAM'), (40.47, -3.56, 'MAD', 'LEMD'), (41.28, 28.75, 'IST', 'LTFM'),
+    (25.25, 55.36, 'DXB', 'OMDB'), (25.27, 51.61, 'DOH', 'OTHH'), (28.56, 77.10, 'DEL', 'VIDP'),
+    (1.36, 103.99, 'SIN', 'WSSS'), (22.31, 113.91, 'HKG', 'VHHH'), (31.14, 121.81, 'PVG', 'ZSPD'),
+    (40.08, 116.58, 'PEK', 'ZBAA'), (35.55, 139.78, 'HND', 'RJTT'), (37.46, 126.44, 'ICN', 'RKSI'),
+    (-33.94, 151.18, 'SYD', 'YSSY'), (-23.43, -46.47, 'GRU', 'SBGR'), (19.44, -99.07, 'MEX', 'MMMX'),
+    (-26.14, 28.24, 'JNB', 'FAJS'), (55.97, 37.41, 'SVO', 'UUEE'), (43.68, -79.63, 'YYZ', 'CYYZ'),
+]
+
+# (lat_min, lat_max, lon_min, lon_max) where military traffic concentrates
+MILITARY_AREAS = [
+    (55, 65, 15, 30),     # Baltic
+    (40, 50, 25, 40),     # Black Sea
+    (45, 55, 15, 30),     # Eastern Europe
+    (30, 45, 5, 25),      # Mediterranean
+    (25, 40, 30, 60),     # Middle East
+    (10, 25, 110, 120),   # South China Sea
+    (30, 40, 120, 135),   # East China Sea / Korea
+    (35, 45, -125, -70),  # Continental US
+    (50, 58, -5, 5),      # UK
+]
+
+AIRLINES = [
+    ('UAL', 'UA', 'UNITED AIRLINES'), ('DAL', 'DL', 'DELTA AIR LINES'), ('AAL', 'AA', 'AMERICAN AIRLINES'),
+    ('SWA', 'WN', 'SOUTHWEST AIRLINES'), ('BAW', 'BA', 'BRITISH AIRWAYS'), ('DLH', 'LH', 'LUFTHANSA'),
+    ('AFR', 'AF', 'AIR FRANCE'), ('KLM', 'KL', 'KLM'), ('RYR', 'FR', 'RYANAIR'), ('EZY', 'U2', 'EASYJET'),
+    ('UAE', 'EK', 'EMIRATES'), ('QTR', 'QR', 'QATAR AIRWAYS'), ('THY', 'TK', 'TURKISH AIRLINES'),
+    ('CPA', 'CX', 'CATHAY PACIFIC'), ('ANA', 'NH', 'ALL NIPPON AIRWAYS'), ('CCA', 'CA', 'AIR CHINA'),
+    ('SIA', 'SQ', 'SINGAPORE AIRLINES'), ('QFA', 'QF', 'QANTAS'), ('ACA', 'AC', 'AIR CANADA'),
+]
+CIVIL_TYPES = ['A320', 'A321', 'A20N', 'A21N', 'A333', 'A359', 'B738', 'B38M', 'B739', 'B77W', 'B789',
+               'E75L', 'CRJ9', 'AT76', 'DH8D', 'A388', 'B744', 'PC12', 'GLF5']
+CIVIL_REGS = ['N', 'G-', 'D-A', 'F-G', 'EI-', 'PH-', 'A6-', 'JA', 'B-', 'C-F', 'VH-', 'PR-', 'TC-']
+SOURCES = ['ADSB', 'ADSB', 'ADSB', 'MLAT', 'ESTIMATED']
+
+
+def load_rules() -> Dict:
+    """The rules document military identities are drawn from"""
+    with open(Config.RULES_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Config paths the scanner, scorer and bot open or create on construction
+STATE_PATHS = ('AIRCRAFT_DB_PATH', 'ALERT_STATE_PATH', 'ARCHIVE_DIR', 'SURGE_STATE_PATH')
+
+
+@contextlib.contextmanager
+def scratch_state() -> Iterator[str]:
+    """
+    Point every state path in Config at a throwaway directory, so benchmark
+    components start empty and never touch the production SQLite files
+    """
+    saved = {name: getattr(Config, name) for name in STATE_PATHS}
+    with tempfile.TemporaryDirectory(prefix='milspot-bench-') as directory:
+        Config.AIRCRAFT_DB_PATH = os.path.join(directory, 'aircraft_metadata.sqlite3')
+        Config.ALERT_STATE_PATH = os.path.join(directory, 'alert_state.sqlite3')
+        Config.ARCHIVE_DIR = os.path.join(directory, 'archive')
+        Config.SURGE_STATE_PATH = os.path.join(directory, 'surge_baseline.sqlite3')
+        try:
+            yield directory
+        finally:
+            for name, value in saved.items():
+                setattr(Config, name, value)
+
+
+def _clamp_position(lat: float, lon: float):
+    lat = max(-85.0, min(85.0, lat))
+    lon = (lon + 180.0) % 360.0 - 180.0
+    return round(lat, 5), round(lon, 5)
+
+
+def _flight_phase(rng: random.Random):
+    """Altitude (ft), ground speed (kts) and vertical speed (fpm) for a plausible phase of flight"""
+    phase = rng.random()
+    if phase < 0.04:
+        return 0, rng.randint(0, 25), 0
+    if phase < 0.30:
+        alt = rng.randint(1000, 28000)
+        return alt, int(180 + alt / 100 + rng.gauss(0, 20)), rng.choice((-1, 1)) * rng.randint(500, 3000)
+    alt = rng.choice(range(29000, 43001, 1000))
+    return alt, int(rng.gauss(455, 35)), rng.choice((0, 0, 0, 64, -64))
+
+
+class TrafficGenerator:
+    """Deterministic for a given seed; each call to payload() yields a fresh feed"""
+
+    def __init__(self, military_share: float = MILITARY_SHARE, seed: int = 42, rules: Optional[Dict] = None):
+        self.military_share = military_share
+        self.rng = random.Random(seed)
+        rules = rules or load_rules()
+        self.callsigns = rules['callsigns']
+        self.aircraft_types = rules['aircraft_types']
+        self.operators = rules['operators']
+        self.reg_prefixes = rules['reg_prefixes']
+        self.squawk_anomalies = rules['squawk_anomalies']
+        self._next_id = 0x30000000
+
+    def _fr24_id(self) -> str:
+        self._next_id += 1
+        return format(self._next_id, 'x')
+
+    def civil(self, timestamp: str) -> Dict:
+        rng = self.rng
+        icao, iata, name = rng.choice(AIRLINES)
+        origin, destination = rng.sample(HUBS, 2)
+        # Somewhere along the route, scattered around the great-circle-ish straight line
+        progress = rng.random()
+        lat, lon = _clamp_position(origin[0] + (destination[0] - origin[0]) * progress + rng.gauss(0, 1.5),
+                                   origin[1] + (destination[1] - origin[1]) * progress + rng.gauss(0, 1.5))
+        alt, gspeed, vspeed = _flight_phase(rng)
+        number = rng.randint(1, 9999)
+        registration = rng.choice(CIVIL_REGS) + ''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(3))
+        return {
+            'fr24_id': self._fr24_id(),
+            'flight': f"{iata}{number}",
+            'callsign': f"{icao}{number}",
+            'lat': lat, 'lon': lon,
+            'track': int(math.degrees(math.atan2(destination[1] - origin[1], destination[0] - origin[0]))) % 360,
+            'alt': alt, 'gspeed': gspeed, 'vspeed': vspeed,
+            'squawk': f"{rng.randint(0, 7)}{rng.randint(0, 7)}{rng.randint(0, 7)}{rng.randint(0, 7)}",
+            'timestamp': timestamp,
+            'source': rng.choice(SOURCES),
+            'hex': format(rng.randint(0x100000, 0xADFFFF), '06X'),
+            'type': rng.choice(CIVIL_TYPES),
+            'reg': registration,
+            'painted_as': icao, 'operating_as': icao,
+            'orig_iata': origin[2], 'orig_icao': origin[3],
+            'dest_iata': destination[2], 'dest_icao': destination[3],
+            'eta': timestamp,
+        }
+
+    def military(self, timestamp: str) -> Dict:
+        rng = self.rng
+        lat_min, lat_max, lon_min, lon_max = rng.choice(MILITARY_AREAS)
+        lat, lon = _clamp_position(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max))
+        alt, gspeed, vspeed = _flight_phase(rng)
+        # Real feeds rarely carry every identifier; drop some so each rule gets exercised on its own
+        operator = rng.choice(self.operators) if rng.random() < 0.5 else ''
+        hex_prefix = rng.choice(('AE', '43C', '3F'))  # US military, UK military, German blocks
+        return {
+            'fr24_id': self._fr24_id(),
+            'flight': '',
+            'callsign': rng.choice(self.callsigns) + str(rng.randint(1, 99)) if rng.random() < 0.8 else '',
+            'lat': lat, 'lon': lon,
+            'track': rng.randint(0, 359),
+            'alt': alt, 'gspeed': gspeed, 'vspeed': vspeed,
+            'squawk': rng.choice(self.squawk_anomalies) if rng.random() < 0.1 else f"{rng.randint(1000, 7477)}",
+            'timestamp': timestamp,
+            'source': rng.choice(SOURCES),
+            'hex': hex_prefix + format(rng.randrange(16 ** (6 - len(hex_prefix))), f'0{6 - len(hex_prefix)}X'),
+            'type': rng.choice(self.aircraft_types) if rng.random() < 0.9 else '',
+            'reg': rng.choice(self.reg_prefixes) + str(rng.randint(100, 999)),
+            'painted_as': operator, 'operating_as': operator,
+            'orig_iata': '', 'orig_icao': '',
+            'dest_iata': '', 'dest_icao': '',
+            'eta': None,
+        }
+
+    def aircraft(self, size: int, fetched_at: Optional[float] = None) -> List[Dict]:
+        """size aircraft entries, about military_share of them military"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        timestamp = datetime.fromtimestamp(fetched_at, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        rng = self.rng
+        return [self.military(timestamp) if rng.random() < self.military_share else self.civil(timestamp)
+                for _ in range(size)]
+
+    def payload(self, size: int, fetched_at: Optional[float] = None) -> Dict:
+        """Decoded live flight-positions response"""
+        return {'data': self.aircraft(size, fetched_at)}
+
+    def body(self, size: int, fetched_at: Optional[float] = None) -> bytes:
+        """Raw response body, as the scanner receives it"""
+        return json.dumps(self.payload(size, fetched_at), separators=(',', ':')).encode('utf-8')
+
+
+def generate_payload(size: int, military_share: float = MILITARY_SHARE, seed: int = 42) -> Dict:
+    return TrafficGenerator(military_share, seed).payload(size)
+
+
+def write_snapshots(directory: str, size: int, count: int, interval: float = 60.0,
+                    military_share: float = MILITARY_SHARE, seed: int = 42) -> int:
+    """Record count synthetic responses interval seconds apart, ready for run_bot.py --replay"""
+    from core.replay import SnapshotRecorder
+
+    generator = TrafficGenerator(military_share, seed)
+    recorder = SnapshotRecorder(directory)
+    start = time.time() - count * interval
+    for i in range(count):
+        fetched_at = start + i * interval
+        recorder.record(generator.body(size, fetched_at), fetched_at)
+    recorder.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic FR24 traffic generator")
+    parser.add_argument('--size', type=int, default=20000, help="aircraft per payload")
+    parser.add_argument('--military-share', type=float, default=MILITARY_SHARE)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--snapshots', metavar='DIR', help="write replay snapshots to DIR instead of printing")
+    parser.add_argument('--count', type=int, default=10, help="snapshots to write")
+    parser.add_argument('--interval', type=float, default=60.0, help="seconds between snapshots")
+    args = parser.parse_args()
+
+    if args.snapshots:
+        write_snapshots(args.snapshots, args.size, args.count, args.interval, args.military_share, args.seed)
+    else:
+        print(TrafficGenerator(args.military_share, args.seed).body(args.size).decode('utf-8'))
+
+
+if __name__ == "__main__":
+    main()
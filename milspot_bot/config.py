@@ -6,137 +6,163 @@ load_dotenv()
 class Config:
     # FlightRadar24 API settings
     FR24_API_KEY = os.getenv("FR24_API_KEY", "")
+    FR24_API_BASE_URL = os.getenv("FR24_API_BASE_URL", "https://fr24api.flightradar24.com").rstrip("/")
+    
+    # FR24 HTTP client: keep-alive pool, timeouts, retries with jittered backoff
+    # (Retry-After honoured up to FR24_RETRY_AFTER_MAX) and a circuit breaker that
+    # skips the API for FR24_BREAKER_RESET_SECONDS after FR24_BREAKER_THRESHOLD failed fetches
+    FR24_POOL_SIZE = int(os.getenv("FR24_POOL_SIZE", "8"))
+    FR24_CONNECT_TIMEOUT = float(os.getenv("FR24_CONNECT_TIMEOUT", "5"))
+    FR24_READ_TIMEOUT = float(os.getenv("FR24_READ_TIMEOUT", "15"))
+    FR24_MAX_RETRIES = int(os.getenv("FR24_MAX_RETRIES", "3"))
+    FR24_BACKOFF_BASE = float(os.getenv("FR24_BACKOFF_BASE", "0.5"))
+    FR24_BACKOFF_MAX = float(os.getenv("FR24_BACKOFF_MAX", "10"))
+    FR24_RETRY_AFTER_MAX = float(os.getenv("FR24_RETRY_AFTER_MAX", "60"))
+    FR24_BREAKER_THRESHOLD = int(os.getenv("FR24_BREAKER_THRESHOLD", "5"))
+    FR24_BREAKER_RESET_SECONDS = float(os.getenv("FR24_BREAKER_RESET_SECONDS", "60"))
+    # Send If-None-Match/If-Modified-Since and reuse the last payload on 304 Not Modified
+    FR24_CONDITIONAL_REQUESTS = os.getenv("FR24_CONDITIONAL_REQUESTS", "true").lower() == "true"
+    
+    # Parse the feed into NumPy columns and filter/score as array operations
+    COLUMNAR_SCAN = os.getenv("COLUMNAR_SCAN", "false").lower() == "true"
+    # With COLUMNAR_SCAN, spread decoding, parsing and classification of each
+    # response over SHARD_WORKERS processes (0 or 1 keeps it in-process); bodies
+    # under SHARD_MIN_BYTES are not worth the hand-off and are parsed in-process
+    SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+    SHARD_MIN_BYTES = int(os.getenv("SHARD_MIN_BYTES", str(1 << 20)))
+    
+    # Decode the feed incrementally from the socket and filter per record
+    STREAM_SCAN = os.getenv("STREAM_SCAN", "false").lower() == "true"
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "65536"))
+    
+    # Tiled fetching: split the scan area into TILE_ROWS x TILE_COLS boxes fetched
+    # concurrently; tiles returning FR24_RESPONSE_CAP rows are quartered and refetched
+    TILED_FETCH = os.getenv("TILED_FETCH", "false").lower() == "true"
+    SCAN_AREA = os.getenv("SCAN_AREA", "")  # "lat_min,lat_max,lon_min,lon_max"; empty = whole world
+    TILE_ROWS = int(os.getenv("TILE_ROWS", "3"))
+    TILE_COLS = int(os.getenv("TILE_COLS", "6"))
+    TILE_CONCURRENCY = int(os.getenv("TILE_CONCURRENCY", "6"))
+    TILE_MAX_SPLIT_DEPTH = int(os.getenv("TILE_MAX_SPLIT_DEPTH", "3"))
+    FR24_RESPONSE_CAP = int(os.getenv("FR24_RESPONSE_CAP", "20000"))
+    
+    # Delta polling: reuse verdicts/scores for aircraft unchanged since the last scan
+    # (only useful in daemon mode, where the scanner survives between cycles)
+    DELTA_SCAN = os.getenv("DELTA_SCAN", "false").lower() == "true"
+    
+    # Per-aircraft track history: positions kept per aircraft (0 disables) and
+    # seconds without a sighting before a track is dropped
+    TRACK_HISTORY = int(os.getenv("TRACK_HISTORY", "32"))
+    TRACK_STALE_SECONDS = float(os.getenv("TRACK_STALE_SECONDS", "900"))
+    
+    # Trajectory pattern detection over track history
+    TRAJECTORY_MIN_SAMPLES = int(os.getenv("TRAJECTORY_MIN_SAMPLES", "6"))
+    TRAJECTORY_MAX_RADIUS_KM = float(os.getenv("TRAJECTORY_MAX_RADIUS_KM", "80"))
+    TRAJECTORY_MIN_TURN_DEG = float(os.getenv("TRAJECTORY_MIN_TURN_DEG", "300"))
+    TRAJECTORY_MIN_PATH_RATIO = float(os.getenv("TRAJECTORY_MIN_PATH_RATIO", "3"))
+    TRAJECTORY_RACETRACK_ELONGATION = float(os.getenv("TRAJECTORY_RACETRACK_ELONGATION", "2"))
+    
+    # Daemon mode (run_bot.py --daemon) scan cadence
+    SCAN_INTERVAL_SECONDS = float(os.getenv("SCAN_INTERVAL_SECONDS", "60"))
+    SCAN_JITTER_SECONDS = float(os.getenv("SCAN_JITTER_SECONDS", "2"))
     
     # WhatsApp API credentials (Twilio)
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     TWILIO_WHATSAPP_NUMBER = os.getenv("TWILIO_WHATSAPP_NUMBER")
     WHATSAPP_TO_NUMBER = os.getenv("WHATSAPP_TO_NUMBER")
+    # JSON list of subscribers ({"name", "number", "regions", "categories", "callsigns",
+    # "min_score", "top_k"}); when unset WHATSAPP_TO_NUMBER receives every alert
+    SUBSCRIBERS_FILE = os.getenv("SUBSCRIBERS_FILE")
+    # Override the Twilio API host, e.g. http://127.0.0.1:8765 for core/fake_twilio.py
+    TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+    
+    # Background delivery: messages are queued and sent by WHATSAPP_WORKERS threads,
+    # rate limited to WHATSAPP_RATE_PER_SECOND per sending number (bursts of
+    # WHATSAPP_BURST), retried on 429/5xx, and alerts for one recipient that arrive
+    # within WHATSAPP_COALESCE_SECONDS are merged into one message
+    WHATSAPP_ASYNC = os.getenv("WHATSAPP_ASYNC", "true").lower() == "true"
+    WHATSAPP_WORKERS = int(os.getenv("WHATSAPP_WORKERS", "2"))
+    WHATSAPP_RATE_PER_SECOND = float(os.getenv("WHATSAPP_RATE_PER_SECOND", "1"))
+    WHATSAPP_BURST = float(os.getenv("WHATSAPP_BURST", "1"))
+    WHATSAPP_MAX_RETRIES = int(os.getenv("WHATSAPP_MAX_RETRIES", "4"))
+    WHATSAPP_COALESCE_SECONDS = float(os.getenv("WHATSAPP_COALESCE_SECONDS", "0.5"))
 
-    # Military aircraft identifiers - Enhanced list
-    MILITARY_CALLSIGNS = [
-        'NATO40', 'NATO41', 'NATO42', 'NATO43', 'NATO44', 'NATO45',
-        'RCH', 'REACH', 'SAM', 'SPAR', 'VENUS', 'JEDI', 'HAVOC',
-        'RRR', 'ASCOT', 'COBRA', 'VIPER', 'TARTAN',
-        'RSD', 'RSD1', 'RSD2', 'RSD3', 'RSD4', 'RSD5',
-        'FORTE', 'DRAGON', 'HAWK', 'EAGLE', 'FALCON', 'PHANTOM',
-        'THUNDER', 'LIGHTNING', 'STORM', 'TEMPEST', 'HURRICANE',
-        'WARRIOR', 'KNIGHT', 'PALADIN', 'SENTINEL', 'GUARDIAN',
-        'SHADOW', 'GHOST', 'SPECTRE', 'PHANTOM', 'WRAITH',
-        'BLACK', 'RED', 'BLUE', 'GREEN', 'GOLD', 'SILVER',
-        'ALPHA', 'BETA', 'GAMMA', 'DELTA', 'ECHO', 'FOXTROT',
-        'GOLF', 'HOTEL', 'INDIA', 'JULIET', 'KILO', 'LIMA',
-        'MIKE', 'NOVEMBER', 'OSCAR', 'PAPA', 'QUEBEC', 'ROMEO',
-        'SIERRA', 'TANGO', 'UNIFORM', 'VICTOR', 'WHISKEY', 'XRAY',
-        'YANKEE', 'ZULU'
-    ]
+    # Military identifiers, aircraft categories, insights and score weights live in
+    # one JSON rules file, reloaded between scans when it changes
+    RULES_FILE = os.getenv("RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "military_rules.json"))
+    RULES_CACHE_SIZE = int(os.getenv("RULES_CACHE_SIZE", "4096"))
 
-    MILITARY_AIRCRAFT_TYPES = [
-        'B1', 'B2', 'B52', 'TU95', 'TU160', 'TU22M',
-        'RC135', 'U2', 'P8', 'E3TF', 'E4B', 'E6B', 'E8C', 'RC12', 'U28', 'MC12',
-        'F15', 'F16', 'F18', 'F22', 'F35', 'SU27', 'SU30', 'SU35', 'MIG29', 'MIG31',
-        'C130', 'C17', 'C5', 'A400M', 'IL76', 'AN124', 'KC135', 'KC10',
-        'E3', 'E4', 'E6', 'E8', 'P3', 'P8', 'U2', 'RC135',
-        'A10', 'AV8', 'EA18', 'EA6', 'EF18', 'F15E', 'F16C', 'F16D'
-    ]
+    # Aircraft metadata (operator, owner, type, military flag) per ICAO24 hex and
+    # registration, persisted in this SQLite file; off by default (empty), since it
+    # learns every airframe in every scan, e.g. aircraft_metadata.sqlite3 to enable.
+    # Bulk-load an offline database with: python3 -m core.aircraft_db import <file.csv>
+    AIRCRAFT_DB_PATH = os.getenv("AIRCRAFT_DB_PATH", "")
+    AIRCRAFT_DB_CACHE_SIZE = int(os.getenv("AIRCRAFT_DB_CACHE_SIZE", "50000"))
 
-    MILITARY_OPERATORS = [
-        'USAF', 'US AIR FORCE', 'UNITED STATES AIR FORCE',
-        'RAF', 'ROYAL AIR FORCE',
-        'RUSSIAN AIR FORCE', 'VKS',
-        'LUFTWAFFE', 'GERMAN AIR FORCE',
-        'FRENCH AIR FORCE', 'ARMEE DE L\'AIR',
-        'NATO', 'NORTH ATLANTIC TREATY ORGANIZATION',
-        'IDF', 'ISRAELI AIR FORCE',
-        'JASDF', 'JAPAN AIR SELF DEFENSE FORCE',
-        'CAF', 'CANADIAN AIR FORCE',
-        'RCAF', 'ROYAL CANADIAN AIR FORCE',
-        'RDAF', 'ROYAL DANISH AIR FORCE',
-        'RNLAF', 'ROYAL NETHERLANDS AIR FORCE',
-        'RSAF', 'ROYAL SAUDI AIR FORCE',
-        'IAF', 'INDIAN AIR FORCE',
-        'PLAAF', 'PEOPLE\'S LIBERATION ARMY AIR FORCE',
-        'ROKAF', 'REPUBLIC OF KOREA AIR FORCE',
-        'TURKISH AIR FORCE', 'TURAF',
-        'UAE AIR FORCE', 'UAEAF',
-        'AUSTRALIAN AIR FORCE', 'RAAF',
-        'SPAF', 'SPANISH AIR FORCE',
-        'SWEDISH AIR FORCE', 'SWAF',
-        'FINNISH AIR FORCE', 'FAF',
-        'NORWEGIAN AIR FORCE', 'RNoAF',
-        'PORTUGUESE AIR FORCE', 'PRTAF',
-        'POLISH AIR FORCE', 'PLAF',
-        'CZECH AIR FORCE', 'CZAF',
-        'SLOVAK AIR FORCE', 'SVKAF',
-        'HUNGARIAN AIR FORCE', 'HUAF',
-        'ROMANIAN AIR FORCE', 'ROAF',
-        'BULGARIAN AIR FORCE', 'BGR AF',
-        'GREEK AIR FORCE', 'HAF',
-        'CROATIAN AIR FORCE', 'HRZ',
-        'SERBIAN AIR FORCE', 'SRB AF',
-        'SLOVENIAN AIR FORCE', 'SVN AF',
-        'SWISS AIR FORCE', 'SWISS AF',
-        'BELGIAN AIR FORCE', 'BAF',
-        'AUSTRIAN AIR FORCE', 'AAF',
-        'IRISH AIR CORPS', 'IAC',
-        'LUXEMBOURG AIR FORCE', 'LUX AF',
-        'ESTONIAN AIR FORCE', 'EST AF',
-        'LATVIAN AIR FORCE', 'LVA AF',
-        'LITHUANIAN AIR FORCE', 'LTU AF',
-        'MALTESE AIR FORCE', 'MLT AF',
-        'CYPRUS AIR FORCE', 'CYP AF',
-        'GEORGIAN AIR FORCE', 'GEO AF',
-        'UKRAINIAN AIR FORCE', 'UKR AF',
-        'MOLDOVAN AIR FORCE', 'MDA AF',
-        'BELARUSIAN AIR FORCE', 'BLR AF',
-        'ARMENIAN AIR FORCE', 'ARM AF',
-        'AZERBAIJANI AIR FORCE', 'AZE AF',
-        'KAZAKH AIR FORCE', 'KAZ AF',
-        'UZBEK AIR FORCE', 'UZB AF',
-        'KYRGYZ AIR FORCE', 'KGZ AF',
-        'TAJIK AIR FORCE', 'TJK AF',
-        'TURKMEN AIR FORCE', 'TKM AF',
-        'AFGHAN AIR FORCE', 'AFG AF',
-        'PAKISTAN AIR FORCE', 'PAF',
-        'BANGLADESH AIR FORCE', 'BAF',
-        'SRI LANKA AIR FORCE', 'SLAF',
-        'MYANMAR AIR FORCE', 'MAF',
-        'THAI AIR FORCE', 'RTAF',
-        'VIETNAM AIR FORCE', 'VPAF',
-        'MALAYSIAN AIR FORCE', 'RMAF',
-        'SINGAPORE AIR FORCE', 'RSAF',
-        'INDONESIAN AIR FORCE', 'TNI-AU',
-        'PHILIPPINE AIR FORCE', 'PAF',
-        'TAIWAN AIR FORCE', 'ROCAF',
-        'MONGOLIAN AIR FORCE', 'MAF',
-        'NORTH KOREAN AIR FORCE', 'KPAF',
-        'SOUTH KOREAN AIR FORCE', 'ROKAF',
-        'AUSTRALIAN AIR FORCE', 'RAAF',
-        'NEW ZEALAND AIR FORCE', 'RNZAF',
-        'FIJI AIR FORCE', 'FAF',
-        'PAPUA NEW GUINEA AIR FORCE', 'PNG AF',
-        'SOLOMON ISLANDS AIR FORCE', 'SIAF',
-        'TONGA AIR FORCE', 'TAF',
-        'SAMOA AIR FORCE', 'SAF',
-        'VANUATU AIR FORCE', 'VAF',
-        'FRANCE', 'GERMANY', 'ITALY', 'SPAIN', 'TURKEY', 'GREECE', 'POLAND', 'ROMANIA', 'NETHERLANDS', 'BELGIUM', 'CZECH', 'SLOVAK', 'HUNGARY', 'BULGARIA', 'CROATIA', 'SLOVENIA', 'ESTONIA', 'LATVIA', 'LITHUANIA', 'LUXEMBOURG', 'MALTA', 'CYPRUS', 'GEORGIA', 'UKRAINE', 'MOLDOVA', 'BELARUS', 'ARMENIA', 'AZERBAIJAN', 'KAZAKHSTAN', 'UZBEKISTAN', 'KYRGYZSTAN', 'TAJIKISTAN', 'TURKMENISTAN', 'AFGHANISTAN', 'PAKISTAN', 'BANGLADESH', 'SRI LANKA', 'MYANMAR', 'THAILAND', 'VIETNAM', 'MALAYSIA', 'SINGAPORE', 'INDONESIA', 'PHILIPPINES', 'TAIWAN', 'MONGOLIA', 'NORTH KOREA', 'SOUTH KOREA', 'AUSTRALIA', 'NEW ZEALAND', 'FIJI', 'PAPUA NEW GUINEA', 'SOLOMON ISLANDS', 'TONGA', 'SAMOA', 'VANUATU'
-    ]
-    
-    MILITARY_REG_PREFIXES = [
-        'ZZ', '43C', '44C', '45C', '46C', '47C', '48C', '49C', '4AC', '4BC', '4CC', '4DC', '4EC', '4FC', '50C', '51C', '52C', '53C', '54C', '55C', '56C', '57C', '58C', '59C', '5AC', '5BC', '5CC', '5DC', '5EC', '5FC', '60C', '61C', '62C', '63C', '64C', '65C', '66C', '67C', '68C', '69C', '6AC', '6BC', '6CC', '6DC', '6EC', '6FC', '70C', '71C', '72C', '73C', '74C', '75C', '76C', '77C', '78C', '79C', '7AC', '7BC', '7CC', '7DC', '7EC', '7FC', '80C', '81C', '82C', '83C', '84C', '85C', '86C', '87C', '88C', '89C', '8AC', '8BC', '8CC', '8DC', '8EC', '8FC', '90C', '91C', '92C', '93C', '94C', '95C', '96C', '97C', '98C', '99C', '9AC', '9BC', '9CC', '9DC', '9EC', '9FC'
-    ]
+    # Append-only archive of every scan's positions in hourly partitions under this
+    # directory; off by default (empty), e.g. ARCHIVE_DIR=archive to enable.
+    # ARCHIVE_SCOPE=all also keeps civil traffic (~1.5 GB/day raw at 20k aircraft per
+    # minute); partitions are gzipped once older than ARCHIVE_COMPRESS_AFTER_HOURS and
+    # dropped past ARCHIVE_RETENTION_DAYS or, oldest first, when the archive outgrows
+    # ARCHIVE_MAX_MB (0 = no size cap).
+    # Query with: python3 -m core.archive sightings|box|counts|stats
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+    ARCHIVE_SCOPE = os.getenv("ARCHIVE_SCOPE", "military").lower()
+    ARCHIVE_COMPRESS_AFTER_HOURS = float(os.getenv("ARCHIVE_COMPRESS_AFTER_HOURS", "24"))
+    ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+    ARCHIVE_MAX_MB = float(os.getenv("ARCHIVE_MAX_MB", "2048"))
 
     # Geopolitical hotspots - TEMPORARILY REMOVED ALL GEOFENCES
     HOTSPOTS = {}  # Empty dictionary - no regional restrictions
     
-    # Score weights for different factors
-    SCORE_WEIGHTS = {
-        'military_callsign': 10,
-        'military_aircraft': 8,
-        'military_operator': 6,
-        'hotspot_location': 0,  # Temporarily disabled
-        'loitering_pattern': 3,
-        'unknown_destination': 2,
-        'altitude_anomaly': 1,
-        'squawk_anomaly': 1
-    } 
\ No newline at end of file
+    # Optional GeoJSON FeatureCollection of polygon geofences (ADIZs, FIRs, exercise
+    # areas) scored like hotspots; features are named by properties.name
+    GEOFENCES_FILE = os.getenv("GEOFENCES_FILE", "")
+    GEOFENCE_CELL_SIZE = float(os.getenv("GEOFENCE_CELL_SIZE", "5"))
+    
+    # Alerts per scan: each recipient gets the ALERT_TOP_K best flights it subscribes
+    # to that score at least ALERT_MIN_SCORE (a subscriber's own top_k and min_score
+    # override them)
+    ALERT_TOP_K = int(os.getenv("ALERT_TOP_K", "1"))
+    ALERT_MIN_SCORE = int(os.getenv("ALERT_MIN_SCORE", "1"))
+    
+    # Score scale, with the weights in the rules file: a military aircraft gets
+    # military_base (5) plus its type category (up to 10), military callsign (10),
+    # military operator (6) and squawk anomaly (1) bonuses, then hotspot (2),
+    # loitering (3) and regional surge (4), so roughly 5-40; anything else scores 0.
+    # ALERT_MIN_SCORE and subscriber min_score are on this scale, as are the
+    # analyzer's interest bands below (a military callsign on a bomber in a
+    # hotspot reaches SCORE_HIGH_VALUE)
+    SCORE_HIGH_VALUE = int(os.getenv("SCORE_HIGH_VALUE", "25"))
+    SCORE_MODERATE = int(os.getenv("SCORE_MODERATE", "18"))
+    
+    # Root log level, plus the opt-in payload debug channel: PAYLOAD_DEBUG_SAMPLE is the
+    # share (0-1) of raw aircraft entries logged on core.scanner.payload; 0 disables it
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    PAYLOAD_DEBUG_SAMPLE = float(os.getenv("PAYLOAD_DEBUG_SAMPLE", "0"))
+    
+    # Prometheus metrics endpoint (GET /metrics); 0 disables it. Metrics are
+    # collected either way and each scan logs its per-stage timings
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    
+    # Alert cooldown: an aircraft (by registration, else callsign) is not re-alerted
+    # for ALERT_COOLDOWN_SECONDS unless its score rises by ALERT_RESCORE_DELTA;
+    # state is kept in the ALERT_STATE_PATH SQLite file (empty disables the cooldown)
+    ALERT_COOLDOWN_SECONDS = float(os.getenv("ALERT_COOLDOWN_SECONDS", "3600"))
+    ALERT_RESCORE_DELTA = int(os.getenv("ALERT_RESCORE_DELTA", "3"))
+    ALERT_STATE_PATH = os.getenv("ALERT_STATE_PATH", "alert_state.sqlite3")
+    
+    # Surge detection: rolling per-region, per-category, per-hour-of-week counts of
+    # military aircraft (each hour's mean count, exponentially weighted with
+    # SURGE_ALPHA per hour). A category that is SURGE_Z_THRESHOLD deviations above
+    # its usual level in a region, with at least SURGE_MIN_COUNT aircraft, adds the
+    # rules' regional_surge weight to them. Baselines need SURGE_MIN_SAMPLES hours
+    # of data before they judge and persist in the SURGE_STATE_PATH SQLite file
+    # (empty keeps them in memory)
+    SURGE_DETECTION = os.getenv("SURGE_DETECTION", "true").lower() == "true"
+    SURGE_ALPHA = float(os.getenv("SURGE_ALPHA", "0.05"))
+    SURGE_Z_THRESHOLD = float(os.getenv("SURGE_Z_THRESHOLD", "3"))
+    SURGE_MIN_COUNT = int(os.getenv("SURGE_MIN_COUNT", "2"))
+    SURGE_MIN_SAMPLES = int(os.getenv("SURGE_MIN_SAMPLES", "4"))
+    SURGE_STATE_PATH = os.getenv("SURGE_STATE_PATH", "surge_baseline.sqlite3")
@@ -0,0 +1,285 @@
+"""
+Aircraft Metadata Cache
+Operator, owner, type and military flag per airframe, keyed by ICAO24 hex and
+registration; fed from FR24 payloads and offline database imports, persisted
+in SQLite with an in-process LRU in front
+
+Bulk import from milspot_bot/:  python3 -m core.aircraft_db import aircraftDatabase.csv
+"""
+
+import csv
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class AircraftRecord(NamedTuple):
+    hex: str
+    registration: str
+    aircraft_type: str = ''
+    operator: str = ''
+    painted_as: str = ''
+    owner: str = ''
+    military: Optional[bool] = None
+
+    def merge(self, newer: 'AircraftRecord') -> 'AircraftRecord':
+        """Field-wise merge where non-empty values from newer win"""
+        return AircraftRecord(*(new if new not in ('', None) else old for old, new in zip(self, newer)))
+
+
+# Column aliases accepted by import_csv (OpenSky aircraftDatabase.csv, BaseStation exports, ...)
+CSV_COLUMNS = {
+    'hex': ('icao24', 'hex', 'modes', 'mode_s', 'icao'),
+    'registration': ('registration', 'reg', 'registration_number'),
+    'aircraft_type': ('typecode', 'icaotypecode', 'type', 'icao_type'),
+    'operator': ('operatoricao', 'operator', 'operatorcallsign'),
+    'owner': ('owner', 'registeredowners', 'owner_name'),
+    'military': ('military', 'mil', 'is_military'),
+}
+
+
+def _keys(hex_code: str, registration: str) -> List[str]:
+    keys = []
+    if hex_code:
+        keys.append('hex:' + hex_code)
+    if registration:
+        keys.append('reg:' + registration)
+    return keys
+
+
+def _parse_flag(value) -> Optional[bool]:
+    value = (value or '').strip().lower()
+    if value in ('1', 'true', 'yes', 'y', 't'):
+        return True
+    if value in ('0', 'false', 'no', 'n', 'f'):
+        return False
+    return None
+
+
+class AircraftMetadataCache:
+    """
+    Records are stored once per key (hex and registration each get a row) so
+    either identifier resolves with one primary-key probe; the LRU absorbs the
+    steady state and also remembers misses
+    """
+
+    def __init__(self, path: str, cache_size: int = 50000):
+        self.path = path
+        self.cache_size = cache_size
+        self._lru: 'OrderedDict[str, Optional[AircraftRecord]]' = OrderedDict()
+        self._pending: Dict[str, AircraftRecord] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS aircraft (key TEXT PRIMARY KEY, hex TEXT, registration TEXT, "
+            "aircraft_type TEXT, operator TEXT, painted_as TEXT, owner TEXT, military INTEGER, updated_at REAL)"
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        # True while every stored row is in the LRU, so a miss needs no disk probe
+        self._complete = False
+        self._warm()
+
+    def _warm(self):
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM aircraft").fetchone()[0]
+            rows = self._db.execute(
+                "SELECT key, hex, registration, aircraft_type, operator, painted_as, owner, military FROM aircraft "
+                "ORDER BY updated_at DESC LIMIT ?", (self.cache_size,)
+            ).fetchall()
+        for key, *fields in reversed(rows):
+            self._lru[key] = self._record(fields)
+        self._complete = total <= self.cache_size
+        logger.info("🗂️ Aircraft metadata: %s keys on disk, %s cached", total, len(self._lru))
+
+    @staticmethod
+    def _record(fields) -> AircraftRecord:
+        hex_code, registration, aircraft_type, operator, painted_as, owner, military = fields
+        return AircraftRecord(hex_code or '', registration or '', aircraft_type or '', operator or '',
+                              painted_as or '', owner or '', None if military is None else bool(military))
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _remember(self, key: str, record: Optional[AircraftRecord]):
+        lru = self._lru
+        lru[key] = record
+        lru.move_to_end(key)
+        if len(lru) > self.cache_size:
+            lru.popitem(last=False)
+            self._complete = False
+
+    def _get(self, key: str) -> Optional[AircraftRecord]:
+        record = self._lru.get(key, MISSING)
+        if record is not MISSING:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return record
+        self.misses += 1
+        if self._complete:
+            record = None
+        else:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT hex, registration, aircraft_type, operator, painted_as, owner, military FROM aircraft "
+                    "WHERE key = ?", (key,)
+                ).fetchone()
+            record = self._record(row) if row else None
+        self._remember(key, record)
+        return record
+
+    def lookup(self, hex_code: str = '', registration: str = '') -> Optional[AircraftRecord]:
+        """Record for an airframe by ICAO24 hex, falling back to registration"""
+        for key in _keys((hex_code or '').upper(), (registration or '').upper()):
+            record = self._get(key)
+            if record is not None:
+                return record
+        return None
+
+    def known_military(self, hex_code: str = '', registration: str = '') -> bool:
+        """True only when an imported database flagged the airframe as military"""
+        record = self.lookup(hex_code, registration)
+        return record is not None and record.military is True
+
+    def military_hexes(self) -> List[str]:
+        """Every ICAO24 hex flagged military on disk, sorted; for workers that cannot share the cache"""
+        self.flush()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT hex FROM aircraft WHERE key >= 'hex:' AND key < 'hex;' AND military = 1 ORDER BY hex"
+            ).fetchall()
+        return [hex_code for hex_code, in rows if hex_code]
+    
+    def store(self, record: AircraftRecord):
+        """Merge a record into the cache; written to disk on the next flush()"""
+        record = record._replace(hex=record.hex.upper(), registration=record.registration.upper())
+        self._merge(self.lookup(record.hex, record.registration), record)
+
+    def _merge(self, existing: Optional[AircraftRecord], record: AircraftRecord) -> AircraftRecord:
+        merged = existing.merge(record) if existing is not None else record
+        if merged != existing:
+            for key in _keys(merged.hex, merged.registration):
+                self._remember(key, merged)
+                self._pending[key] = merged
+        return merged
+
+    def enrich(self, flight: FlightRecord) -> FlightRecord:
+        """
+        Learn from the payload fields of a flight, then fill its missing operator,
+        livery, owner, type and military fields from what is known about the airframe
+        """
+        hex_code = flight.hex
+        registration = flight.registration
+        if not hex_code and not registration:
+            return flight
+
+        record = self.lookup(hex_code, registration)
+        aircraft_type = flight.aircraft_code
+        operator = flight.operating_as
+        painted_as = flight.painted_as
+        # Steady state: the payload adds nothing new, so skip building a merged record
+        if (record is None
+                or (hex_code and hex_code != record.hex) or (registration and registration != record.registration)
+                or (aircraft_type and aircraft_type != record.aircraft_type)
+                or (operator and operator != record.operator) or (painted_as and painted_as != record.painted_as)):
+            record = self._merge(record, AircraftRecord(hex_code, registration, aircraft_type, operator, painted_as))
+
+        # Stored values may predate normalization, so they go through the record's setter
+        if not aircraft_type and record.aircraft_type:
+            flight['aircraft_code'] = record.aircraft_type
+        if not registration and record.registration:
+            flight['registration'] = record.registration
+        if not operator and record.operator:
+            flight['operating_as'] = record.operator
+        if not painted_as and record.painted_as:
+            flight['painted_as'] = record.painted_as
+        if record.owner:
+            flight.setdefault('owner', record.owner)
+        if record.military is not None:
+            flight.setdefault('military', record.military)
+        return flight
+
+    def enrich_many(self, flights: Iterable[FlightRecord]) -> List[FlightRecord]:
+        flights = [self.enrich(flight) for flight in flights]
+        self.flush()
+        return flights
+
+    def flush(self) -> int:
+        """Write queued changes in one transaction"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        rows = [(key, r.hex, r.registration, r.aircraft_type, r.operator, r.painted_as, r.owner,
+                 None if r.military is None else int(r.military), now) for key, r in pending.items()]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO aircraft VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def import_csv(self, path: str) -> int:
+        """Bulk-load an offline aircraft database; header names are matched case-insensitively"""
+        imported = 0
+        with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+            reader = csv.DictReader(f)
+            headers = {name.strip().strip("'").lower(): name for name in reader.fieldnames or []}
+            columns = {field: next((headers[a] for a in aliases if a in headers), None)
+                       for field, aliases in CSV_COLUMNS.items()}
+            if not columns['hex'] and not columns['registration']:
+                raise ValueError(f"{path}: no ICAO24 hex or registration column")
+
+            def value(row, field):
+                column = columns[field]
+                return (row.get(column) or '').strip().strip("'") if column else ''
+
+            for row in reader:
+                record = AircraftRecord(
+                    hex=value(row, 'hex').upper(),
+                    registration=value(row, 'registration').upper(),
+                    aircraft_type=value(row, 'aircraft_type').upper(),
+                    operator=value(row, 'operator'),
+                    owner=value(row, 'owner'),
+                    military=_parse_flag(value(row, 'military')),
+                )
+                if not record.hex and not record.registration:
+                    continue
+                self.store(record)
+                imported += 1
+                if len(self._pending) >= 10000:
+                    self.flush()
+        self.flush()
+        logger.info("🗂️ Imported %s aircraft from %s", imported, path)
+        return imported
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    from config import Config
+
+    if len(sys.argv) != 3 or sys.argv[1] != 'import':
+        raise SystemExit("usage: python3 -m core.aircraft_db import <aircraft.csv>")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = Config()
+    if not config.AIRCRAFT_DB_PATH:
+        raise SystemExit("Set AIRCRAFT_DB_PATH to the metadata database to import into")
+    cache = AircraftMetadataCache(config.AIRCRAFT_DB_PATH, cache_size=config.AIRCRAFT_DB_CACHE_SIZE)
+    cache.import_csv(sys.argv[2])
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Alert Deduplication Cache
+Remembers which aircraft were alerted recently so the same flight is not sent
+again until its cooldown expires or its score jumps; state persists in SQLite
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+
+def alert_key(flight: FlightRecord) -> Optional[str]:
+    """Registration, falling back to callsign, identifies an aircraft across scans"""
+    return flight.registration or flight.callsign or None
+
+
+class AlertCache:
+    def __init__(self, path: str, cooldown: float = 3600.0, rescore_delta: int = 3,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self.cooldown = cooldown
+        self.rescore_delta = rescore_delta
+        # The daemon scans on a worker thread and deliveries are recorded from dispatch
+        # workers, so the connection and the entries are shared behind a lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS alerts (key TEXT PRIMARY KEY, sent_at REAL NOT NULL, score INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._entries: Dict[str, Tuple[float, int]] = {}
+        self._load()
+
+    def _load(self):
+        """Pull unexpired entries into memory so lookups never touch the disk"""
+        cutoff = self.clock() - self.cooldown
+        with self._lock:
+            self._db.execute("DELETE FROM alerts WHERE sent_at <= ?", (cutoff,))
+            self._db.commit()
+            rows = self._db.execute("SELECT key, sent_at, score FROM alerts").fetchall()
+        self._entries = {key: (sent_at, score) for key, sent_at, score in rows}
+        logger.info("🗃️ Alert cache loaded %s active cooldowns from %s", len(self._entries), self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def should_alert(self, flight: FlightRecord, score: int, now: Optional[float] = None) -> bool:
+        """False while the aircraft is cooling down, unless its score rose by rescore_delta or more"""
+        key = alert_key(flight)
+        if key is None:
+            return True
+        entry = self._entries.get(key)
+        if entry is None:
+            return True
+        sent_at, last_score = entry
+        now = self.clock() if now is None else now
+        if now - sent_at >= self.cooldown:
+            self._entries.pop(key, None)
+            return True
+        return score - last_score >= self.rescore_delta
+
+    def record(self, flight: FlightRecord, score: int, now: Optional[float] = None):
+        """Start (or restart) the cooldown for a flight that was just alerted"""
+        key = alert_key(flight)
+        if key is None:
+            return
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._entries[key] = (now, score)
+            self._db.execute("INSERT OR REPLACE INTO alerts (key, sent_at, score) VALUES (?, ?, ?)", (key, now, score))
+            self._db.commit()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop expired cooldowns from memory and disk"""
+        now = self.clock() if now is None else now
+        cutoff = now - self.cooldown
+        with self._lock:
+            expired = [key for key, (sent_at, _) in self._entries.items() if sent_at <= cutoff]
+            for key in expired:
+                del self._entries[key]
+            if expired:
+                self._db.execute("DELETE FROM alerts WHERE sent_at <= ?", (cutoff,))
+                self._db.commit()
+        return len(expired)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
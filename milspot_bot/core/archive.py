@@ -0,0 +1,468 @@
+"""
+Position Archive
+Appends every scan's positions to hourly partitions of fixed-width records,
+gzips partitions once they age out of the hot window, enforces retention,
+and answers sighting, area and daily-count queries by streaming partitions
+through NumPy in bounded chunks (memory-mapped while uncompressed)
+
+Query from milspot_bot/:  python3 -m core.archive sightings --registration 14-5804
+                          python3 -m core.archive box 50,60,-10,5 --start 2024-06-01 --end 2024-06-02
+                          python3 -m core.archive counts --start 2024-06-01
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+import numpy as np
+from core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# One sighting per row, little-endian and unpadded so files are portable and memmappable
+RECORD_DTYPE = np.dtype([
+    ('time', '<u4'),  # scan time, epoch seconds
+    ('lat', '<f4'),
+    ('lon', '<f4'),
+    ('altitude', '<i4'),
+    ('ground_speed', '<i2'),
+    ('heading', '<i2'),
+    ('military', 'u1'),
+    ('hex', 'S6'),
+    ('callsign', 'S8'),
+    ('aircraft_code', 'S6'),  # ICAO designators are 4, but the rules use e.g. RC135, TU160
+    ('registration', 'S10'),
+    ('squawk', 'S4'),
+])
+RAW_SUFFIX = '.rec'
+COMPRESSED_SUFFIX = '.rec.gz'
+CHUNK_ROWS = 1 << 18  # ~14 MB of records per step, whatever the partition size
+
+ARCHIVED_ROWS = REGISTRY.counter('milspot_archive_rows_total', "Positions appended to the archive")
+
+
+class Partition(NamedTuple):
+    hour: int  # epoch seconds at the start of the UTC hour
+    path: str
+
+    @property
+    def compressed(self) -> bool:
+        return self.path.endswith(COMPRESSED_SUFFIX)
+
+
+def partition_path(directory: str, hour: int) -> str:
+    """archive/20240601/13.rec for the 13:00-14:00 UTC partition"""
+    stamp = datetime.fromtimestamp(hour, tz=timezone.utc)
+    return os.path.join(directory, stamp.strftime('%Y%m%d'), stamp.strftime('%H') + RAW_SUFFIX)
+
+
+def parse_time(value: str) -> float:
+    """Epoch seconds from a number or an ISO-8601 date/time (UTC unless it says otherwise)"""
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+
+def _text_column(values: Sequence[str], width: int) -> np.ndarray:
+    try:
+        return np.array(values, dtype=f'S{width}')
+    except UnicodeEncodeError:
+        return np.array([value.encode('ascii', 'replace') for value in values], dtype=f'S{width}')
+
+
+def _clip(values: np.ndarray, dtype) -> np.ndarray:
+    info = np.iinfo(dtype)
+    return np.clip(np.nan_to_num(values), info.min, info.max).astype(dtype)
+
+
+def records_from_flights(flights: Sequence, military: np.ndarray, scan_time: float) -> np.ndarray:
+    """Archive rows for a list of FlightRecords"""
+    rows = np.empty(len(flights), dtype=RECORD_DTYPE)
+    rows['time'] = int(scan_time)
+    rows['lat'] = [flight.latitude for flight in flights]
+    rows['lon'] = [flight.longitude for flight in flights]
+    rows['altitude'] = _clip(np.array([flight.altitude for flight in flights], dtype=np.float64), np.int32)
+    rows['ground_speed'] = _clip(np.array([flight.ground_speed for flight in flights], dtype=np.float64), np.int16)
+    rows['heading'] = _clip(np.array([flight.heading for flight in flights], dtype=np.float64), np.int16)
+    rows['military'] = military
+    rows['hex'] = _text_column([flight.hex for flight in flights], 6)
+    rows['callsign'] = _text_column([flight.callsign for flight in flights], 8)
+    rows['aircraft_code'] = _text_column([flight.aircraft_code for flight in flights], 6)
+    rows['registration'] = _text_column([flight.registration for flight in flights], 10)
+    rows['squawk'] = _text_column([flight.squawk for flight in flights], 4)
+    return rows
+
+
+def records_from_batch(batch, military: np.ndarray, scan_time: float) -> np.ndarray:
+    """Archive rows for a FlightBatch; strings are encoded once per distinct value"""
+    rows = np.empty(len(batch), dtype=RECORD_DTYPE)
+    rows['time'] = int(scan_time)
+    rows['lat'] = batch.lat
+    rows['lon'] = batch.lon
+    rows['altitude'] = _clip(batch.alt, np.int32)
+    rows['ground_speed'] = _clip(batch.gspeed, np.int16)
+    rows['heading'] = _clip(batch.heading, np.int16)
+    rows['military'] = military
+    for field, width in (('hex', 6), ('callsign', 8), ('aircraft_code', 6), ('registration', 10), ('squawk', 4)):
+        column = batch.strings[field]
+        vocabulary = _text_column([value.upper() for value in column.vocabulary], width)
+        rows[field] = vocabulary[column.codes] if len(vocabulary) else b''
+    return rows
+
+
+class ArchiveWriter:
+    """
+    Appends scan positions on a background thread; the scan thread only hands
+    over the flights, their military flags and the scan time
+    """
+
+    def __init__(self, directory: str, military_only: bool = True, compress_after: float = 86400.0,
+                 retention: float = 30 * 86400.0, max_bytes: int = 0, clock: Callable[[], float] = time.time):
+        self.directory = directory
+        self.military_only = military_only
+        self.compress_after = compress_after
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.appended = 0
+        os.makedirs(directory, exist_ok=True)
+        _check_format(directory)
+        self._maintained_hour: Optional[int] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='archive-writer', daemon=True)
+        self._writer.start()
+
+    def append(self, flights: Sequence, military: Sequence):
+        """Queue one scan: all flights seen plus the military subset (a list of the same records)"""
+        self._queue.put(('flights', flights, military, self.clock()))
+
+    def append_batch(self, batch, military_mask: np.ndarray):
+        """Columnar counterpart of append"""
+        self._queue.put(('batch', batch, military_mask, self.clock()))
+
+    def _rows(self, kind: str, flights, military, scan_time: float) -> np.ndarray:
+        if kind == 'batch':
+            if self.military_only:
+                return records_from_batch(flights.filter(military), np.ones(int(military.sum()), dtype=np.uint8),
+                                          scan_time)
+            return records_from_batch(flights, military, scan_time)
+        if self.military_only:
+            return records_from_flights(military, np.ones(len(military), dtype=np.uint8), scan_time)
+        military_ids = {id(flight) for flight in military}
+        flags = np.fromiter((id(flight) in military_ids for flight in flights), dtype=np.uint8, count=len(flights))
+        return records_from_flights(flights, flags, scan_time)
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                kind, flights, military, scan_time = item
+                rows = self._rows(kind, flights, military, scan_time)
+                if len(rows):
+                    self.write(rows, scan_time)
+                self.maintain(scan_time)
+            except Exception as e:
+                logger.error("❌ Failed to archive scan: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def write(self, rows: np.ndarray, scan_time: float):
+        """Append rows to the partition of scan_time's hour"""
+        path = partition_path(self.directory, int(scan_time) // 3600 * 3600)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            # Cut a torn row left by a crash mid-append so every later row stays aligned
+            misaligned = f.tell() % RECORD_DTYPE.itemsize
+            if misaligned:
+                f.truncate(f.tell() - misaligned)
+                f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+        self.appended += len(rows)
+        ARCHIVED_ROWS.inc(len(rows))
+
+    def maintain(self, now: float, force: bool = False):
+        """Once per hour: gzip partitions past the hot window, then apply age and size retention"""
+        hour = int(now) // 3600
+        if hour == self._maintained_hour and not force:
+            return
+        self._maintained_hour = hour
+        partitions = list_partitions(self.directory)
+        for partition in partitions:
+            if partition.hour < now - self.retention:
+                _remove(partition.path)
+                logger.info("🗑️ Archive partition %s expired", partition.path)
+            elif not partition.compressed and partition.hour + 3600 <= now - self.compress_after:
+                _compress(partition.path)
+        if self.max_bytes:
+            partitions = list_partitions(self.directory)
+            total = sum(os.path.getsize(p.path) for p in partitions)
+            for partition in partitions[:-1]:  # never the partition being written
+                if total <= self.max_bytes:
+                    break
+                total -= os.path.getsize(partition.path)
+                _remove(partition.path)
+                logger.info("🗑️ Archive over %s MB, dropped %s", self.max_bytes // (1 << 20), partition.path)
+
+    def close(self):
+        """Finish writing everything queued"""
+        self._queue.put(None)
+        self._writer.join()
+        logger.info("🗄️ Archived %s positions to %s", self.appended, self.directory)
+
+
+def _check_format(directory: str):
+    path = os.path.join(directory, 'FORMAT')
+    if not os.path.exists(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{FORMAT_VERSION}\n")
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        version = int(f.read().strip() or 0)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{directory} holds archive format {version}, expected {FORMAT_VERSION}")
+
+
+def _compress(path: str):
+    tmp_path = path + '.gz.tmp'
+    with open(path, 'rb') as source, gzip.open(tmp_path, 'wb', compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    os.replace(tmp_path, path + '.gz')
+    os.remove(path)
+
+
+def _remove(path: str):
+    os.remove(path)
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def list_partitions(directory: str) -> List[Partition]:
+    """Partitions oldest first; a raw file wins over a gzip copy left by an interrupted compression"""
+    found: Dict[int, str] = {}
+    if not os.path.isdir(directory):
+        return []
+    for day in os.listdir(directory):
+        day_path = os.path.join(directory, day)
+        if not (len(day) == 8 and day.isdigit() and os.path.isdir(day_path)):
+            continue
+        for name in os.listdir(day_path):
+            if name.endswith(COMPRESSED_SUFFIX):
+                hour_text = name[:-len(COMPRESSED_SUFFIX)]
+            elif name.endswith(RAW_SUFFIX):
+                hour_text = name[:-len(RAW_SUFFIX)]
+            else:
+                continue
+            moment = datetime.strptime(day + hour_text, '%Y%m%d%H').replace(tzinfo=timezone.utc)
+            hour = int(moment.timestamp())
+            path = os.path.join(day_path, name)
+            if hour not in found or name.endswith(RAW_SUFFIX):
+                found[hour] = path
+    return [Partition(hour, found[hour]) for hour in sorted(found)]
+
+
+class ArchiveReader:
+    """Query side; never holds more than one chunk of a partition in memory"""
+
+    def __init__(self, directory: str, chunk_rows: int = CHUNK_ROWS):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+
+    def partitions(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Partition]:
+        return [p for p in list_partitions(self.directory)
+                if (start is None or p.hour + 3600 > start) and (end is None or p.hour <= end)]
+
+    def chunks(self, partition: Partition) -> Iterator[np.ndarray]:
+        """Record arrays of at most chunk_rows; views into a memmap for uncompressed partitions"""
+        itemsize = RECORD_DTYPE.itemsize
+        if partition.compressed:
+            with gzip.open(partition.path, 'rb') as f:
+                while True:
+                    data = f.read(self.chunk_rows * itemsize)
+                    rows = len(data) // itemsize
+                    if rows:
+                        yield np.frombuffer(data, dtype=RECORD_DTYPE, count=rows)
+                    if len(data) < self.chunk_rows * itemsize:
+                        return
+        rows = os.path.getsize(partition.path) // itemsize
+        if not rows:
+            return
+        records = np.memmap(partition.path, dtype=RECORD_DTYPE, mode='r', shape=(rows,))
+        for offset in range(0, rows, self.chunk_rows):
+            yield records[offset:offset + self.chunk_rows]
+
+    def scan(self, mask_fn: Callable[[np.ndarray], np.ndarray], start: Optional[float] = None,
+             end: Optional[float] = None, limit: Optional[int] = None) -> np.ndarray:
+        """Rows for which mask_fn(chunk) is true, between start and end, oldest first"""
+        matches = []
+        found = 0
+        for partition in self.partitions(start, end):
+            edge = (start is not None and partition.hour < start) or (end is not None and partition.hour + 3600 > end)
+            for chunk in self.chunks(partition):
+                mask = mask_fn(chunk)
+                if edge:
+                    if start is not None:
+                        mask &= chunk['time'] >= start
+                    if end is not None:
+                        mask &= chunk['time'] <= end
+                if mask.any():
+                    # Copy out so nothing keeps the memmap (or the decompressed chunk) alive
+                    selected = np.array(chunk[mask])
+                    matches.append(selected)
+                    found += len(selected)
+                    if limit is not None and found >= limit:
+                        return np.concatenate(matches)[:limit]
+        return np.concatenate(matches) if matches else np.empty(0, dtype=RECORD_DTYPE)
+
+    def sightings(self, registration: str = '', hex: str = '', callsign: str = '', start: Optional[float] = None,
+                  end: Optional[float] = None, limit: Optional[int] = None) -> np.ndarray:
+        """Every archived position of one airframe (by registration or hex) or callsign"""
+        criteria = [(field, value.strip().upper().encode('ascii'))
+                    for field, value in (('registration', registration), ('hex', hex), ('callsign', callsign))
+                    if value]
+        if not criteria:
+            raise ValueError("sightings needs a registration, hex or callsign")
+
+        def mask_fn(chunk):
+            mask = np.ones(len(chunk), dtype=bool)
+            for field, value in criteria:
+                mask &= chunk[field] == value
+            return mask
+
+        return self.scan(mask_fn, start, end, limit)
+
+    def in_box(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+               start: Optional[float] = None, end: Optional[float] = None, military_only: bool = True,
+               limit: Optional[int] = None) -> np.ndarray:
+        """Positions inside a lat/lon box between start and end"""
+        def mask_fn(chunk):
+            mask = ((chunk['lat'] >= lat_min) & (chunk['lat'] <= lat_max)
+                    & (chunk['lon'] >= lon_min) & (chunk['lon'] <= lon_max))
+            if military_only:
+                mask &= chunk['military'] == 1
+            return mask
+
+        return self.scan(mask_fn, start, end, limit)
+
+    def daily_type_counts(self, start: Optional[float] = None, end: Optional[float] = None,
+                          military_only: bool = False) -> Dict[str, Dict[str, int]]:
+        """Distinct airframes (by hex, else registration, else callsign) per UTC day and aircraft type"""
+        seen: Dict[str, Dict[str, set]] = defaultdict(lambda: defaultdict(set))
+        for partition in self.partitions(start, end):
+            day = datetime.fromtimestamp(partition.hour, tz=timezone.utc).strftime('%Y-%m-%d')
+            for chunk in self.chunks(partition):
+                mask = np.ones(len(chunk), dtype=bool)
+                if military_only:
+                    mask &= chunk['military'] == 1
+                if start is not None:
+                    mask &= chunk['time'] >= start
+                if end is not None:
+                    mask &= chunk['time'] <= end
+                chunk = chunk[mask]
+                if not len(chunk):
+                    continue
+                identity = np.where(chunk['hex'] != b'', chunk['hex'],
+                                    np.where(chunk['registration'] != b'', chunk['registration'], chunk['callsign']))
+                # One entry per distinct (type, airframe) in the chunk before touching Python sets
+                pairs = np.unique(np.rec.fromarrays([chunk['aircraft_code'], identity.astype('S10')]))
+                per_type = seen[day]
+                for aircraft_code, airframe in pairs.tolist():
+                    per_type[aircraft_code.decode('ascii')].add(airframe)
+        return {day: {aircraft_code or '?': len(airframes)
+                      for aircraft_code, airframes in sorted(per_type.items(), key=lambda item: -len(item[1]))}
+                for day, per_type in sorted(seen.items())}
+
+    def stats(self) -> Dict:
+        partitions = list_partitions(self.directory)
+        raw = [p for p in partitions if not p.compressed]
+        return {
+            'partitions': len(partitions),
+            'compressed': len(partitions) - len(raw),
+            'hot_rows': sum(os.path.getsize(p.path) // RECORD_DTYPE.itemsize for p in raw),
+            'bytes': sum(os.path.getsize(p.path) for p in partitions),
+            'first_hour': partitions[0].hour if partitions else None,
+            'last_hour': partitions[-1].hour if partitions else None,
+        }
+
+
+def format_rows(rows: np.ndarray) -> Iterator[str]:
+    for row in rows:
+        stamp = datetime.fromtimestamp(int(row['time']), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        yield (f"{stamp}  {row['callsign'].decode():8s} {row['registration'].decode():10s} "
+               f"{row['aircraft_code'].decode():6s} {row['hex'].decode():6s} {row['lat']:9.4f} {row['lon']:10.4f} "
+               f"{int(row['altitude']):6d} ft {int(row['ground_speed']):4d} kts{'  military' if row['military'] else ''}")
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Query the position archive")
+    parser.add_argument('--dir', default=Config.ARCHIVE_DIR or 'archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    sightings = commands.add_parser('sightings', help="positions of one airframe or callsign")
+    sightings.add_argument('--registration', default='')
+    sightings.add_argument('--hex', default='')
+    sightings.add_argument('--callsign', default='')
+
+    box = commands.add_parser('box', help="positions inside lat_min,lat_max,lon_min,lon_max")
+    box.add_argument('area')
+    box.add_argument('--all', action='store_true', help="include non-military traffic")
+
+    counts = commands.add_parser('counts', help="distinct airframes per day and type")
+    counts.add_argument('--military', action='store_true')
+
+    commands.add_parser('stats', help="partitions and disk use")
+    commands.add_parser('maintain', help="compress and expire partitions now")
+
+    for command in (sightings, box, counts):
+        command.add_argument('--start', type=parse_time)
+        command.add_argument('--end', type=parse_time)
+    for command in (sightings, box):
+        command.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    reader = ArchiveReader(args.dir)
+    if args.command == 'sightings':
+        rows = reader.sightings(args.registration, args.hex, args.callsign, args.start, args.end, args.limit)
+        print('\n'.join(format_rows(rows)) or "No sightings")
+    elif args.command == 'box':
+        from core.tiling import parse_area
+        lat_min, lat_max, lon_min, lon_max = parse_area(args.area)
+        rows = reader.in_box(lat_min, lat_max, lon_min, lon_max, args.start, args.end,
+                             military_only=not args.all, limit=args.limit)
+        print('\n'.join(format_rows(rows)) or "No positions in that box")
+    elif args.command == 'counts':
+        for day, per_type in reader.daily_type_counts(args.start, args.end, args.military).items():
+            print(f"{day}: " + ', '.join(f"{aircraft_code} {count}" for aircraft_code, count in per_type.items()))
+    elif args.command == 'stats':
+        stats = reader.stats()
+        print(f"{stats['partitions']} partitions ({stats['compressed']} compressed), "
+              f"{stats['hot_rows']} uncompressed rows, {stats['bytes'] / (1 << 20):.1f} MB")
+    elif args.command == 'maintain':
+        config = Config()
+        writer = ArchiveWriter(args.dir, compress_after=config.ARCHIVE_COMPRESS_AFTER_HOURS * 3600,
+                               retention=config.ARCHIVE_RETENTION_DAYS * 86400,
+                               max_bytes=int(config.ARCHIVE_MAX_MB * (1 << 20)))
+        writer.maintain(time.time(), force=True)
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
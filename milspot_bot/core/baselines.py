@@ -0,0 +1,278 @@
+"""
+Surge Baselines
+Rolling per-region, per-category, per-hour-of-week counts of military aircraft
+kept as exponentially weighted means and variances of each hour's average count, so a scan can be compared
+with what is usual for that place, aircraft category and time of week without
+rescanning history; state persists in SQLite
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+WEEK_SLOTS = 7 * 24
+ANY_HOUR = WEEK_SLOTS  # all-hours baseline, used until an hour-of-week slot has enough samples
+OTHER_CATEGORY = 'other'
+# Added to the variance so a cell that has always been empty still needs a few aircraft to surge
+VARIANCE_FLOOR = 0.25
+
+
+class Surge(NamedTuple):
+    region: str
+    category: str
+    count: int
+    mean: float
+    std: float
+    z: float
+    slot: int
+
+    def describe(self) -> str:
+        if self.slot == ANY_HOUR:
+            when = "any hour"
+        else:
+            weekday, hour = divmod(self.slot, 24)
+            when = f"{('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[weekday]} {hour:02d}:00 UTC"
+        return (f"📈 Surge: {self.count} {self.category} aircraft over {self.region.replace('_', ' ')} "
+                f"vs ~{self.mean:.1f} usual for {when}")
+
+
+def week_slot(timestamp: float) -> int:
+    """Hour of the week (0 = Monday 00:00 UTC)"""
+    moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    return moment.weekday() * 24 + moment.hour
+
+
+class SurgeBaseline:
+    """
+    One cell per (region, category, hour-of-week) plus an all-hours cell per
+    (region, category). Scans are judged against the cells but not folded into
+    them one by one: they are summed over the current hour, and when the hour
+    ends its mean count goes into the slot's cells as a single sample (zero for
+    cells with no aircraft all hour). A surge lasting the whole hour is thus
+    still measured against earlier weeks at its end, and memory is bounded by
+    regions x categories x 169 whatever the traffic
+    """
+
+    def __init__(self, region_index, engine, path: str = ':memory:', alpha: float = 0.05,
+                 z_threshold: float = 3.0, min_count: int = 2, min_samples: int = 4,
+                 clock: Callable[[], float] = time.time):
+        self.region_index = region_index
+        self.engine = engine
+        self.path = path
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_count = min_count
+        self.min_samples = min_samples
+        self.clock = clock
+        # (region, category, slot) -> [samples, mean, variance]
+        self._cells: Dict[Tuple[str, str, int], List[float]] = {}
+        # Samples taken per slot, so a cell first seen late starts as if it had counted zeros all along
+        self._slot_samples = [0] * (WEEK_SLOTS + 1)
+        # The hour being summed (hours since the epoch), its scan count and per-pair aircraft totals
+        self._visit_hour: Optional[int] = None
+        self._visit_scans = 0
+        self._visit_totals: Dict[Tuple[str, str], int] = {}
+        self._categories: Dict[str, str] = {}
+        self._rules_version = None
+        self.surges: Dict[Tuple[str, str], Surge] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS baselines (region TEXT NOT NULL, category TEXT NOT NULL, slot INTEGER NOT NULL,"
+            " samples INTEGER NOT NULL, mean REAL NOT NULL, variance REAL NOT NULL, PRIMARY KEY (region, category, slot))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS slots (slot INTEGER PRIMARY KEY, samples INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS visit (hour INTEGER PRIMARY KEY, scans INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS visit_totals (region TEXT NOT NULL, category TEXT NOT NULL,"
+                         " total INTEGER NOT NULL, PRIMARY KEY (region, category))")
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        with self._lock:
+            cells = self._db.execute("SELECT region, category, slot, samples, mean, variance FROM baselines").fetchall()
+            slots = self._db.execute("SELECT slot, samples FROM slots").fetchall()
+            visit = self._db.execute("SELECT hour, scans FROM visit").fetchone()
+            totals = self._db.execute("SELECT region, category, total FROM visit_totals").fetchall()
+        for region, category, slot, samples, mean, variance in cells:
+            self._cells[(region, category, slot)] = [samples, mean, variance]
+        for slot, samples in slots:
+            self._slot_samples[slot] = samples
+        # An hour cut short by a restart carries on where it stopped
+        if visit is not None:
+            self._visit_hour, self._visit_scans = visit
+            self._visit_totals = {(region, category): total for region, category, total in totals}
+        if cells:
+            logger.info("📊 Surge baselines loaded %s cells from %s", len(cells), self.path)
+
+    def category_of(self, aircraft_code: str) -> str:
+        """First rules category of the aircraft type, memoized per type until the rules change"""
+        if self._rules_version != self.engine.version:
+            self._categories.clear()
+            self._rules_version = self.engine.version
+        category = self._categories.get(aircraft_code)
+        if category is None:
+            categories = self.engine.current.categorize(aircraft_code)
+            category = self._categories[aircraft_code] = categories[0] if categories else OTHER_CATEGORY
+        return category
+
+    def key_of(self, flight: FlightRecord) -> Optional[Tuple[str, str]]:
+        region = self.region_index.first(flight.latitude, flight.longitude) if flight.latitude or flight.longitude else None
+        if region is None:
+            return None
+        return region, self.category_of(flight.aircraft_code)
+
+    def observe(self, flights: Sequence[FlightRecord], now: Optional[float] = None) -> Dict[Tuple[str, str], Surge]:
+        """Count this scan's military aircraft per region and category, flag surges, then fold the counts in"""
+        counts: Dict[Tuple[str, str], int] = {}
+        for flight in flights:
+            key = self.key_of(flight)
+            if key is not None:
+                counts[key] = counts.get(key, 0) + 1
+        return self._observe_counts(counts, now)
+
+    def observe_batch(self, batch, now: Optional[float] = None) -> Dict[Tuple[str, str], Surge]:
+        """Columnar counterpart of observe"""
+        counts: Dict[Tuple[str, str], int] = {}
+        if len(batch):
+            regions = np.where((batch.lat != 0) | (batch.lon != 0),
+                               self.region_index.classify_batch(batch.lat, batch.lon), -1)
+            categories = batch.aircraft_code.map_vocabulary(self.category_of, dtype=object)
+            inside = regions >= 0
+            names = self.region_index.names
+            pairs, tallies = np.unique(np.rec.fromarrays([regions[inside], categories[inside].astype(str)]),
+                                       return_counts=True)
+            for (region_id, category), count in zip(pairs.tolist(), tallies.tolist()):
+                counts[(names[region_id], category)] = count
+        return self._observe_counts(counts, now)
+
+    def _observe_counts(self, counts: Dict[Tuple[str, str], int], now: Optional[float]) -> Dict[Tuple[str, str], Surge]:
+        now = self.clock() if now is None else now
+        slot = week_slot(now)
+        hour = int(now // 3600)
+        finished = self._visit_hour is not None and hour != self._visit_hour
+        if finished:
+            self._fold_visit()
+        self._visit_hour = hour
+        pairs = {(region, category) for region, category, _ in self._cells} | set(counts)
+
+        surges = {}
+        for pair in pairs:
+            count = counts.get(pair, 0)
+            surge = self._test(pair, count, slot)
+            if surge is not None:
+                surges[pair] = surge
+        # The scan is learnt from only once its hour is over, so a surge is judged against the baseline it departs from
+        for pair, count in counts.items():
+            self._visit_totals[pair] = self._visit_totals.get(pair, 0) + count
+        self._visit_scans += 1
+        self.surges = surges
+
+        if surges:
+            logger.info("📈 %s surge(s): %s", len(surges), ', '.join(
+                f"{s.count} {s.category} over {s.region} (~{s.mean:.1f} usual)" for s in surges.values()))
+        if finished:
+            self.save()
+        return surges
+
+    def _fold_visit(self):
+        """Fold the finished hour's mean count per pair into its hour-of-week and all-hours cells"""
+        scans = self._visit_scans
+        if scans:
+            pairs = {(region, category) for region, category, _ in self._cells} | set(self._visit_totals)
+            for slot_key in (week_slot(self._visit_hour * 3600), ANY_HOUR):
+                samples = self._slot_samples[slot_key]
+                for pair in pairs:
+                    self._update((*pair, slot_key), self._visit_totals.get(pair, 0) / scans, samples)
+                self._slot_samples[slot_key] = samples + 1
+        self._visit_hour = None
+        self._visit_scans = 0
+        self._visit_totals = {}
+
+    def _stats(self, cell_key: Tuple[str, str, int]) -> Tuple[int, float, float]:
+        cell = self._cells.get(cell_key)
+        if cell is None:
+            # Never counted anything: every sample this slot has taken was zero
+            return self._slot_samples[cell_key[2]], 0.0, 0.0
+        return cell[0], cell[1], cell[2]
+
+    def _test(self, pair: Tuple[str, str], count: int, slot: int) -> Optional[Surge]:
+        if count < self.min_count:
+            return None
+        samples, mean, variance = self._stats((*pair, slot))
+        used = slot
+        if samples < self.min_samples:
+            samples, mean, variance = self._stats((*pair, ANY_HOUR))
+            used = ANY_HOUR
+            if samples < self.min_samples:
+                return None
+        std = math.sqrt(max(variance, mean) + VARIANCE_FLOOR)
+        z = (count - mean) / std
+        if z < self.z_threshold:
+            return None
+        return Surge(pair[0], pair[1], count, mean, std, z, used)
+
+    def _update(self, cell_key: Tuple[str, str, int], count: float, slot_samples: int):
+        cell = self._cells.get(cell_key)
+        if cell is None:
+            cell = self._cells[cell_key] = [slot_samples, 0.0, 0.0]
+        samples = cell[0] + 1
+        # Plain running mean for the first 1/alpha samples, exponential forgetting afterwards
+        alpha = max(self.alpha, 1.0 / samples)
+        diff = count - cell[1]
+        increment = alpha * diff
+        cell[0] = samples
+        cell[1] += increment
+        cell[2] = (1.0 - alpha) * (cell[2] + diff * increment)
+
+    def surge_for(self, flight: FlightRecord) -> Optional[Surge]:
+        """The surge, if any, that the flight's region and category are part of this scan"""
+        if not self.surges:
+            return None
+        key = self.key_of(flight)
+        return self.surges.get(key) if key is not None else None
+
+    def surge_mask(self, batch) -> np.ndarray:
+        """Rows of a FlightBatch whose region and category are surging this scan"""
+        mask = np.zeros(len(batch), dtype=bool)
+        if not self.surges or not len(batch):
+            return mask
+        regions = self.region_index.classify_batch(batch.lat, batch.lon)
+        categories = batch.aircraft_code.map_vocabulary(self.category_of, dtype=object)
+        names = self.region_index.names
+        for region, category in self.surges:
+            if region in names:
+                mask |= (regions == names.index(region)) & (categories == category)
+        return mask & ((batch.lat != 0) | (batch.lon != 0))
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def save(self):
+        """Write every cell back; run once an hour and at shutdown"""
+        rows = [(region, category, slot, int(samples), mean, variance)
+                for (region, category, slot), (samples, mean, variance) in self._cells.items()]
+        slots = [(slot, samples) for slot, samples in enumerate(self._slot_samples) if samples]
+        totals = [(region, category, total) for (region, category), total in self._visit_totals.items()]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO baselines VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.executemany("INSERT OR REPLACE INTO slots VALUES (?, ?)", slots)
+            self._db.execute("DELETE FROM visit")
+            self._db.execute("DELETE FROM visit_totals")
+            if self._visit_hour is not None:
+                self._db.execute("INSERT INTO visit VALUES (?, ?)", (self._visit_hour, self._visit_scans))
+                self._db.executemany("INSERT INTO visit_totals VALUES (?, ?, ?)", totals)
+            self._db.commit()
+
+    def close(self):
+        self.save()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,140 @@
+"""
+Military Classification Index
+Compiles the military identifier lists of the rules file into fast matchers
+shared by the scanner and the scorer
+"""
+
+from typing import Dict, Iterable, List, Optional
+from core.flight_record import FlightRecord
+
+
+class PrefixIndex:
+    """Answers "does any pattern prefix this string" with one set probe per distinct pattern length"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = frozenset(p for p in patterns if p)
+        self.lengths = sorted({len(p) for p in self.patterns})
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the shortest pattern that prefixes text, or None"""
+        if not text:
+            return None
+        patterns = self.patterns
+        text_len = len(text)
+        for length in self.lengths:
+            if length > text_len:
+                break
+            prefix = text[:length]
+            if prefix in patterns:
+                return prefix
+        return None
+
+    def __contains__(self, text: str) -> bool:
+        return self.match(text) is not None
+
+
+class SubstringAutomaton:
+    """Aho-Corasick automaton answering "does any pattern occur inside this string" in one pass"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = sorted({p for p in patterns if p})
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Optional[str]] = [None]
+        self._build()
+
+    def _build(self):
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                state = next_state
+            if self.output[state] is None:
+                self.output[state] = pattern
+
+        # Breadth-first pass to wire failure links; each state inherits the
+        # first match reachable through its failure chain
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                if self.output[child] is None:
+                    self.output[child] = self.output[self.fail[child]]
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the first pattern found while scanning text, or None"""
+        if not text:
+            return None
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+    def __contains__(self, text: str) -> bool:
+        return self.search(text) is not None
+
+
+class MilitaryClassifier:
+    """Compiled form of the military identifier lists"""
+
+    def __init__(self, callsigns: Iterable[str], aircraft_types: Iterable[str], operators: Iterable[str],
+                 reg_prefixes: Iterable[str]):
+        self.callsigns = PrefixIndex(callsigns)
+        self.reg_prefixes = PrefixIndex(reg_prefixes)
+        # Types are upper-cased to match the scanner's comparison; operators are
+        # kept verbatim because the scorer compares them against upper-cased text
+        self.aircraft_types = SubstringAutomaton(t.upper() for t in aircraft_types)
+        self.operators = SubstringAutomaton(operators)
+
+    def callsign_match(self, callsign: str) -> bool:
+        return (callsign or '').upper() in self.callsigns
+
+    def aircraft_type_match(self, aircraft_code: str) -> bool:
+        return (aircraft_code or '').upper() in self.aircraft_types
+
+    def operator_match(self, operator: str) -> bool:
+        return (operator or '').upper() in self.operators
+
+    def reg_match(self, registration: str) -> bool:
+        return (registration or '').upper() in self.reg_prefixes
+
+    # FlightRecord fields are already upper-cased, so they go straight to the indexes
+
+    def is_military_flight(self, flight: FlightRecord) -> bool:
+        """Scanner rule: military callsign prefix or military aircraft type"""
+        return flight.callsign in self.callsigns or flight.aircraft_code in self.aircraft_types
+
+    def is_military(self, flight: FlightRecord) -> bool:
+        """Scorer rule: callsign, aircraft type, operator/livery or registration prefix"""
+        return (flight.callsign in self.callsigns
+                or flight.aircraft_code in self.aircraft_types
+                or flight.operating_as in self.operators
+                or flight.painted_as in self.operators
+                or flight.registration in self.reg_prefixes)
+
+
+def get_classifier() -> MilitaryClassifier:
+    """Return the classifier of the currently loaded rules"""
+    from core.rules import get_rule_engine
+    return get_rule_engine().current.classifier
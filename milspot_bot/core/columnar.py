@@ -0,0 +1,220 @@
+"""
+Columnar Flight Batches
+Parses FlightRadar24 payloads straight into NumPy columns so filtering and
+scoring run as array operations; dicts are only built for surviving rows
+"""
+
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from core.flight_record import FlightRecord, parse_timestamp
+
+
+class StringColumn:
+    """Interned string column: one int32 code per row plus a vocabulary of distinct values"""
+
+    def __init__(self, codes: np.ndarray, vocabulary: List[str]):
+        self.codes = codes
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_values(cls, values: Sequence[Optional[str]]) -> 'StringColumn':
+        lookup: Dict[str, int] = {}
+        vocabulary: List[str] = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            value = value or ''
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(vocabulary)
+                vocabulary.append(value)
+            codes[i] = code
+        return cls(codes, vocabulary)
+
+    @classmethod
+    def concat(cls, columns: Sequence['StringColumn']) -> 'StringColumn':
+        """Join columns end to end, merging their vocabularies"""
+        lookup: Dict[str, int] = {}
+        vocabulary: List[str] = []
+        parts = []
+        for column in columns:
+            remap = np.empty(len(column.vocabulary), dtype=np.int32)
+            for i, value in enumerate(column.vocabulary):
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(vocabulary)
+                    vocabulary.append(value)
+                remap[i] = code
+            parts.append(remap[column.codes])
+        codes = np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
+        return cls(codes, vocabulary)
+    
+    def take(self, indices: np.ndarray) -> 'StringColumn':
+        return StringColumn(self.codes[indices], self.vocabulary)
+    
+    def compact(self) -> 'StringColumn':
+        """Same values with the vocabulary cut down to those still referenced, e.g. after take()"""
+        used, codes = np.unique(self.codes, return_inverse=True)
+        return StringColumn(codes.astype(np.int32), [self.vocabulary[i] for i in used.tolist()])
+
+    def map_vocabulary(self, fn, dtype=bool) -> np.ndarray:
+        """Evaluate fn once per distinct value and broadcast the result to every row"""
+        per_value = np.fromiter((fn(v) for v in self.vocabulary), dtype=dtype, count=len(self.vocabulary))
+        return per_value[self.codes]
+
+    def __getitem__(self, index: int) -> str:
+        return self.vocabulary[self.codes[index]]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class FlightBatch:
+    """One scan's worth of aircraft stored column-wise"""
+
+    NUMERIC_FIELDS = ('lat', 'lon', 'alt', 'gspeed', 'heading', 'timestamp')
+    STRING_FIELDS = ('callsign', 'aircraft_code', 'registration', 'hex', 'squawk', 'painted_as', 'operating_as')
+
+    def __init__(self, ids: StringColumn, numeric: Dict[str, np.ndarray], strings: Dict[str, StringColumn]):
+        self.ids = ids
+        self.numeric = numeric
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getattr__(self, name: str):
+        numeric = self.__dict__.get('numeric', {})
+        if name in numeric:
+            return numeric[name]
+        strings = self.__dict__.get('strings', {})
+        if name in strings:
+            return strings[name]
+        raise AttributeError(name)
+
+    @classmethod
+    def from_api_payload(cls, data: Dict) -> 'FlightBatch':
+        """Build a batch from the live flight-positions response body"""
+        rows = data.get('data') if isinstance(data, dict) else None
+        rows = [row for row in rows if isinstance(row, dict)] if isinstance(rows, list) else []
+        timestamps = StringColumn.from_values([row.get('timestamp') for row in rows])
+        epoch_per_value = np.array([parse_timestamp(v) for v in timestamps.vocabulary], dtype=np.float64)
+        numeric = {
+            'lat': _float_column(row.get('lat') for row in rows),
+            'lon': _float_column(row.get('lon') for row in rows),
+            'alt': _float_column(row.get('alt') for row in rows),
+            'gspeed': _float_column(row.get('gspeed') for row in rows),
+            'heading': _float_column(row.get('track') for row in rows),
+            'timestamp': epoch_per_value[timestamps.codes] if rows else np.empty(0, dtype=np.float64),
+        }
+        strings = {
+            'callsign': StringColumn.from_values([row.get('callsign') for row in rows]),
+            'aircraft_code': StringColumn.from_values([row.get('type') for row in rows]),
+            'registration': StringColumn.from_values([row.get('reg') for row in rows]),
+            'hex': StringColumn.from_values([row.get('hex') for row in rows]),
+            'squawk': StringColumn.from_values([row.get('squawk') for row in rows]),
+            'painted_as': StringColumn.from_values([row.get('painted_as') for row in rows]),
+            'operating_as': StringColumn.from_values([row.get('operating_as') for row in rows]),
+        }
+        ids = StringColumn.from_values([row.get('fr24_id') for row in rows])
+        return cls(ids, numeric, strings)
+
+    @classmethod
+    def from_feed_payload(cls, data: Dict) -> 'FlightBatch':
+        """Build a batch from the legacy feed.js response body"""
+        items = [(k, v) for k, v in data.items() if isinstance(v, list) and len(v) >= 17] if isinstance(data, dict) else []
+        numeric = {
+            'lat': _float_column(v[1] for _, v in items),
+            'lon': _float_column(v[2] for _, v in items),
+            'alt': _float_column(v[4] for _, v in items),
+            'gspeed': _float_column(v[5] for _, v in items),
+            'heading': _float_column(v[3] for _, v in items),
+            'timestamp': _float_column(v[10] for _, v in items),
+        }
+        strings = {
+            'callsign': StringColumn.from_values([v[16] for _, v in items]),
+            'aircraft_code': StringColumn.from_values([v[8] for _, v in items]),
+            'registration': StringColumn.from_values([v[9] for _, v in items]),
+            'hex': StringColumn.from_values([v[0] for _, v in items]),
+            'squawk': StringColumn.from_values([v[6] for _, v in items]),
+            'painted_as': StringColumn.from_values([''] * len(items)),
+            'operating_as': StringColumn.from_values([''] * len(items)),
+        }
+        ids = StringColumn.from_values([k for k, _ in items])
+        return cls(ids, numeric, strings)
+
+    def take(self, indices: np.ndarray) -> 'FlightBatch':
+        """Return a new batch holding only the given rows"""
+        return FlightBatch(
+            self.ids.take(indices),
+            {name: column[indices] for name, column in self.numeric.items()},
+            {name: column.take(indices) for name, column in self.strings.items()},
+        )
+
+    def filter(self, mask: np.ndarray) -> 'FlightBatch':
+        return self.take(np.flatnonzero(mask))
+    
+    def compact(self) -> 'FlightBatch':
+        """Drop vocabulary entries no row uses, so a filtered batch pickles small"""
+        return FlightBatch(self.ids.compact(), self.numeric,
+                           {name: column.compact() for name, column in self.strings.items()})
+    
+    @classmethod
+    def concat(cls, batches: Sequence['FlightBatch']) -> 'FlightBatch':
+        """Rows of every batch in order, as one batch"""
+        if not batches:
+            return cls.from_api_payload({})
+        return cls(
+            StringColumn.concat([batch.ids for batch in batches]),
+            {name: np.concatenate([batch.numeric[name] for batch in batches]) for name in cls.NUMERIC_FIELDS},
+            {name: StringColumn.concat([batch.strings[name] for batch in batches]) for name in cls.STRING_FIELDS},
+        )
+
+    def military_mask(self, classifier) -> np.ndarray:
+        """Scanner rule evaluated once per distinct callsign/type, then broadcast to rows"""
+        return (self.strings['callsign'].map_vocabulary(classifier.callsign_match)
+                | self.strings['aircraft_code'].map_vocabulary(classifier.aircraft_type_match))
+
+    def strict_military_mask(self, classifier) -> np.ndarray:
+        """Scorer rule: adds operator/livery and registration prefixes to the scanner rule"""
+        return (self.military_mask(classifier)
+                | self.strings['operating_as'].map_vocabulary(classifier.operator_match)
+                | self.strings['painted_as'].map_vocabulary(classifier.operator_match)
+                | self.strings['registration'].map_vocabulary(classifier.reg_match))
+
+    def box_mask(self, lat_min: float, lon_min: float, lat_max: float, lon_max: float) -> np.ndarray:
+        lat = self.numeric['lat']
+        lon = self.numeric['lon']
+        return (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+
+    def row(self, index: int) -> FlightRecord:
+        """Materialize a single row as a FlightRecord"""
+        strings = self.strings
+        numeric = self.numeric
+        record = FlightRecord(
+            self.ids[index],
+            strings['callsign'][index],
+            strings['aircraft_code'][index],
+            strings['registration'][index],
+            strings['hex'][index],
+            strings['painted_as'][index],
+            strings['operating_as'][index],
+            squawk=strings['squawk'][index],
+            latitude=float(numeric['lat'][index]),
+            longitude=float(numeric['lon'][index]),
+            heading=float(numeric['heading'][index]),
+            timestamp=float(numeric['timestamp'][index]),
+        )
+        # Whole feet and knots, as FlightRecord.from_api keeps them, so alerts read the same in both modes
+        record.altitude = int(numeric['alt'][index])
+        record.ground_speed = int(numeric['gspeed'][index])
+        return record
+
+    def to_records(self, indices: Optional[np.ndarray] = None) -> List[FlightRecord]:
+        if indices is None:
+            indices = range(len(self))
+        return [self.row(int(i)) for i in indices]
+
+
+def _float_column(values) -> np.ndarray:
+    return np.fromiter((v if isinstance(v, (int, float)) else 0.0 for v in values), dtype=np.float64)
+
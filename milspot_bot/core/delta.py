@@ -0,0 +1,131 @@
+"""
+Delta Polling
+Diffs each scan against the previous snapshot so classification runs only for
+new identities and scoring only for aircraft whose scoring inputs changed
+"""
+
+import logging
+from operator import attrgetter
+from typing import Callable, Dict, Hashable, List, NamedTuple, Tuple
+from core.flight_record import FlightRecord
+from core.tiling import flight_key
+
+logger = logging.getLogger(__name__)
+
+KINEMATIC_FIELDS = ('latitude', 'longitude', 'altitude', 'ground_speed', 'heading')
+
+
+class SnapshotDelta(NamedTuple):
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+    unchanged: List[str]
+
+
+_identity_fields = attrgetter('callsign', 'aircraft_code', 'registration', 'hex')
+kinematics_of = attrgetter(*KINEMATIC_FIELDS)
+# Per-flight fields the score depends on besides position
+score_fields_of = attrgetter('callsign', 'aircraft_code', 'registration', 'squawk', 'painted_as', 'operating_as')
+
+
+def identity_of(flight: FlightRecord) -> tuple:
+    """
+    Everything the military verdict depends on: the payload identity plus the
+    metadata military flag, which belongs to the hex, so hex-only aircraft never
+    share a verdict
+    """
+    return _identity_fields(flight) + (flight.get('military'),)
+
+
+def score_inputs_of(flight: FlightRecord) -> tuple:
+    """Everything about one flight its score is computed from, including enrichment and track pattern"""
+    return kinematics_of(flight), score_fields_of(flight), flight.get('military'), flight.get('track_pattern')
+
+
+class DeltaTracker:
+    def __init__(self, classify: Callable[[FlightRecord], bool]):
+        self.classify = classify
+        self._kinematics: Dict[str, tuple] = {}
+        self._verdicts: Dict[tuple, bool] = {}
+        self._scores: Dict[str, Tuple[tuple, int]] = {}
+        self._scan_inputs: Hashable = None
+        self.last_delta = SnapshotDelta([], [], [], [])
+        self.classifications = 0
+        self.scorings = 0
+
+    def update(self, flights: List[FlightRecord]) -> List[FlightRecord]:
+        """
+        Record a new snapshot and return its military flights; verdicts are reused
+        for identities seen in the previous snapshot
+        """
+        previous = self._kinematics
+        previous_verdicts = self._verdicts
+        current: Dict[str, tuple] = {}
+        verdicts: Dict[tuple, bool] = {}
+        added, changed, unchanged = [], [], []
+        military = []
+
+        for flight in flights:
+            key = flight_key(flight)
+            identity = identity_of(flight)
+
+            verdict = verdicts.get(identity)
+            if verdict is None:
+                verdict = previous_verdicts.get(identity)
+                if verdict is None:
+                    verdict = self.classify(flight)
+                    self.classifications += 1
+                verdicts[identity] = verdict
+            if verdict:
+                military.append(flight)
+
+            if key is None:
+                continue
+            kinematics = kinematics_of(flight)
+            current[key] = kinematics
+            old = previous.get(key)
+            if old is None:
+                added.append(key)
+            elif old != kinematics:
+                changed.append(key)
+            else:
+                unchanged.append(key)
+
+        removed = [key for key in previous if key not in current]
+        for key in removed:
+            self._scores.pop(key, None)
+
+        # Only identities present in this snapshot are carried forward, which keeps
+        # the verdict cache bounded by live traffic
+        self._kinematics = current
+        self._verdicts = verdicts
+        self.last_delta = SnapshotDelta(added, removed, changed, unchanged)
+        logger.info("🔄 Delta: +%s -%s ~%s =%s (%s identities cached)",
+                    len(added), len(removed), len(changed), len(unchanged), len(verdicts))
+        return military
+
+    def invalidate(self):
+        """Forget cached verdicts and scores, e.g. after the rules changed; kinematics are kept"""
+        self._verdicts = {}
+        self._scores = {}
+
+    def set_scan_inputs(self, inputs: Hashable):
+        """Forget cached scores when the scan-wide scoring inputs (e.g. active surges) differ from the last scan's"""
+        if inputs != self._scan_inputs:
+            self._scores = {}
+            self._scan_inputs = inputs
+
+    def score(self, flight: FlightRecord, score_fn: Callable[[FlightRecord], int]) -> int:
+        """Return the cached score unless the aircraft has moved or its other scoring inputs changed"""
+        key = flight_key(flight)
+        if key is None:
+            self.scorings += 1
+            return score_fn(flight)
+        inputs = score_inputs_of(flight)
+        cached = self._scores.get(key)
+        if cached is not None and cached[0] == inputs:
+            return cached[1]
+        score = score_fn(flight)
+        self.scorings += 1
+        self._scores[key] = (inputs, score)
+        return score
@@ -0,0 +1,211 @@
+"""
+Notification Dispatch Queue
+Delivers WhatsApp messages from a background worker pool with per-recipient
+coalescing, token-bucket rate limiting and exponential backoff on 429/5xx
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Twilio rejects message bodies longer than this
+MAX_BODY_LENGTH = 1600
+COALESCE_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available"""
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is taken"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limiting, server errors and transport failures are worth retrying; other 4xx are not"""
+    status = getattr(error, 'status', None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+def pack(bodies: List[str], limit: int = MAX_BODY_LENGTH) -> Iterator[Tuple[str, int]]:
+    """(message, number of bodies in it) for queued bodies packed in order into as few messages as fit"""
+    current = ''
+    count = 0
+    for body in bodies:
+        if len(body) > limit:
+            body = body[:limit - 1] + '…'
+        if not current:
+            current = body
+        elif len(current) + len(COALESCE_SEPARATOR) + len(body) <= limit:
+            current += COALESCE_SEPARATOR + body
+        else:
+            yield current, count
+            current = body
+            count = 0
+        count += 1
+    if current:
+        yield current, count
+
+
+def coalesce(bodies: List[str], limit: int = MAX_BODY_LENGTH) -> List[str]:
+    """Pack queued bodies for one recipient into as few messages as fit Twilio's length limit"""
+    return [message for message, _ in pack(bodies, limit)]
+
+
+def report(on_done: Optional[Callable[[bool], None]], delivered: bool):
+    """Hand a delivery outcome to its callback; a failing callback is logged, never propagated"""
+    if on_done is None:
+        return
+    try:
+        on_done(delivered)
+    except Exception as e:
+        logger.error("❌ Delivery callback failed: %s", e)
+
+
+class DispatchQueue:
+    """
+    Background delivery for send(to, body) callables that raise on failure;
+    submit() only enqueues, so a slow provider never delays the scan loop, and
+    reports each body's final outcome through its on_done callback
+    """
+
+    def __init__(self, send: Callable[[str, str], object], workers: int = 2, rate: float = 1.0, burst: float = 1.0,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 coalesce_window: float = 0.5):
+        self._send = send
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce_window = coalesce_window
+
+        # Recipient -> queued (body, on_done) pairs
+        self._pending: Dict[str, List[Tuple[str, Optional[Callable[[bool], None]]]]] = {}
+        self._lock = threading.Lock()
+        self._ready: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.coalesced = 0
+
+        self._workers = [threading.Thread(target=self._work, name=f"dispatch-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, to: str, body: str, on_done: Optional[Callable[[bool], None]] = None):
+        """
+        Queue a message; bodies for a recipient that is already waiting are merged
+        into its delivery. on_done(delivered) runs on a worker once the message
+        carrying this body was accepted, or given up on
+        """
+        with self._lock:
+            bodies = self._pending.get(to)
+            if bodies is not None:
+                bodies.append((body, on_done))
+                self.coalesced += 1
+                return
+            self._pending[to] = [(body, on_done)]
+        self._ready.put(to)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(bodies) for bodies in self._pending.values())
+
+    def _work(self):
+        while True:
+            to = self._ready.get()
+            try:
+                if to is None:
+                    return
+                # Give alerts raised in the same scan a moment to land in the same message
+                if self.coalesce_window > 0 and not self._stop.is_set():
+                    self._stop.wait(self.coalesce_window)
+                with self._lock:
+                    queued = self._pending.pop(to, [])
+                callbacks = iter([on_done for _, on_done in queued])
+                for message, count in pack([body for body, _ in queued]):
+                    delivered = self._deliver(to, message)
+                    for _ in range(count):
+                        report(next(callbacks), delivered)
+            finally:
+                self._ready.task_done()
+
+    def _deliver(self, to: str, body: str) -> bool:
+        attempt = 0
+        while True:
+            # Queued alerts still respect the rate limit while shutting down
+            self.bucket.acquire()
+            try:
+                self._send(to, body)
+                self.sent += 1
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self.failed += 1
+                    logger.error("❌ Giving up on WhatsApp message to %s after %s attempts: %s", to, attempt + 1, e)
+                    return False
+                # Full-jitter exponential backoff
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.retried += 1
+                logger.warning("⚠️ WhatsApp send to %s failed (%s); retry %s/%s in %.1fs",
+                               to, e, attempt, self.max_retries, delay)
+                time.sleep(delay)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been delivered or dropped"""
+        done = threading.Event()
+
+        def wait():
+            self._ready.join()
+            done.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Skip remaining coalescing waits, drain the queue and stop the workers"""
+        self._stop.set()
+        drained = self.flush(timeout)
+        for _ in self._workers:
+            self._ready.put(None)
+        for worker in self._workers:
+            worker.join(timeout=1.0)
+        logger.info("📨 Dispatch queue closed: %s sent, %s failed, %s retries, %s coalesced",
+                    self.sent, self.failed, self.retried, self.coalesced)
+        return drained
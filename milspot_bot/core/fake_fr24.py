@@ -0,0 +1,171 @@
+"""
+Fake FR24 Endpoint
+Local stand-in for the live flight-positions API that serves a fixed payload
+with gzip, ETag/Last-Modified validators and scripted failures, so the fetch
+client's retry, circuit breaker and conditional-request paths can be exercised
+
+Run from milspot_bot/:  python3 -m core.fake_fr24 --port 8766 --size 20000 --fail-every 4
+then point the bot at it with FR24_API_BASE_URL=http://127.0.0.1:8766 FR24_API_KEY=test
+"""
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+POSITIONS_PATH = '/api/live/flight-positions/full'
+
+
+class FakeFR24Server:
+    """
+    Answers GET /api/live/flight-positions/full with the current payload;
+    set_payload() changes it (and its validators), fail_next() scripts
+    failures such as (429, 2) for a 429 with Retry-After: 2
+    """
+
+    def __init__(self, payload: Optional[Dict] = None, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, fail_every: int = 0, fail_status: int = 503):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.requests: List[Dict] = []
+        self.not_modified = 0
+        self.failures = 0
+        self._scripted: List[Tuple[int, Optional[int]]] = []
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.set_payload(payload if payload is not None else {'data': []})
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_payload(self, payload: Dict):
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self.body = body
+            self.gzipped = gzip.compress(body, compresslevel=5)
+            self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            self.modified_at = int(time.time())
+
+    def fail_next(self, *failures):
+        """Queue failures: an int status, or a (status, retry_after_seconds) pair"""
+        with self._lock:
+            for failure in failures:
+                self._scripted.append(failure if isinstance(failure, tuple) else (failure, None))
+
+    def _next_failure(self) -> Optional[Tuple[int, Optional[int]]]:
+        with self._lock:
+            if self._scripted:
+                return self._scripted.pop(0)
+            number = next(self._counter)
+        if self.fail_every and number % self.fail_every == 0:
+            return self.fail_status, None
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests.append({'path': self.path, 'headers': dict(self.headers), 'at': time.time()})
+                if self.path.split('?', 1)[0] != POSITIONS_PATH:
+                    return self._reply(404, json.dumps({'message': 'Not found'}).encode('utf-8'))
+                if server.latency:
+                    time.sleep(server.latency)
+                failure = server._next_failure()
+                if failure is not None:
+                    status, retry_after = failure
+                    with server._lock:
+                        server.failures += 1
+                    headers = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+                    return self._reply(status, json.dumps({'message': 'Injected failure'}).encode('utf-8'), headers)
+
+                with server._lock:
+                    body, gzipped, etag, modified_at = server.body, server.gzipped, server.etag, server.modified_at
+                validators = {'ETag': etag, 'Last-Modified': formatdate(modified_at, usegmt=True)}
+                if self._not_modified(etag, modified_at):
+                    with server._lock:
+                        server.not_modified += 1
+                    return self._reply(304, b'', validators)
+                if 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+                    return self._reply(200, gzipped, dict(validators, **{'Content-Encoding': 'gzip'}))
+                self._reply(200, body, validators)
+
+            def _not_modified(self, etag: str, modified_at: int) -> bool:
+                if_none_match = self.headers.get('If-None-Match')
+                if if_none_match is not None:
+                    return etag in [tag.strip() for tag in if_none_match.split(',')]
+                if_modified_since = self.headers.get('If-Modified-Since')
+                if if_modified_since:
+                    try:
+                        return modified_at <= parsedate_to_datetime(if_modified_since).timestamp()
+                    except (TypeError, ValueError):
+                        return False
+                return False
+
+            def _reply(self, status: int, data: bytes, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                if status != 304:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'FakeFR24Server':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-fr24', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake FR24 live flight-positions API")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--size', type=int, default=20000, help="synthetic aircraft to serve")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to hold each request")
+    parser.add_argument('--fail-every', type=int, default=0, help="fail every Nth request (0 never fails)")
+    parser.add_argument('--fail-status', type=int, default=503)
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import TrafficGenerator
+
+    server = FakeFR24Server(TrafficGenerator().payload(args.size), port=args.port, latency=args.latency,
+                            fail_every=args.fail_every, fail_status=args.fail_status)
+    print(f"📡 Fake FR24 serving {args.size} aircraft on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📨 Served {len(server.requests)} requests ({server.not_modified} not modified, "
+              f"{server.failures} injected failures)")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Fake Twilio Endpoint
+Local stand-in for the Twilio Messages API so the dispatch queue can be
+exercised without credentials, quota or network access
+
+Run from milspot_bot/:  python3 -m core.fake_twilio --port 8765 --fail-every 3
+then point the bot at it with TWILIO_API_BASE_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+
+class FakeTwilioServer:
+    """
+    Accepts POST /2010-04-01/Accounts/<sid>/Messages.json and records each message;
+    scripted failures and latency let callers exercise retry and backpressure paths
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, fail_every: int = 0,
+                 fail_status: int = 429):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.messages: List[Dict] = []
+        self.failures = 0
+        self._scripted: List[int] = []
+        self._requests = itertools.count(1)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *statuses: int):
+        """Answer the next requests with these HTTP statuses, in order"""
+        with self._lock:
+            self._scripted.extend(statuses)
+
+    def _next_failure(self):
+        with self._lock:
+            if self._scripted:
+                return self._scripted.pop(0)
+            number = next(self._requests)
+        if self.fail_every and number % self.fail_every == 0:
+            return self.fail_status
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.endswith('/Messages.json'):
+                    return self._reply(404, {'code': 20404, 'message': 'Not found', 'status': 404})
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+                if server.latency:
+                    time.sleep(server.latency)
+                status = server._next_failure()
+                if status is not None:
+                    with server._lock:
+                        server.failures += 1
+                    return self._reply(status, {'code': 20429 if status == 429 else 20500,
+                                                'message': 'Injected failure', 'status': status})
+                with server._lock:
+                    sid = f"SM{len(server.messages) + 1:032x}"
+                    server.messages.append({'sid': sid, 'from': form.get('From'), 'to': form.get('To'),
+                                            'body': form.get('Body'), 'received_at': time.time()})
+                self._reply(201, {'sid': sid, 'status': 'queued', 'from': form.get('From'), 'to': form.get('To'),
+                                  'body': form.get('Body'), 'num_segments': '1', 'direction': 'outbound-api'})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'FakeTwilioServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='fake-twilio', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Twilio Messages API")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to hold each request")
+    parser.add_argument('--fail-every', type=int, default=0, help="fail every Nth request (0 never fails)")
+    parser.add_argument('--fail-status', type=int, default=429)
+    args = parser.parse_args()
+
+    server = FakeTwilioServer(port=args.port, latency=args.latency, fail_every=args.fail_every,
+                              fail_status=args.fail_status)
+    print(f"📡 Fake Twilio listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📨 Received {len(server.messages)} messages ({server.failures} injected failures)")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
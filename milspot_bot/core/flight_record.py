@@ -0,0 +1,211 @@
+"""
+Flight Records
+The one per-aircraft type every feed source parses into and every stage reads:
+fixed slots instead of a dict per aircraft, one set of field names, and
+identity strings stripped, upper-cased and interned once at parse time
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, Tuple
+
+# Compared against the rules, so always upper-case
+IDENTITY_FIELDS = ('callsign', 'aircraft_code', 'registration', 'hex', 'painted_as', 'operating_as')
+TEXT_FIELDS = ('id', 'squawk', 'origin_airport', 'destination_airport')
+NUMERIC_FIELDS = ('latitude', 'longitude', 'altitude', 'ground_speed', 'heading', 'timestamp')
+FIELDS = TEXT_FIELDS[:1] + IDENTITY_FIELDS + TEXT_FIELDS[1:] + NUMERIC_FIELDS
+# Filled in after parsing (metadata enrichment, track analysis); absent until then
+LATE_FIELDS = ('owner', 'military', 'track_pattern')
+
+_KEYS = frozenset(FIELDS + LATE_FIELDS)
+_IDENTITY = frozenset(IDENTITY_FIELDS)
+_TEXT = frozenset(TEXT_FIELDS)
+_NUMERIC = frozenset(NUMERIC_FIELDS)
+
+NORMALIZED_CACHE_SIZE = 200000
+
+
+class _Normalized(dict):
+    """
+    Raw value -> stripped, upper-cased, interned value. A subscript is a plain
+    dict hit for every value seen before, which across scans is nearly all of them
+    """
+
+    def __missing__(self, value: Any) -> str:
+        normalized = sys.intern(str(value).strip().upper()) if value else ''
+        if len(self) >= NORMALIZED_CACHE_SIZE:
+            self.clear()
+        self[value] = normalized
+        return normalized
+
+
+_normalized = _Normalized()
+_timestamps: Dict[str, float] = {}
+_new = object.__new__
+
+
+def normalize(value: Any) -> str:
+    """Stripped, upper-cased, interned form of an identity field; '' for None"""
+    return _normalized[value]
+
+
+def text(value: Any) -> str:
+    return str(value) if value else ''
+
+
+def number(value: Any) -> float:
+    """Numeric fields as float; 0.0 when missing or not a number, like the columnar parser"""
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def parse_timestamp(value: Any) -> float:
+    """ISO-8601 timestamp (or epoch number) to epoch seconds; 0 when missing or malformed"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    cached = _timestamps.get(value)
+    if cached is None:
+        try:
+            cached = datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except (AttributeError, ValueError):
+            cached = 0.0
+        if len(_timestamps) >= NORMALIZED_CACHE_SIZE:
+            _timestamps.clear()
+        _timestamps[value] = cached
+    return cached
+
+
+class FlightRecord:
+    """
+    One aircraft position. Fields are attributes; the dict-style get(),
+    [] and `in` still work for code written against the old flight dicts
+    """
+
+    __slots__ = FIELDS + LATE_FIELDS
+
+    def __init__(self, id: str = '', callsign: str = '', aircraft_code: str = '', registration: str = '',
+                 hex: str = '', painted_as: str = '', operating_as: str = '', squawk: str = '',
+                 origin_airport: str = '', destination_airport: str = '', latitude: float = 0.0,
+                 longitude: float = 0.0, altitude: float = 0.0, ground_speed: float = 0.0, heading: float = 0.0,
+                 timestamp: float = 0.0):
+        normalized = _normalized
+        self.id = text(id)
+        self.callsign = normalized[callsign]
+        self.aircraft_code = normalized[aircraft_code]
+        self.registration = normalized[registration]
+        self.hex = normalized[hex]
+        self.painted_as = normalized[painted_as]
+        self.operating_as = normalized[operating_as]
+        self.squawk = text(squawk)
+        self.origin_airport = text(origin_airport)
+        self.destination_airport = text(destination_airport)
+        self.latitude = number(latitude)
+        self.longitude = number(longitude)
+        self.altitude = number(altitude)
+        self.ground_speed = number(ground_speed)
+        self.heading = number(heading)
+        self.timestamp = number(timestamp)
+
+    # The feed parsers below skip __init__: they run once per aircraft per scan.
+    # Payload values are taken as sent apart from upper-casing and defaults for
+    # missing ones; only the low-cardinality type and operator codes go through
+    # the interning cache, since per-aircraft callsigns, registrations and hex
+    # codes would only churn it
+
+    @classmethod
+    def from_api(cls, aircraft: Dict) -> 'FlightRecord':
+        """One entry of the live flight-positions response"""
+        get = aircraft.get
+        normalized = _normalized
+        record = _new(cls)
+        record.id = get('fr24_id') or ''
+        record.callsign = (get('callsign') or '').upper()
+        record.aircraft_code = normalized[get('type')]
+        record.registration = (get('reg') or '').upper()
+        record.hex = (get('hex') or '').upper()
+        record.painted_as = normalized[get('painted_as')]
+        record.operating_as = normalized[get('operating_as')]
+        record.squawk = get('squawk') or ''
+        record.origin_airport = get('orig_iata') or ''
+        record.destination_airport = get('dest_iata') or ''
+        record.latitude = get('lat') or 0.0
+        record.longitude = get('lon') or 0.0
+        record.altitude = get('alt') or 0
+        record.ground_speed = get('gspeed') or 0
+        record.heading = get('track') or 0
+        record.timestamp = parse_timestamp(get('timestamp'))
+        return record
+
+    @classmethod
+    def from_feed(cls, flight_id: str, values: list) -> 'FlightRecord':
+        """One feed.js row: [hex, lat, lon, track, alt, speed, squawk, _, type, reg, time, origin, dest, ..., callsign]"""
+        normalized = _normalized
+        record = _new(cls)
+        record.id = flight_id
+        record.callsign = (values[16] or '').upper()
+        record.aircraft_code = normalized[values[8]]
+        record.registration = (values[9] or '').upper()
+        record.hex = (values[0] or '').upper()
+        record.painted_as = ''
+        record.operating_as = ''
+        record.squawk = values[6] or ''
+        record.origin_airport = values[11] or ''
+        record.destination_airport = values[12] or ''
+        record.latitude = values[1] or 0.0
+        record.longitude = values[2] or 0.0
+        record.altitude = values[4] or 0
+        record.ground_speed = values[5] or 0
+        record.heading = values[3] or 0
+        record.timestamp = values[10] or 0
+        return record
+
+    # Dict-style access, restricted to the record's own fields
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _KEYS:
+            return getattr(self, key, default)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _KEYS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in _KEYS:
+            raise KeyError(f"FlightRecord has no field {key!r}")
+        if key in _IDENTITY:
+            value = _normalized[value]
+        elif key in _TEXT:
+            value = text(value)
+        elif key in _NUMERIC:
+            value = number(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in _KEYS and hasattr(self, key)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self) -> Iterator[str]:
+        return (key for key in self.__slots__ if hasattr(self, key))
+
+    __iter__ = keys
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((key, getattr(self, key)) for key in self.keys())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return (f"FlightRecord(id={self.id!r}, callsign={self.callsign!r}, aircraft_code={self.aircraft_code!r}, "
+                f"registration={self.registration!r}, latitude={self.latitude}, longitude={self.longitude})")
+
@@ -0,0 +1,239 @@
+"""
+Geofence Spatial Index
+Uniform-grid index over rectangular and polygonal geofences with antimeridian
+support and batched point classification
+"""
+
+import json
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+Ring = List[Tuple[float, float]]  # (lon, lat) vertices
+
+
+class Geofence:
+    """A named area: either an inclusive lat/lon box or a set of polygon rings (even-odd fill)"""
+
+    def __init__(self, name: str, rings: Sequence[Ring], box: Optional[Tuple[float, float, float, float]] = None):
+        self.name = name
+        self.box = box  # (lat_min, lon_min, lat_max, lon_max) for rectangular fences
+        self.rings = [np.asarray(ring, dtype=np.float64) for ring in rings]
+        if box is not None:
+            self.lat_min, self.lon_min, self.lat_max, self.lon_max = box
+        else:
+            lons = np.concatenate([ring[:, 0] for ring in self.rings])
+            lats = np.concatenate([ring[:, 1] for ring in self.rings])
+            self.lat_min, self.lat_max = float(lats.min()), float(lats.max())
+            self.lon_min, self.lon_max = float(lons.min()), float(lons.max())
+
+    @classmethod
+    def from_box(cls, name: str, lat_min: float, lon_min: float, lat_max: float, lon_max: float) -> List['Geofence']:
+        """Rectangular fence; a box with lon_min > lon_max wraps across the antimeridian"""
+        if lon_min > lon_max:
+            return [cls(name, [], (lat_min, lon_min, lat_max, 180.0)),
+                    cls(name, [], (lat_min, -180.0, lat_max, lon_max))]
+        return [cls(name, [], (lat_min, lon_min, lat_max, lon_max))]
+
+    @classmethod
+    def from_polygon(cls, name: str, rings: Sequence[Ring]) -> List['Geofence']:
+        """
+        Polygon fence from (lon, lat) rings; polygons crossing the antimeridian are
+        unwrapped and indexed twice, once on each side of +/-180
+        """
+        rings = [list(ring) for ring in rings if len(ring) >= 3]
+        if not rings:
+            return []
+        if not _crosses_antimeridian(rings):
+            return [cls(name, rings)]
+        unwrapped = [[(lon + 360.0 if lon < 0 else lon, lat) for lon, lat in ring] for ring in rings]
+        shifted = [[(lon - 360.0, lat) for lon, lat in ring] for ring in unwrapped]
+        return [cls(name, unwrapped), cls(name, shifted)]
+
+    def contains(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Vectorized membership test for arrays of positions"""
+        bbox = (lats >= self.lat_min) & (lats <= self.lat_max) & (lons >= self.lon_min) & (lons <= self.lon_max)
+        if self.box is not None or not bbox.any():
+            return bbox
+        inside = np.zeros(len(lats), dtype=bool)
+        candidates = np.flatnonzero(bbox)
+        px = lons[candidates]
+        py = lats[candidates]
+        # Even-odd ray casting over every (point, edge) pair at once; holes fall out
+        # naturally from the extra rings
+        xi, yi, xj, yj, slope = self._edges
+        py_col = py[:, None]
+        straddles = (yi > py_col) != (yj > py_col)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = slope * (py_col - yi) + xi
+        crossings = np.count_nonzero(straddles & (px[:, None] < x_cross), axis=1)
+        inside[candidates] = (crossings & 1).astype(bool)
+        return inside
+
+    @property
+    def _edges(self):
+        """Edge endpoint arrays of all rings, cached on first use"""
+        edges = self.__dict__.get('_edge_cache')
+        if edges is None:
+            xi = np.concatenate([ring[:, 0] for ring in self.rings])
+            yi = np.concatenate([ring[:, 1] for ring in self.rings])
+            xj = np.concatenate([np.roll(ring[:, 0], 1) for ring in self.rings])
+            yj = np.concatenate([np.roll(ring[:, 1], 1) for ring in self.rings])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slope = (xj - xi) / (yj - yi)
+            edges = self._edge_cache = (xi, yi, xj, yj, slope)
+        return edges
+
+
+def _crosses_antimeridian(rings: Sequence[Ring]) -> bool:
+    for ring in rings:
+        for (lon_a, _), (lon_b, _) in zip(ring, ring[1:] + ring[:1]):
+            if abs(lon_a - lon_b) > 180.0:
+                return True
+    return False
+
+
+class GeofenceIndex:
+    """Uniform lat/lon grid mapping each cell to the fences overlapping it"""
+
+    def __init__(self, fences: Iterable[Geofence], cell_size: float = 5.0):
+        self.cell_size = cell_size
+        self.fences: List[Geofence] = list(fences)
+        self.names: List[str] = []
+        name_ids: Dict[str, int] = {}
+        self._fence_name_ids: List[int] = []
+        for fence in self.fences:
+            if fence.name not in name_ids:
+                name_ids[fence.name] = len(self.names)
+                self.names.append(fence.name)
+            self._fence_name_ids.append(name_ids[fence.name])
+
+        self._cols = int(math.ceil(360.0 / cell_size))
+        self._cells: Dict[int, List[int]] = defaultdict(list)
+        self._fence_cells: List[List[int]] = []
+        for fence_id, fence in enumerate(self.fences):
+            row_lo, col_lo = self._cell(fence.lat_min, max(fence.lon_min, -180.0))
+            row_hi, col_hi = self._cell(fence.lat_max, min(fence.lon_max, 180.0))
+            cells = [row * self._cols + col
+                     for row in range(row_lo, row_hi + 1)
+                     for col in range(col_lo, col_hi + 1)]
+            self._fence_cells.append(cells)
+            for cell in cells:
+                self._cells[cell].append(fence_id)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = int((min(max(lat, -90.0), 90.0) + 90.0) // self.cell_size)
+        col = int((min(max(lon, -180.0), 180.0) + 180.0) // self.cell_size)
+        return row, min(col, self._cols - 1)
+
+    def classify_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Index into self.names of the first matching fence (in load order) for every
+        position, or -1 outside all fences
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(len(lats), -1, dtype=np.int64)
+        if not self.fences or not len(lats):
+            return result
+
+        rows = ((np.clip(lats, -90.0, 90.0) + 90.0) // self.cell_size).astype(np.int64)
+        cols = np.minimum(((np.clip(lons, -180.0, 180.0) + 180.0) // self.cell_size).astype(np.int64), self._cols - 1)
+        cell_ids = rows * self._cols + cols
+
+        # Bucket points by grid cell once, then hand each fence only the points in its cells
+        order = np.argsort(cell_ids, kind='stable')
+        sorted_cells = cell_ids[order]
+        occupied, starts = np.unique(sorted_cells, return_index=True)
+        ends = np.append(starts[1:], len(sorted_cells))
+        buckets = {cell: (start, end) for cell, start, end in zip(occupied.tolist(), starts.tolist(), ends.tolist())}
+
+        # Fences are visited in load order, so the first fence to claim a point wins
+        for fence_id, fence in enumerate(self.fences):
+            spans = [buckets[cell] for cell in self._fence_cells[fence_id] if cell in buckets]
+            if not spans:
+                continue
+            if len(spans) == 1:
+                members = order[spans[0][0]:spans[0][1]]
+            else:
+                members = np.concatenate([order[start:end] for start, end in spans])
+            members = members[result[members] < 0]
+            if not len(members):
+                continue
+            hit = fence.contains(lats[members], lons[members])
+            result[members[hit]] = self._fence_name_ids[fence_id]
+        return result
+
+    def contains_batch(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return self.classify_batch(lats, lons) >= 0
+
+    def first(self, lat: float, lon: float) -> Optional[str]:
+        """Name of the first fence containing a single position"""
+        if lat is None or lon is None:
+            return None
+        row, col = self._cell(lat, lon)
+        candidates = self._cells.get(row * self._cols + col)
+        if not candidates:
+            return None
+        lats = np.array([lat], dtype=np.float64)
+        lons = np.array([lon], dtype=np.float64)
+        for fence_id in candidates:
+            if self.fences[fence_id].contains(lats, lons)[0]:
+                return self.names[self._fence_name_ids[fence_id]]
+        return None
+
+    def containing(self, lat: float, lon: float) -> List[str]:
+        """Names of every fence containing a single position, in load order"""
+        if lat is None or lon is None:
+            return []
+        row, col = self._cell(lat, lon)
+        candidates = self._cells.get(row * self._cols + col)
+        if not candidates:
+            return []
+        lats = np.array([lat], dtype=np.float64)
+        lons = np.array([lon], dtype=np.float64)
+        names = []
+        for fence_id in candidates:
+            name = self.names[self._fence_name_ids[fence_id]]
+            if name not in names and self.fences[fence_id].contains(lats, lons)[0]:
+                names.append(name)
+        return names
+
+
+def fences_from_boxes(boxes: Dict[str, Tuple[float, float, float, float]]) -> List[Geofence]:
+    """Fences from a {name: (lat_min, lon_min, lat_max, lon_max)} mapping such as Config.HOTSPOTS"""
+    fences = []
+    for name, (lat_min, lon_min, lat_max, lon_max) in boxes.items():
+        fences.extend(Geofence.from_box(name, lat_min, lon_min, lat_max, lon_max))
+    return fences
+
+
+def fences_from_geojson(path: str) -> List[Geofence]:
+    """Load Polygon/MultiPolygon features from a GeoJSON FeatureCollection, named by properties.name"""
+    with open(path, 'r', encoding='utf-8') as f:
+        collection = json.load(f)
+    fences = []
+    for i, feature in enumerate(collection.get('features', [])):
+        geometry = feature.get('geometry') or {}
+        name = (feature.get('properties') or {}).get('name') or f"fence_{i}"
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+        for polygon in polygons:
+            rings = [[(float(p[0]), float(p[1])) for p in ring] for ring in polygon]
+            fences.extend(Geofence.from_polygon(name, rings))
+    return fences
+
+
+def load_configured_fences(config) -> List[Geofence]:
+    """Fences from the GEOFENCES_FILE GeoJSON, if one is configured"""
+    if not config.GEOFENCES_FILE:
+        return []
+    return fences_from_geojson(config.GEOFENCES_FILE)
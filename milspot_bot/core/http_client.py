@@ -0,0 +1,279 @@
+"""
+FR24 Fetch Client
+HTTP layer for the flight-positions API: sized keep-alive connection pool,
+compressed transfer, retries with jittered backoff that honour Retry-After,
+a circuit breaker that fails fast during outages, and ETag/Last-Modified
+conditional requests
+"""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from core.metrics import API_ERRORS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FETCH_RETRIES = REGISTRY.counter('milspot_fr24_retries_total', "FR24 request attempts that were retried")
+NOT_MODIFIED = REGISTRY.counter('milspot_fr24_not_modified_total', "FR24 responses answered 304 Not Modified")
+CIRCUIT_STATE = REGISTRY.gauge('milspot_fr24_circuit_state', "FR24 circuit breaker: 0 closed, 1 half-open, 2 open")
+
+
+def accept_encoding() -> str:
+    """gzip always; br only when urllib3 can decode it (brotli or brotlicffi installed)"""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return 'gzip, deflate'
+    return 'gzip, deflate, br'
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), None if absent or unparseable"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment - (time.time() if now is None else now))
+
+
+class FetchError(Exception):
+    """The FR24 API could not be reached or kept failing; distinct from an empty sky"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(FetchError):
+    """Raised without touching the network while the circuit breaker is open"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"FR24 circuit open, next probe in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed fetches and rejects calls for
+    `reset_timeout` seconds; then lets a single probe through (half-open),
+    closing on success and re-opening on failure
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a request may go out now"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = self._clock() - self._opened_at
+            if waited < self.reset_timeout or self._probing:
+                raise CircuitOpenError(max(0.0, self.reset_timeout - waited))
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("🟢 FR24 circuit closed after a successful probe")
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self._opened_at is None and self.failures >= self.threshold):
+                self._opened_at = self._clock()
+                logger.warning("🔴 FR24 circuit open after %s consecutive failures; failing fast for %.0fs",
+                               self.failures, self.reset_timeout)
+            self._probing = False
+
+
+class FetchResponse(NamedTuple):
+    status: int
+    content: bytes
+    headers: Dict[str, str]
+    not_modified: bool = False
+    attempts: int = 1
+    # The client holds validators for this body, so a later 304 will be answered with it
+    revalidatable: bool = False
+
+
+class FetchClient:
+    """
+    Wraps one requests.Session; get() returns a FetchResponse or raises
+    FetchError, and stream() returns an open streaming response
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, pool_size: int = 8,
+                 timeout: Tuple[float, float] = (5.0, 15.0), max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 10.0, retry_after_max: float = 60.0,
+                 breaker: Optional[CircuitBreaker] = None, conditional: bool = True,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.session = session or requests.Session()
+        self.session.headers['Accept-Encoding'] = accept_encoding()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.breaker = breaker or CircuitBreaker()
+        self.conditional = conditional
+        self._sleep = sleep
+        # (url, params) -> (ETag, Last-Modified, body) of the last full response
+        self._validators: Dict[Tuple[str, Tuple], Tuple[Optional[str], Optional[str], bytes]] = {}
+        self._validators_lock = threading.Lock()
+        self.pool_size = 0
+        self.resize_pool(pool_size)
+        CIRCUIT_STATE.set_function(lambda: (CLOSED, HALF_OPEN, OPEN).index(self.breaker.state))
+
+    def resize_pool(self, pool_size: int):
+        """Keep at least pool_size keep-alive connections per host, e.g. one per concurrent tile"""
+        if pool_size <= self.pool_size:
+            return
+        self.pool_size = pool_size
+        # Retries are handled here rather than by urllib3 so Retry-After and the breaker see every failure
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_after_max))
+        return delay
+
+    def _request(self, url: str, params: Optional[Dict], headers: Optional[Dict], stream: bool):
+        """Send with retries; returns (response, attempts) for a non-retryable status"""
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            error, retry_after, status = None, None, None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                error = e
+                API_ERRORS.labels('exception').inc()
+            except Exception:
+                # Not a transport failure; still release a half-open probe slot
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response, attempt + 1
+                status = response.status_code
+                error = f"HTTP {status}"
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                API_ERRORS.labels(status).inc()
+                response.close()
+
+            if attempt >= self.max_retries:
+                self.breaker.record_failure()
+                raise FetchError(f"{url} failed after {attempt + 1} attempts: {error}", status)
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            FETCH_RETRIES.inc()
+            logger.warning("⚠️ FR24 request failed (%s); retry %s/%s in %.1fs", error, attempt, self.max_retries, delay)
+            self._sleep(delay)
+
+    def _conditional_headers(self, key, headers: Optional[Dict]) -> Dict:
+        headers = dict(headers or {})
+        cached = self._validators.get(key) if self.conditional else None
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> FetchResponse:
+        """
+        Fetch a complete body; a 304 answers with the body cached for the same
+        URL and parameters. Raises FetchError on 4xx, exhausted retries or an open circuit
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        response, attempts = self._request(url, params, self._conditional_headers(key, headers), stream=False)
+        status = response.status_code
+
+        if status == 304:
+            cached = self._validators.get(key)
+            if cached is None:
+                self.breaker.record_failure()
+                raise FetchError(f"{url} answered 304 without a cached body", status)
+            self.breaker.record_success()
+            NOT_MODIFIED.inc()
+            return FetchResponse(status, cached[2], dict(response.headers), not_modified=True, attempts=attempts,
+                                 revalidatable=True)
+
+        if status >= 400:
+            # Client errors won't fix themselves with retries, but they do mean the feed is down for us
+            self.breaker.record_failure()
+            API_ERRORS.labels(status).inc()
+            raise FetchError(f"{url} failed: {status} - {response.text[:200]}", status)
+
+        self.breaker.record_success()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        revalidatable = self.conditional and bool(etag or last_modified)
+        with self._validators_lock:
+            if revalidatable:
+                self._validators[key] = (etag, last_modified, response.content)
+            else:
+                # Older validators would have a 304 answered with a body this one replaced
+                self._validators.pop(key, None)
+        return FetchResponse(status, response.content, dict(response.headers), attempts=attempts,
+                             revalidatable=revalidatable)
+
+    def stream(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> requests.Response:
+        """
+        Open a streaming response once the status line is good; the caller
+        closes it. Only connection setup and status codes are retried
+        """
+        response, _ = self._request(url, params, headers, stream=True)
+        if response.status_code >= 400:
+            self.breaker.record_failure()
+            API_ERRORS.labels(response.status_code).inc()
+            status = response.status_code
+            response.close()
+            raise FetchError(f"{url} failed: {status}", status)
+        self.breaker.record_success()
+        return response
+
+    def close(self):
+        self.session.close()
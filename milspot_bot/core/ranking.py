@@ -0,0 +1,48 @@
+"""
+Top-K Ranking
+Keeps a bounded heap of the best-scoring candidates, skipping full scoring for
+flights whose cheap upper bound cannot beat the current K-th best
+"""
+
+import heapq
+import itertools
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def select_top_k(flights: Iterable[Dict], score_fn: Callable[[Dict], int], k: int, min_score: int = 1,
+                 upper_bound_fn: Optional[Callable[[Dict], int]] = None) -> List[Tuple[Dict, int]]:
+    """
+    Return up to k (flight, score) pairs with score >= min_score, best first; ties
+    keep feed order
+    """
+    if k <= 0:
+        return []
+    heap: List[Tuple[int, int, Dict]] = []  # (score, -arrival, flight): min-heap of the current top K
+    arrival = itertools.count()
+    for flight in flights:
+        order = next(arrival)
+        if upper_bound_fn is not None:
+            bound = upper_bound_fn(flight)
+            if bound < min_score or (len(heap) == k and bound <= heap[0][0]):
+                continue
+        score = score_fn(flight)
+        if score < min_score:
+            continue
+        entry = (score, -order, flight)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [(flight, score) for score, _, flight in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+
+def select_top_k_batch(scores, k: int, min_score: int = 1) -> List[Tuple[int, int]]:
+    """Columnar counterpart: (row index, score) of the k best rows of a score array, best first"""
+    import numpy as np
+
+    if k <= 0 or not len(scores):
+        return []
+    eligible = np.flatnonzero(scores >= min_score)
+    # Stable sort keeps feed order among equal scores, matching select_top_k
+    best = eligible[np.argsort(-scores[eligible], kind='stable')[:k]]
+    return [(int(i), int(scores[i])) for i in best]
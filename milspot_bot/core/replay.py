@@ -0,0 +1,157 @@
+"""
+Feed Recording and Replay
+Writes raw FR24 responses to gzip-compressed, timestamped snapshot files and
+feeds them back through the scanner at recorded pace, N× speed or flat out
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = 'fr24-'
+SNAPSHOT_SUFFIX = '.json.gz'
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S'
+
+
+def snapshot_name(fetched_at: float, sequence: int) -> str:
+    """fr24-20240101T120000.250Z-000001.json.gz: UTC fetch time, then a per-recorder counter"""
+    stamp = datetime.fromtimestamp(fetched_at, tz=timezone.utc)
+    millis = int(round((fetched_at % 1) * 1000)) % 1000
+    return f"{SNAPSHOT_PREFIX}{stamp.strftime(TIMESTAMP_FORMAT)}.{millis:03d}Z-{sequence:06d}{SNAPSHOT_SUFFIX}"
+
+
+def snapshot_time(path: str) -> float:
+    """Epoch seconds encoded in a snapshot file name"""
+    name = os.path.basename(path)[len(SNAPSHOT_PREFIX):]
+    stamp, millis = name.split('Z', 1)[0].split('.')
+    moment = datetime.strptime(stamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    return moment.timestamp() + int(millis) / 1000.0
+
+
+class SnapshotRecorder:
+    """Compresses and writes response bodies on a background thread so recording adds no scan latency"""
+
+    def __init__(self, directory: str, compresslevel: int = 6):
+        self.directory = directory
+        self.compresslevel = compresslevel
+        os.makedirs(directory, exist_ok=True)
+        self.recorded = 0
+        self._sequence = 0
+        # record() can be called from concurrent tile fetches as well as the scan loop
+        self._sequence_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='snapshot-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, body: bytes, fetched_at: Optional[float] = None):
+        """Queue one raw response body for writing"""
+        with self._sequence_lock:
+            self._sequence += 1
+            sequence = self._sequence
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        self._queue.put((snapshot_name(fetched_at, sequence), body))
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                name, body = item
+                path = os.path.join(self.directory, name)
+                # Write-then-rename so a replay never picks up a half-written snapshot
+                tmp_path = path + '.tmp'
+                with gzip.open(tmp_path, 'wb', compresslevel=self.compresslevel) as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+                self.recorded += 1
+            except Exception as e:
+                logger.error("❌ Failed to write snapshot: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """Finish writing everything queued"""
+        self._queue.put(None)
+        self._writer.join()
+        logger.info("💾 Recorded %s snapshots to %s", self.recorded, self.directory)
+
+
+class ReplaySource:
+    """
+    Serves recorded snapshots in time order, one per fetch; speed 1 keeps the
+    recorded spacing, N compresses it N×, and 0 replays as fast as possible
+    """
+
+    def __init__(self, directory: str, speed: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        paths = glob.glob(os.path.join(directory, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"))
+        self.snapshots: List[Tuple[float, str]] = sorted((snapshot_time(path), path) for path in paths)
+        self.speed = speed
+        self._clock = clock
+        self._sleep = sleep
+        self.position = 0
+        self.current_time: Optional[float] = None
+        self._started: Optional[Tuple[float, float]] = None  # (wall clock, first snapshot time)
+        logger.info("⏪ Replaying %s snapshots from %s (%s)", len(self.snapshots), directory,
+                    'as fast as possible' if speed <= 0 else f'{speed:g}x speed')
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.position >= len(self.snapshots)
+
+    def time(self) -> float:
+        """Recorded time of the snapshot being replayed; stands in for time.time() downstream"""
+        if self.current_time is not None:
+            return self.current_time
+        return self.snapshots[0][0] if self.snapshots else time.time()
+
+    def _advance(self) -> Optional[str]:
+        if self.exhausted:
+            return None
+        recorded_at, path = self.snapshots[self.position]
+        self.position += 1
+        if self._started is None:
+            self._started = (self._clock(), recorded_at)
+        elif self.speed > 0:
+            wall_start, first = self._started
+            delay = wall_start + (recorded_at - first) / self.speed - self._clock()
+            if delay > 0:
+                self._sleep(delay)
+        self.current_time = recorded_at
+        return path
+
+    def next_body(self) -> Optional[bytes]:
+        path = self._advance()
+        if path is None:
+            return None
+        with gzip.open(path, 'rb') as f:
+            return f.read()
+
+    def next_payload(self) -> Optional[Dict]:
+        body = self.next_body()
+        return None if body is None else json.loads(body)
+
+    def next_chunks(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        """Stream the next snapshot in chunks, as the live response would arrive"""
+        path = self._advance()
+        if path is None:
+            return
+        with gzip.open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
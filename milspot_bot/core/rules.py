@@ -0,0 +1,196 @@
+"""
+Military Rule Engine
+Compiles the declarative rules file (identifiers, categories, insights and
+score weights) into matchers shared by the scanner, scorer and analyzer, and
+hot-reloads it when the file changes
+"""
+
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from config import Config
+from core.classifier import MilitaryClassifier
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+
+class Identity(NamedTuple):
+    """Everything the rules say about one aircraft identity"""
+    military_flight: bool  # scanner rule: callsign or aircraft type
+    military: bool  # scorer rule: adds operator/livery and registration prefix
+    categories: Tuple[str, ...]
+    type_weight: int
+    type_insights: Tuple[str, ...]
+    callsign_insights: Tuple[str, ...]
+    operator_insights: Tuple[str, ...]
+
+
+def identity_fields(flight: FlightRecord) -> Tuple[str, str, str, str, str]:
+    """(callsign, aircraft code, registration, painted_as, operating_as) of a record, already upper-cased"""
+    return flight.callsign, flight.aircraft_code, flight.registration, flight.painted_as, flight.operating_as
+
+
+class RuleSet:
+    """Immutable compiled form of one rules document"""
+
+    def __init__(self, document: Dict, source: str = '', cache_size: int = 4096):
+        self.source = source
+        self.weights: Dict[str, int] = dict(document['weights'])
+        self.classifier = MilitaryClassifier(
+            callsigns=document['callsigns'],
+            aircraft_types=document['aircraft_types'],
+            operators=document['operators'],
+            reg_prefixes=document['reg_prefixes'],
+        )
+
+        # Categories keep file order for insights; scoring takes the highest-priority match
+        categories = document['aircraft_categories']
+        self._categories = tuple((name, tuple(spec['types']), spec.get('insight'))
+                                 for name, spec in categories.items())
+        self._type_weights = tuple((tuple(spec['types']), self.weights[spec['weight']])
+                                   for _, spec in sorted(categories.items(), key=lambda item: item[1]['priority']))
+        self._callsign_rules = tuple((tuple(spec['prefixes']), spec['insight'])
+                                     for spec in document['callsign_families'].values())
+        operators = document['military_operators']
+        self.operator_codes = frozenset(operators)
+        self._operator_rules = tuple((code, f"{name} - Official military aircraft")
+                                     for code, name in operators.items() if name)
+        self.squawk_anomalies = frozenset(document['squawk_anomalies'])
+
+        self.identity = lru_cache(maxsize=cache_size)(self._identity)
+
+    @classmethod
+    def from_file(cls, path: str, cache_size: int = 4096) -> 'RuleSet':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), source=path, cache_size=cache_size)
+
+    def categorize(self, aircraft_code: str) -> List[str]:
+        """Insight categories whose type codes occur in an upper-cased aircraft code, in file order"""
+        if not aircraft_code:
+            return []
+        return [name for name, types, insight in self._categories
+                if insight and any(aircraft_type in aircraft_code for aircraft_type in types)]
+
+    def type_weight(self, aircraft_code: str) -> int:
+        if not aircraft_code:
+            return 0
+        for types, weight in self._type_weights:
+            if any(aircraft_type in aircraft_code for aircraft_type in types):
+                return weight
+        return 0
+
+    def type_insights(self, aircraft_code: str) -> Tuple[str, ...]:
+        if not aircraft_code:
+            return ()
+        return tuple(insight for _, types, insight in self._categories
+                     if insight and any(aircraft_type in aircraft_code for aircraft_type in types))
+
+    def callsign_insights(self, callsign: str) -> Tuple[str, ...]:
+        if not callsign:
+            return ()
+        return tuple(insight for prefixes, insight in self._callsign_rules if callsign.startswith(prefixes))
+
+    def operator_insights(self, painted_as: str, operating_as: str) -> Tuple[str, ...]:
+        for code, insight in self._operator_rules:
+            if code in painted_as or code in operating_as:
+                return (insight,)
+        return ()
+
+    def _identity(self, callsign: str, aircraft_code: str, registration: str, painted_as: str,
+                  operating_as: str) -> Identity:
+        classifier = self.classifier
+        military_flight = classifier.callsign_match(callsign) or classifier.aircraft_type_match(aircraft_code)
+        military = (military_flight
+                    or classifier.operator_match(operating_as)
+                    or classifier.operator_match(painted_as)
+                    or classifier.reg_match(registration))
+        return Identity(
+            military_flight=military_flight,
+            military=military,
+            categories=tuple(self.categorize(aircraft_code)),
+            type_weight=self.type_weight(aircraft_code),
+            type_insights=self.type_insights(aircraft_code),
+            callsign_insights=self.callsign_insights(callsign),
+            operator_insights=self.operator_insights(painted_as, operating_as),
+        )
+
+    def evaluate(self, flight: FlightRecord) -> Identity:
+        """Memoized rule evaluation keyed on the flight's normalized identity fields"""
+        return self.identity(*identity_fields(flight))
+
+
+class RuleEngine:
+    """
+    Holds the current RuleSet; poll() between scans swaps in a new one once the
+    file has changed and a background thread has finished compiling it
+    """
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        self.path = path
+        self.cache_size = cache_size
+        self.current = RuleSet.from_file(path, cache_size)
+        self.version = 1
+        self._mtime = self._stat()
+        self._pending: Optional[Tuple[RuleSet, float]] = None
+        self._compiling = False
+        self._lock = threading.Lock()
+
+    @property
+    def mtime(self) -> Optional[float]:
+        """Modification time of the rules file version last loaded (or rejected)"""
+        return self._mtime
+    
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def poll(self) -> bool:
+        """Install a freshly compiled rule set if one is ready; True when the rules changed"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        swapped = False
+        if pending is not None:
+            self.current, self._mtime = pending
+            self.version += 1
+            swapped = True
+            logger.info("📜 Reloaded rules from %s (version %s)", self.path, self.version)
+
+        mtime = self._stat()
+        if mtime is not None and mtime != self._mtime:
+            with self._lock:
+                if self._compiling:
+                    return swapped
+                self._compiling = True
+            threading.Thread(target=self._compile, args=(mtime,), name='rules-reload', daemon=True).start()
+        return swapped
+
+    def _compile(self, mtime: float):
+        try:
+            rules = RuleSet.from_file(self.path, self.cache_size)
+            with self._lock:
+                self._pending = (rules, mtime)
+        except Exception as e:
+            # Keep serving the last good rules; don't retry until the file changes again
+            self._mtime = mtime
+            logger.error("❌ Rules file %s rejected, keeping version %s: %s", self.path, self.version, e)
+        finally:
+            with self._lock:
+                self._compiling = False
+
+
+_engine: Optional[RuleEngine] = None
+
+
+def get_rule_engine() -> RuleEngine:
+    """Return the process-wide rule engine, loading RULES_FILE on first use"""
+    global _engine
+    if _engine is None:
+        config = Config()
+        _engine = RuleEngine(config.RULES_FILE, cache_size=config.RULES_CACHE_SIZE)
+    return _engine
@@ -1,16 +1,77 @@
 import requests
 import json
-from typing import List, Dict, Optional
+import logging
+import random
+import threading
+import time
+from typing import Iterator, List, Dict, Optional
 from config import Config
+from core.flight_record import FlightRecord
+from core.http_client import CircuitBreaker, FetchClient, FetchError
+from core.metrics import AIRCRAFT_IN, API_ERRORS, BYTES_DOWNLOADED, MILITARY_OUT, span
+from core.rules import get_rule_engine
+from core.stream_parser import iter_array_field, iter_object_members
+
+logger = logging.getLogger(__name__)
+# Raw response and aircraft dumps; opt-in with PAYLOAD_DEBUG_SAMPLE and sampled, never on by default
+payload_logger = logging.getLogger(__name__ + '.payload')
 
 class FlightScanner:
     def __init__(self):
         self.config = Config()
+        self.engine = get_rule_engine()
+        self._rules_version = self.engine.version
         self.session = requests.Session()
         # Add browser-like User-Agent header
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         })
+        # FR24 API traffic goes through the client: pooled keep-alive connections,
+        # compression, retries, circuit breaker and conditional requests
+        self.client = FetchClient(
+            self.session,
+            pool_size=self.config.FR24_POOL_SIZE,
+            timeout=(self.config.FR24_CONNECT_TIMEOUT, self.config.FR24_READ_TIMEOUT),
+            max_retries=self.config.FR24_MAX_RETRIES,
+            backoff_base=self.config.FR24_BACKOFF_BASE,
+            backoff_max=self.config.FR24_BACKOFF_MAX,
+            retry_after_max=self.config.FR24_RETRY_AFTER_MAX,
+            breaker=CircuitBreaker(self.config.FR24_BREAKER_THRESHOLD, self.config.FR24_BREAKER_RESET_SECONDS),
+            conditional=self.config.FR24_CONDITIONAL_REQUESTS,
+        )
+        # Decoded payload per bounds, reused when the API answers 304 Not Modified
+        self._payloads: Dict[Optional[str], Dict] = {}
+        
+        self._tiled_fetcher = None
+        self.payload_sample = self.config.PAYLOAD_DEBUG_SAMPLE
+        
+        # Set by run_bot --record / --replay: raw responses are written to, or read
+        # back from, snapshot files instead of only the live API
+        self.recorder = None
+        self.replay = None
+        # Decoded tile payloads of the tiled fetch in progress, per bounds, while
+        # recording: the cycle is written as one merged snapshot instead of per tile
+        self._tile_payloads: Optional[Dict[str, Dict]] = None
+        self._tile_payloads_lock = threading.Lock()
+        # Set by run_bot when ARCHIVE_DIR is configured: every scan's positions are
+        # appended to the hourly position archive
+        self.archive = None
+        # Set by run_bot when SHARD_WORKERS > 1: columnar scans are decoded, parsed
+        # and classified across a process pool
+        self.shards = None
+        
+        # Operator/owner/type per airframe, learnt from payloads and offline imports
+        self.metadata = None
+        if self.config.AIRCRAFT_DB_PATH:
+            from core.aircraft_db import AircraftMetadataCache
+            self.metadata = AircraftMetadataCache(self.config.AIRCRAFT_DB_PATH,
+                                                  cache_size=self.config.AIRCRAFT_DB_CACHE_SIZE)
+        
+        # Incremental mode keeps the previous snapshot and cached verdicts between scans
+        self.delta = None
+        if self.config.DELTA_SCAN:
+            from core.delta import DeltaTracker
+            self.delta = DeltaTracker(self.is_military_flight)
         
         self.global_bounds = {
             'lamin': -90.0,  # min latitude
@@ -22,104 +83,129 @@ class FlightScanner:
     def set_cookies(self, cookies: Dict[str, str]):
         """Set cookies from browser session"""
         self.session.cookies.update(cookies)
-        print(f"Added {len(cookies)} cookies to session")
+        logger.info("Added %d cookies to session", len(cookies))
+    
+    def _payload_sampling(self) -> float:
+        """Share of payload entries to dump for this response; 0 unless the payload channel is on"""
+        if self.payload_sample > 0 and payload_logger.isEnabledFor(logging.DEBUG):
+            return self.payload_sample
+        return 0.0
+    
+    def _feed_url(self, bounds: Optional[tuple] = None) -> str:
+        """Build the feed.js URL; bounds: (lat_min, lon_min, lat_max, lon_max)"""
+        if bounds:
+            return f"https://data-live.flightradar24.com/zones/fcgi/feed.js?bounds={bounds[0]},{bounds[1]},{bounds[2]},{bounds[3]}"
+        return "https://data-live.flightradar24.com/zones/fcgi/feed.js"
     
-    def get_flightradar24_data(self, bounds: Optional[tuple] = None) -> List[Dict]:
+    @staticmethod
+    def _parse_feed_entry(flight_id: str, flight_data) -> Optional[FlightRecord]:
+        """Convert one feed.js entry into a FlightRecord, or None for non-flight keys"""
+        if not isinstance(flight_data, list) or len(flight_data) < 17:
+            return None
+        return FlightRecord.from_feed(flight_id, flight_data)
+    
+    def get_flightradar24_data(self, bounds: Optional[tuple] = None) -> List[FlightRecord]:
         """
         Fetch flight data from FlightRadar24
         bounds: (lat_min, lon_min, lat_max, lon_max)
         """
-        if bounds:
-            url = f"https://data-live.flightradar24.com/zones/fcgi/feed.js?bounds={bounds[0]},{bounds[1]},{bounds[2]},{bounds[3]}"
-        else:
-            url = "https://data-live.flightradar24.com/zones/fcgi/feed.js"
+        url = self._feed_url(bounds)
         
-        print(f"Fetching data from: {url}")
+        logger.debug("Fetching data from: %s", url)
         
         try:
             response = self.session.get(url, timeout=10)
-            print(f"Response status: {response.status_code}")
+            logger.debug("Response status: %s", response.status_code)
             data = response.json()
-            print(f"Full data: {data}")
-            if 'aircraft' in data:
-                print(f"Aircraft key content: {data['aircraft']}")
-            print(f"Raw data keys: {list(data.keys())[:10]}")  # Show first 10 keys
+            sample = self._payload_sampling()
+            if sample and random.random() < sample:
+                payload_logger.debug("Full data: %r", data)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw data keys: %s", list(data.keys())[:10])  # Show first 10 keys
             
             flights = []
             for flight_id, flight_data in data.items():
-                if isinstance(flight_data, list) and len(flight_data) >= 15:
-                    flight = {
-                        'id': flight_id,
-                        'callsign': flight_data[16] or '',
-                        'aircraft_code': flight_data[8] or '',
-                        'registration': flight_data[9] or '',
-                        'latitude': flight_data[1],
-                        'longitude': flight_data[2],
-                        'altitude': flight_data[4],
-                        'ground_speed': flight_data[5],
-                        'heading': flight_data[3],
-                        'origin_airport': flight_data[11] or '',
-                        'destination_airport': flight_data[12] or '',
-                        'timestamp': flight_data[10]
-                    }
+                flight = self._parse_feed_entry(flight_id, flight_data)
+                if flight:
                     flights.append(flight)
             
-            print(f"Processed {len(flights)} flights from raw data")
+            logger.info("Processed %d flights from raw data", len(flights))
             return flights
         except Exception as e:
-            print(f"Error fetching FlightRadar24 data: {e}")
+            logger.error("Error fetching FlightRadar24 data: %s", e)
             return []
     
-    def get_flightradar24_data_alt(self) -> List[Dict]:
+    def iter_flightradar24_data(self, bounds: Optional[tuple] = None) -> Iterator[FlightRecord]:
+        """
+        Streaming variant of get_flightradar24_data: decodes feed.js from the
+        socket and yields flights one at a time
+        """
+        url = self._feed_url(bounds)
+        try:
+            with self.session.get(url, timeout=10, stream=True) as response:
+                if response.status_code != 200:
+                    logger.warning("Endpoint %s failed: %s", url, response.status_code)
+                    return
+                chunks = response.iter_content(chunk_size=self.config.STREAM_CHUNK_SIZE)
+                for flight_id, flight_data in iter_object_members(chunks):
+                    flight = self._parse_feed_entry(flight_id, flight_data)
+                    if flight:
+                        yield flight
+        except Exception as e:
+            logger.error("Error streaming FlightRadar24 data: %s", e)
+    
+    def get_flightradar24_data_alt(self) -> List[FlightRecord]:
         """
         Alternative method using a different FlightRadar24 endpoint
         """
         url = "https://www.flightradar24.com/data/aircraft.json"
         
-        print(f"Trying alternative endpoint: {url}")
+        logger.debug("Trying alternative endpoint: %s", url)
         
         try:
             response = self.session.get(url, timeout=10)
-            print(f"Alternative response status: {response.status_code}")
+            logger.debug("Alternative response status: %s", response.status_code)
             data = response.json()
-            print(f"Alternative data keys: {list(data.keys())[:10] if isinstance(data, dict) else 'Not a dict'}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Alternative data keys: %s", list(data.keys())[:10] if isinstance(data, dict) else 'Not a dict')
             
             # Process alternative data format if needed
             flights = []
             if isinstance(data, dict) and 'aircraft' in data:
                 for aircraft in data['aircraft']:
                     if isinstance(aircraft, dict):
-                        flight = {
-                            'callsign': aircraft.get('identification', {}).get('callsign', ''),
-                            'aircraft_code': aircraft.get('aircraft', {}).get('model', {}).get('code', ''),
-                            'registration': aircraft.get('aircraft', {}).get('registration', ''),
-                            'latitude': aircraft.get('trail', [{}])[0].get('lat', 0) if aircraft.get('trail') else 0,
-                            'longitude': aircraft.get('trail', [{}])[0].get('lng', 0) if aircraft.get('trail') else 0,
-                            'altitude': aircraft.get('state', {}).get('altitude', 0),
-                            'ground_speed': aircraft.get('state', {}).get('speed', 0),
-                        }
+                        trail = aircraft.get('trail') or [{}]
+                        state = aircraft.get('state', {})
+                        flight = FlightRecord(
+                            callsign=aircraft.get('identification', {}).get('callsign', ''),
+                            aircraft_code=aircraft.get('aircraft', {}).get('model', {}).get('code', ''),
+                            registration=aircraft.get('aircraft', {}).get('registration', ''),
+                            latitude=trail[0].get('lat', 0),
+                            longitude=trail[0].get('lng', 0),
+                            altitude=state.get('altitude', 0),
+                            ground_speed=state.get('speed', 0),
+                        )
                         flights.append(flight)
             
-            print(f"Alternative method processed {len(flights)} flights")
+            logger.info("Alternative method processed %d flights", len(flights))
             return flights
         except Exception as e:
-            print(f"Error fetching alternative FlightRadar24 data: {e}")
+            logger.error("Error fetching alternative FlightRadar24 data: %s", e)
             return []
     
 
     
-    def get_flightradar24_api_data(self, bounds: Optional[str] = None) -> List[Dict]:
-        """
-        Use the new FlightRadar24 live flight endpoint with authentication
-        """
+    def _api_request(self, bounds: Optional[str] = None) -> Optional[tuple]:
+        """Return (url, params, headers) for the live flight-positions endpoint, or None without an API key"""
         api_key = self.config.FR24_API_KEY
         if not api_key:
-            print("❌ No FlightRadar24 API key provided. Please set FR24_API_KEY in your .env file")
-            return []
+            logger.error("❌ No FlightRadar24 API key provided. Please set FR24_API_KEY in your .env file")
+            return None
 
-        url = "https://fr24api.flightradar24.com/api/live/flight-positions/full"
-        # Always use global bounds for worldwide scanning
-        bounds = f"{self.global_bounds['lamin']},{self.global_bounds['lamax']},{self.global_bounds['lomin']},{self.global_bounds['lomax']}"
+        url = f"{self.config.FR24_API_BASE_URL}/api/live/flight-positions/full"
+        # Fall back to global bounds (north,south,west,east) for worldwide scanning
+        if not bounds:
+            bounds = f"{self.global_bounds['lamax']},{self.global_bounds['lamin']},{self.global_bounds['lomin']},{self.global_bounds['lomax']}"
         params = {
             'bounds': bounds
         }
@@ -128,63 +214,307 @@ class FlightScanner:
             'Accept-Version': 'v1',
             'Authorization': f'Bearer {api_key}'
         }
-        try:
-            print(f"Requesting {url} with bounds: {bounds}")
-            response = self.session.get(url, headers=headers, params=params, timeout=15)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"API Response keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-                flights = []
-                if isinstance(data, dict):
-                    print(f"Top-level keys: {list(data.keys())}")
-                    if 'data' in data and isinstance(data['data'], list):
-                        for aircraft in data['data']:
-                            print(f"Aircraft entry: {aircraft}")
-                            if isinstance(aircraft, dict):
-                                flight = {
-                                    'callsign': aircraft.get('callsign', ''),
-                                    'aircraft_code': aircraft.get('type', ''),
-                                    'registration': aircraft.get('reg', ''),
-                                    'latitude': aircraft.get('lat', 0),
-                                    'longitude': aircraft.get('lon', 0),
-                                    'altitude': aircraft.get('alt', 0),
-                                    'ground_speed': aircraft.get('gspeed', 0),
-                                }
-                                flights.append(flight)
-                    else:
-                        print(f"No 'data' key with a list value found in API response. Full response: {json.dumps(data)[:500]}")
-                print(f"API processed {len(flights)} flights from {url}")
-                return flights
-            else:
-                print(f"Endpoint {url} failed: {response.status_code} - {response.text[:200]}")
-                return []
-        except Exception as e:
-            print(f"Error fetching FlightRadar24 API data: {e}")
-            return []
+        return url, params, headers
     
-    def is_military_flight(self, flight: Dict) -> bool:
-        """Determine if a flight is military based on callsign and aircraft type"""
-        callsign = flight.get('callsign', '') or ''
-        aircraft_code = flight.get('aircraft_code', '') or ''
-        
-        callsign = callsign.upper()
-        aircraft_code = aircraft_code.upper()
+    @staticmethod
+    def _parse_api_aircraft(aircraft) -> Optional[FlightRecord]:
+        """Convert one live flight-positions entry into a FlightRecord"""
+        if not isinstance(aircraft, dict):
+            return None
+        return FlightRecord.from_api(aircraft)
+    
+    def _fetch_api_response(self, bounds: Optional[str] = None):
+        """(url, FetchResponse) for the live flight-positions endpoint, or None without an API key"""
+        request = self._api_request(bounds)
+        if request is None:
+            return None
+        url, params, headers = request
+        logger.debug("Requesting %s with bounds: %s", url, params['bounds'])
+        with span('fetch'):
+            response = self.client.get(url, params=params, headers=headers)
+        if self.recorder is not None and self._tile_payloads is None:
+            self.recorder.record(response.content)
+        if not response.not_modified:
+            BYTES_DOWNLOADED.inc(len(response.content))
+        return url, response
+    
+    def fetch_flightradar24_api_body(self, bounds: Optional[str] = None) -> Optional[bytes]:
+        """Undecoded body of the live flight-positions endpoint (or the next replayed snapshot)"""
+        if self.replay is not None:
+            return self.replay.next_body()
+        fetched = self._fetch_api_response(bounds)
+        return None if fetched is None else fetched[1].content
+    
+    def _decode_body(self, body: bytes, source: str) -> Dict:
+        with span('decode'):
+            try:
+                return json.loads(body)
+            except ValueError as e:
+                API_ERRORS.labels('decode').inc()
+                raise FetchError(f"Undecodable FR24 response from {source}: {e}") from e
+    
+    def fetch_flightradar24_api_payload(self, bounds: Optional[str] = None) -> Optional[Dict]:
+        """
+        Request the live flight-positions endpoint and return the decoded body,
+        or None without an API key. Raises FetchError when FR24 is unreachable,
+        so an outage is never mistaken for an empty sky
+        """
+        if self.replay is not None:
+            return self.replay.next_payload()
+        fetched = self._fetch_api_response(bounds)
+        if fetched is None:
+            return None
+        url, response = fetched
+        if response.not_modified and bounds in self._payloads:
+            logger.debug("FR24 answered 304 Not Modified, reusing the previous payload")
+            data = self._payloads[bounds]
+            if self._tile_payloads is not None:
+                with self._tile_payloads_lock:
+                    self._tile_payloads[bounds] = data
+            return data
+        data = self._decode_body(response.content, url)
+        # Keep the decoded copy only while the client can still be answered 304 for it
+        if response.revalidatable:
+            self._payloads[bounds] = data
+        else:
+            self._payloads.pop(bounds, None)
+        if self._tile_payloads is not None:
+            with self._tile_payloads_lock:
+                self._tile_payloads[bounds] = data
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("API Response keys: %s", list(data.keys()) if isinstance(data, dict) else 'Not a dict')
+        return data
+    
+    def get_flightradar24_api_data(self, bounds: Optional[str] = None) -> List[FlightRecord]:
+        """
+        Use the new FlightRadar24 live flight endpoint with authentication
+        """
+        data = self.fetch_flightradar24_api_payload(bounds=bounds)
+        if data is None:
+            return []
         
-        # Check callsign patterns
-        for military_prefix in self.config.MILITARY_CALLSIGNS:
-            if callsign.startswith(military_prefix):
-                return True
+        flights = []
+        if isinstance(data, dict):
+            logger.debug("Top-level keys: %s", list(data))
+            if 'data' in data and isinstance(data['data'], list):
+                sample = self._payload_sampling()
+                with span('parse'):
+                    for aircraft in data['data']:
+                        if sample and random.random() < sample:
+                            payload_logger.debug("Aircraft entry: %r", aircraft)
+                        flight = self._parse_api_aircraft(aircraft)
+                        if flight:
+                            flights.append(flight)
+            else:
+                logger.warning("No 'data' key with a list value found in API response. Full response: %.500s",
+                               json.dumps(data))
+        logger.debug("API processed %d flights", len(flights))
+        return flights
+    
+    def iter_flightradar24_api_data(self, bounds: Optional[str] = None) -> Iterator[FlightRecord]:
+        """
+        Streaming variant of get_flightradar24_api_data: decodes the response
+        incrementally and yields flights while the download is still running
+        """
+        sample = self._payload_sampling()
+        if self.replay is not None:
+            for aircraft in iter_array_field(self.replay.next_chunks(self.config.STREAM_CHUNK_SIZE), 'data'):
+                if sample and random.random() < sample:
+                    payload_logger.debug("Aircraft entry: %r", aircraft)
+                flight = self._parse_api_aircraft(aircraft)
+                if flight:
+                    yield flight
+            return
+        request = self._api_request(bounds)
+        if request is None:
+            return
+        url, params, headers = request
+        try:
+            with self.client.stream(url, params=params, headers=headers) as response:
+                chunks = _count_bytes(response.iter_content(chunk_size=self.config.STREAM_CHUNK_SIZE))
+                if self.recorder is not None:
+                    chunks = self._tee_to_recorder(chunks)
+                for aircraft in iter_array_field(chunks, 'data'):
+                    if sample and random.random() < sample:
+                        payload_logger.debug("Aircraft entry: %r", aircraft)
+                    flight = self._parse_api_aircraft(aircraft)
+                    if flight:
+                        yield flight
+        except requests.RequestException as e:
+            # The status line was fine but the body broke off; the scan is incomplete, not empty
+            API_ERRORS.labels('exception').inc()
+            self.client.breaker.record_failure()
+            raise FetchError(f"FR24 stream from {url} broke off: {e}") from e
+    
+    def _tee_to_recorder(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass chunks through while keeping a copy; the full body is recorded once the stream ends"""
+        fetched_at = time.time()
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.recorder.record(b''.join(received), fetched_at)
+    
+    def get_flightradar24_api_batch(self, bounds: Optional[str] = None):
+        """
+        Columnar variant of get_flightradar24_api_data: parses the response
+        straight into a FlightBatch without building per-aircraft dicts
+        """
+        from core.columnar import FlightBatch
         
-        # Check aircraft type
-        for military_type in self.config.MILITARY_AIRCRAFT_TYPES:
-            if military_type.upper() in aircraft_code:
-                return True
+        data = self.fetch_flightradar24_api_payload(bounds=bounds)
+        with span('parse'):
+            batch = FlightBatch.from_api_payload(data or {})
+        logger.debug("API processed %d flights into columnar batch", len(batch))
+        return batch
+    
+    def get_tiled_api_data(self) -> List[FlightRecord]:
+        """
+        Fetch the configured scan area as concurrent tiles, merging aircraft
+        reported on tile edges and splitting tiles that hit the response cap
+        """
+        from core.tiling import Tile, TiledFetcher, merge_payloads, parse_area
         
-        return False
+        if self._tiled_fetcher is None:
+            self._tiled_fetcher = TiledFetcher(
+                self,
+                concurrency=self.config.TILE_CONCURRENCY,
+                response_cap=self.config.FR24_RESPONSE_CAP,
+                max_depth=self.config.TILE_MAX_SPLIT_DEPTH,
+            )
+        if self.config.SCAN_AREA:
+            area = Tile(*parse_area(self.config.SCAN_AREA))
+        else:
+            area = Tile(self.global_bounds['lamin'], self.global_bounds['lamax'],
+                        self.global_bounds['lomin'], self.global_bounds['lomax'])
+        recording = self.recorder is not None
+        if recording:
+            self._tile_payloads = {}
+        fetched_at = time.time()
+        try:
+            with span('tiled_fetch'):
+                flights = self._tiled_fetcher.fetch(area, self.config.TILE_ROWS, self.config.TILE_COLS)
+        finally:
+            tile_payloads, self._tile_payloads = self._tile_payloads, None
+        if recording:
+            # Replay treats every snapshot as one complete scan, so the tiles go in as one
+            merged = merge_payloads(tile_payloads.values())
+            self.recorder.record(json.dumps(merged, separators=(',', ':')).encode('utf-8'), fetched_at)
+        return flights
+    
+    @property
+    def classifier(self):
+        """Classifier of the currently loaded rules"""
+        return self.engine.current.classifier
     
-    def get_military_flights(self, bounds: Optional[str] = None) -> List[Dict]:
+    def is_military_flight(self, flight: FlightRecord) -> bool:
+        """Determine if a flight is military based on callsign and aircraft type, or the metadata military flag"""
+        return self.classifier.is_military_flight(flight) or getattr(flight, 'military', None) is True
+    
+    def get_military_flights(self, bounds: Optional[str] = None) -> List[FlightRecord]:
         """Get all military flights from FlightRadar24 using the new API only"""
-        all_flights = self.get_flightradar24_api_data(bounds=bounds)
-        military_flights = [f for f in all_flights if self.is_military_flight(f)]
-        print(f"Found {len(military_flights)} military flights out of {len(all_flights)} total flights")
-        return military_flights 
\ No newline at end of file
+        if self.config.COLUMNAR_SCAN:
+            return self.get_military_batch(bounds=bounds).to_records()
+        if self.config.STREAM_SCAN:
+            return list(self.iter_military_flights(bounds=bounds))
+        
+        if self.config.TILED_FETCH and self.replay is None:
+            all_flights = self.get_tiled_api_data()
+        else:
+            all_flights = self.get_flightradar24_api_data(bounds=bounds)
+        if self.metadata is not None:
+            with span('enrich'):
+                self.metadata.enrich_many(all_flights)
+        with span('classify'):
+            if self.delta is not None:
+                if self._rules_version != self.engine.version:
+                    # Verdicts cached under the previous rules no longer hold
+                    self.delta.invalidate()
+                    self._rules_version = self.engine.version
+                military_flights = self.delta.update(all_flights)
+            else:
+                military_flights = [f for f in all_flights if self.is_military_flight(f)]
+        if self.archive is not None:
+            self.archive.append(all_flights, military_flights)
+        AIRCRAFT_IN.inc(len(all_flights))
+        MILITARY_OUT.inc(len(military_flights))
+        logger.info("Found %d military flights out of %d total flights", len(military_flights), len(all_flights))
+        return military_flights
+    
+    def get_military_batch(self, bounds: Optional[str] = None):
+        """Columnar counterpart of get_military_flights returning a filtered FlightBatch"""
+        if self.shards is not None:
+            return self._get_sharded_military_batch(bounds)
+        batch = self.get_flightradar24_api_batch(bounds=bounds)
+        return self._classify_batch(batch)
+    
+    def _classify_batch(self, batch, total: Optional[int] = None, mask=None):
+        if mask is None:
+            with span('classify'):
+                mask = batch.military_mask(self.classifier)
+                if self.metadata is not None:
+                    mask |= batch.hex.map_vocabulary(self.metadata.known_military)
+        # Compacted so later per-value passes (scoring, track keys) only see the surviving rows' values
+        military_batch = batch.filter(mask).compact()
+        if self.archive is not None:
+            self.archive.append_batch(batch, mask)
+        total = len(batch) if total is None else total
+        AIRCRAFT_IN.inc(total)
+        MILITARY_OUT.inc(len(military_batch))
+        logger.info("Found %d military flights out of %d total flights", len(military_batch), total)
+        return military_batch
+    
+    def _get_sharded_military_batch(self, bounds: Optional[str] = None):
+        """get_military_batch with decode, parse and classification spread over the shard workers"""
+        from core.columnar import FlightBatch
+        
+        body = self.fetch_flightradar24_api_body(bounds=bounds)
+        if not body:
+            return self._classify_batch(FlightBatch.from_api_payload({}))
+        # An all-traffic archive needs the civil rows back from the workers as well
+        keep_all = self.archive is not None and not self.archive.military_only
+        with span('shards'):
+            sharded = self.shards.classify(body, keep_all=keep_all)
+        if sharded is None:
+            # Too small to be worth it, or not splittable: parse here as usual
+            data = self._decode_body(body, 'FR24')
+            with span('parse'):
+                batch = FlightBatch.from_api_payload(data)
+            return self._classify_batch(batch)
+        return self._classify_batch(sharded.batch, total=sharded.total, mask=sharded.mask)
+
+    def iter_military_flights(self, bounds: Optional[str] = None) -> Iterator[FlightRecord]:
+        """Apply the military pre-filter per record as the stream is decoded"""
+        total = 0
+        found = 0
+        archive = self.archive
+        # Only an all-traffic archive needs the flights the stream filters out
+        seen = [] if archive is not None and not archive.military_only else None
+        military = [] if archive is not None else None
+        # Download, decode and classification interleave here, so they share one span
+        with span('stream'):
+            for flight in self.iter_flightradar24_api_data(bounds=bounds):
+                total += 1
+                if self.metadata is not None:
+                    self.metadata.enrich(flight)
+                if seen is not None:
+                    seen.append(flight)
+                if self.is_military_flight(flight):
+                    found += 1
+                    if military is not None:
+                        military.append(flight)
+                    yield flight
+            if self.metadata is not None:
+                self.metadata.flush()
+        if archive is not None:
+            archive.append(seen if seen is not None else military, military)
+        AIRCRAFT_IN.inc(total)
+        MILITARY_OUT.inc(found)
+        logger.info("Found %d military flights out of %d total flights (streamed)", found, total)
+
+
+def _count_bytes(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Pass chunks through, adding their size to the downloaded-bytes counter as they arrive"""
+    for chunk in chunks:
+        BYTES_DOWNLOADED.inc(len(chunk))
+        yield chunk
@@ -0,0 +1,90 @@
+"""
+Fixed-Cadence Scheduler
+Runs a task on a fixed interval anchored to the start time, skipping ticks
+while a previous run is still in flight
+"""
+
+import logging
+import random
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FixedRateScheduler:
+    def __init__(self, task: Callable[[], None], interval: float, jitter: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if interval <= 0:
+            raise ValueError("Scheduler interval must be positive")
+        self.task = task
+        self.interval = interval
+        self.jitter = max(0.0, min(jitter, interval / 2))
+        self.clock = clock
+        self.ticks_run = 0
+        self.ticks_skipped = 0
+        self._stop = threading.Event()
+        self._busy = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def install_signal_handlers(self):
+        """Stop cleanly on SIGTERM/SIGINT (must be called from the main thread)"""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        logger.info("🛑 Received signal %s, shutting down after the current scan", signum)
+        self.stop()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def _run_task(self):
+        try:
+            self.task()
+        except Exception as e:
+            logger.error("❌ Scheduled scan failed: %s", e)
+        finally:
+            self._busy.release()
+
+    def _dispatch(self):
+        """Start the task on a worker thread unless the previous run is still going"""
+        if not self._busy.acquire(blocking=False):
+            self.ticks_skipped += 1
+            logger.warning("⏭️ Previous scan still running, skipping tick (%s skipped so far)", self.ticks_skipped)
+            return
+        self.ticks_run += 1
+        self._worker = threading.Thread(target=self._run_task, name="scan-worker", daemon=True)
+        self._worker.start()
+
+    def run(self, shutdown_timeout: Optional[float] = None):
+        """Block and run the task every interval until stop() is called"""
+        start = self.clock()
+        tick = 0
+        while not self._stop.is_set():
+            # Ticks are anchored to the start time so scan duration never accumulates as drift
+            target = start + tick * self.interval
+            if self.jitter:
+                target += random.uniform(0, self.jitter)
+            delay = target - self.clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self._dispatch()
+
+            # If the process stalled (suspend, GC pause) resume at the next future slot
+            # instead of firing a burst of catch-up ticks
+            tick += 1
+            behind = int((self.clock() - start) // self.interval) + 1
+            if behind > tick:
+                self.ticks_skipped += behind - tick
+                tick = behind
+
+        if self._worker is not None and self._worker.is_alive():
+            logger.info("⏳ Waiting for the in-flight scan to finish")
+            self._worker.join(shutdown_timeout)
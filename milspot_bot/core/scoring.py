@@ -1,24 +1,45 @@
-from typing import Dict
+from typing import Dict, Optional
 from config import Config
+from core.rules import get_rule_engine
+from core.flight_record import FlightRecord, normalize
+from core.geofence import GeofenceIndex, fences_from_boxes, load_configured_fences
 
 class FlightScorer:
     def __init__(self):
         self.config = Config()
+        self.engine = get_rule_engine()
+        
+        # Hotspot boxes from Config plus any polygon geofences, behind a grid index
+        fences = fences_from_boxes(self.config.HOTSPOTS) + load_configured_fences(self.config)
+        self.hotspot_index = GeofenceIndex(fences, cell_size=self.config.GEOFENCE_CELL_SIZE)
+        
+        # Per-region, per-category traffic baselines; set by run_bot when surge detection is on
+        self.baseline = None
+        # Airframe metadata cache shared with the scanner; set by run_bot so columnar
+        # scoring honours the metadata military flag like enriched records do
+        self.metadata = None
+    
+    @property
+    def rules(self):
+        """Rules as of the last reload; read per call so a reload takes effect without rebuilding the scorer"""
+        return self.engine.current
+    
+    @property
+    def classifier(self):
+        return self.engine.current.classifier
     
     def is_in_hotspot(self, lat: float, lon: float) -> bool:
         """Check if coordinates are in any geopolitical hotspot"""
-        for hotspot_name, (lat_min, lon_min, lat_max, lon_max) in self.config.HOTSPOTS.items():
-            if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max:
-                return True
-        return False
+        return self.hotspot_index.first(lat, lon) is not None
     
-    def detect_loitering_pattern(self, flight: Dict) -> bool:
+    def detect_loitering_pattern(self, flight: FlightRecord) -> bool:
         """Detect potential loitering behavior"""
-        altitude = flight.get('alt', 0)
-        speed = flight.get('gspeed', 0)
+        # Prefer the pattern found in the aircraft's track history when available
+        if 'track_pattern' in flight:
+            return flight.track_pattern is not None
         
         # Low altitude and slow speed suggests loitering
-        if altitude < 15000 and speed < 250:
+        if flight.altitude < 15000 and flight.ground_speed < 250:
             return True
         
         return False
@@ -28,120 +49,150 @@ class FlightScorer:
         if not aircraft_code:
             return 0
         
-        aircraft_code = aircraft_code.upper()
-        
-        # Bomber aircraft (highest priority)
-        if any(code in aircraft_code for code in ['B1', 'B2', 'B52', 'TU95', 'TU160', 'TU22M']):
-            return self.config.SCORE_WEIGHTS['bomber_aircraft']
-        
-        # High-value reconnaissance aircraft
-        if any(code in aircraft_code for code in ['RC135', 'U2', 'P8', 'E3TF', 'E4B', 'E6B', 'E8C', 'RC12', 'U28', 'MC12', 'P3', 'P8A', 'EP3', 'RC26']):
-            return self.config.SCORE_WEIGHTS['recon_aircraft']
-        
-        # Fighter aircraft
-        if any(code in aircraft_code for code in ['F15', 'F16', 'F18', 'F22', 'F35', 'F14', 'F4', 'MIG29', 'MIG31', 'SU27', 'SU30', 'SU35', 'J10', 'J11', 'J20']):
-            return self.config.SCORE_WEIGHTS['fighter_aircraft']
-        
-        # Tanker aircraft
-        if any(code in aircraft_code for code in ['KC135', 'KC10', 'KC46', 'KC130', 'KC767', 'A330MRTT']):
-            return self.config.SCORE_WEIGHTS['tanker_aircraft']
-        
-        # Transport aircraft
-        if any(code in aircraft_code for code in ['C17', 'C130', 'C5M', 'C30J', 'C27J', 'C295', 'A400M', 'IL76', 'AN124', 'AN225', 'Y20', 'Y9']):
-            return self.config.SCORE_WEIGHTS['transport_aircraft']
-        
-        # Special mission aircraft
-        if any(code in aircraft_code for code in ['AC130', 'MC130', 'EC130', 'WC130', 'HC130']):
-            return self.config.SCORE_WEIGHTS['rare_aircraft']
-        
-        # Helicopters
-        if any(code in aircraft_code for code in ['AH64', 'UH60', 'CH47', 'AH1', 'MI8', 'MI24', 'KA52']):
-            return self.config.SCORE_WEIGHTS['rare_aircraft']
-        
-        # UAV/UAS
-        if any(code in aircraft_code for code in ['MQ1', 'MQ9', 'RQ4', 'RQ170', 'RQ180', 'MQ4', 'MQ8']):
-            return self.config.SCORE_WEIGHTS['rare_aircraft']
-        
-        # Other military aircraft
-        if any(code in aircraft_code for code in ['A10', 'AV8', 'EA18', 'EA6', 'EF18', 'F15E', 'F16C', 'F16D']):
-            return self.config.SCORE_WEIGHTS['fighter_aircraft']
-        
-        return 0
+        return self.rules.type_weight(aircraft_code.upper())
     
     def get_callsign_score(self, callsign: str) -> int:
         """Score callsign based on military patterns"""
         if not callsign:
             return 0
         
-        callsign = callsign.upper()
-        
-        for military_prefix in self.config.MILITARY_CALLSIGNS:
-            if callsign.startswith(military_prefix):
-                return self.config.SCORE_WEIGHTS['military_callsign']
+        if self.classifier.callsign_match(callsign):
+            return self.rules.weights['military_callsign']
         
         return 0
     
-    def get_operator_score(self, flight: Dict) -> int:
+    def get_operator_score(self, flight: FlightRecord) -> int:
         """Score based on known military operators"""
-        painted_as = flight.get('painted_as', '').upper()
-        operating_as = flight.get('operating_as', '').upper()
-        
-        military_operators = [
-            'USAF', 'USN', 'USMC', 'USARMY', 'NATO', 'RAF', 'LUFTWAFFE',
-            'ARMEE', 'AERONAUTICA', 'EJERCITO', 'FUERZA', 'FORCA', 'SILA',
-            'VOENNO', 'VOZDUSHNO', 'KONGSBERG', 'KONGSBERG', 'KONGSBERG'
-        ]
-        
-        if painted_as in military_operators or operating_as in military_operators:
-            return self.config.SCORE_WEIGHTS['military_operator']
+        operator_codes = self.rules.operator_codes
+        if flight.painted_as in operator_codes or flight.operating_as in operator_codes:
+            return self.rules.weights['military_operator']
         
         return 0
     
-    def get_squawk_score(self, flight: Dict) -> int:
+    def get_squawk_score(self, flight: FlightRecord) -> int:
         """Score based on unusual squawk codes"""
-        squawk = flight.get('squawk', '')
-        
-        # Military squawk codes (7500, 7600, 7700 are emergency codes)
-        military_squawks = ['7500', '7600', '7700', '7777', '0000', '1200']
-        
-        if squawk in military_squawks:
-            return self.config.SCORE_WEIGHTS['squawk_anomaly']
+        if flight.squawk in self.rules.squawk_anomalies:
+            return self.rules.weights['squawk_anomaly']
         
         return 0
     
-    def is_military(self, flight: Dict) -> bool:
-        callsign = (flight.get('callsign') or '').upper()
-        aircraft_type = (flight.get('type') or '').upper()
-        operator = (flight.get('operating_as') or '').upper()
-        painted_as = (flight.get('painted_as') or '').upper()
-        reg = (flight.get('reg') or '').upper()
-        # Check callsign
-        for pattern in self.config.MILITARY_CALLSIGNS:
-            if callsign.startswith(pattern):
-                return True
-        # Check aircraft type
-        for mtype in self.config.MILITARY_AIRCRAFT_TYPES:
-            if mtype in aircraft_type:
-                return True
-        # Check operator
-        for op in self.config.MILITARY_OPERATORS:
-            if op in operator or op in painted_as:
-                return True
-        # Check registration prefix (optional, e.g. "ZZ" for RAF)
-        for prefix in self.config.MILITARY_REG_PREFIXES:
-            if reg.startswith(prefix):
-                return True
-        return False
+    def get_surge_score(self, flight: FlightRecord) -> int:
+        """Score aircraft whose region and category carry unusually many military aircraft this scan"""
+        if self.baseline is None or self.baseline.surge_for(flight) is None:
+            return 0
+        return self.rules.weights.get('regional_surge', 0)
+    
+    def scan_inputs(self):
+        """Scan-wide scoring inputs, so cached per-flight scores can be dropped when they change"""
+        if self.baseline is None:
+            return None
+        return frozenset(self.baseline.surges)
+    
+    def is_military(self, flight: FlightRecord) -> bool:
+        return getattr(flight, 'military', None) is True or self.rules.evaluate(flight).military
 
-    def score_flight(self, flight: Dict) -> int:
+    def get_identity_score(self, flight: FlightRecord) -> int:
+        """Base score for being military plus the type, callsign, operator and squawk bonuses"""
+        # The type weight comes from the memoized rule evaluation rather than a category scan
+        return (self.rules.weights['military_base']
+                + self.rules.evaluate(flight).type_weight
+                + self.get_callsign_score(flight.callsign)
+                + self.get_operator_score(flight)
+                + self.get_squawk_score(flight))
+
+    def score_upper_bound(self, flight: FlightRecord) -> int:
+        """
+        Cheap ceiling on score_flight: the memoized type weight plus the full
+        callsign, operator, squawk and position bonuses, whether or not they apply
+        """
+        rules = self.rules
+        identity = rules.evaluate(flight)
+        if not (getattr(flight, 'military', None) is True or identity.military):
+            return 0
+        weights = rules.weights
+        bound = (weights['military_base'] + identity.type_weight + weights['military_callsign']
+                 + weights['military_operator'] + weights['squawk_anomaly'] + weights['loitering_pattern'])
+        if len(self.hotspot_index):
+            bound += weights['hotspot_location']
+        if self.baseline is not None and self.baseline.surges:
+            bound += weights.get('regional_surge', 0)
+        return bound
+
+    def score_flight(self, flight: FlightRecord) -> int:
+        rules = self.rules
         if not self.is_military(flight):
             return 0
         # If military, apply further scoring (e.g. loitering, hotspot, etc.)
-        score = 5  # base score for being military
-        lat = flight.get('lat')
-        lon = flight.get('lon')
+        weights = rules.weights
+        score = self.get_identity_score(flight)
+        lat = flight.latitude
+        lon = flight.longitude
         if lat and lon and self.is_in_hotspot(lat, lon):
-            score += 2
+            score += weights['hotspot_location']
         if self.detect_loitering_pattern(flight):
-            score += 3
-        return score 
\ No newline at end of file
+            score += weights['loitering_pattern']
+        score += self.get_surge_score(flight)
+        return score 
+
+    def _enriched_column(self, batch, column: str, field: str, fn, dtype=bool):
+        """
+        fn per row of a string column, taking the airframe's metadata value where the
+        payload left it empty, as enrichment does for records on the dict path
+        """
+        import numpy as np
+        
+        values = batch.strings[column]
+        result = values.map_vocabulary(fn, dtype=dtype)
+        if self.metadata is None:
+            return result
+        missing = values.map_vocabulary(lambda value: not value)
+        if not missing.any():
+            return result
+        
+        def from_metadata(hex_code: str):
+            record = self.metadata.lookup(hex_code)
+            return fn(getattr(record, field) if record is not None else '')
+        
+        return np.where(missing, batch.hex.map_vocabulary(from_metadata, dtype=dtype), result)
+
+    def score_batch(self, batch, track_patterns: Optional[Dict[str, Dict]] = None):
+        """
+        Vectorized score_flight over a FlightBatch: returns one integer score
+        per row using the batch's own position and kinematics columns; rows whose
+        track appears in track_patterns (keyed like the track store) use its pattern
+        """
+        import numpy as np
+        
+        rules = self.rules
+        weights = rules.weights
+        military = batch.strict_military_mask(rules.classifier)
+        if self.metadata is not None:
+            military |= batch.hex.map_vocabulary(self.metadata.known_military)
+        operator_codes = rules.operator_codes
+        is_operator = lambda value: normalize(value) in operator_codes
+        identity = (weights['military_base']
+                    + self._enriched_column(batch, 'aircraft_code', 'aircraft_type',
+                                            self.get_aircraft_interest_score, np.int64)
+                    + batch.callsign.map_vocabulary(self.get_callsign_score, dtype=np.int64)
+                    + weights['military_operator'] * (self._enriched_column(batch, 'painted_as', 'painted_as', is_operator)
+                                                       | self._enriched_column(batch, 'operating_as', 'operator', is_operator))
+                    + weights['squawk_anomaly'] * batch.squawk.map_vocabulary(rules.squawk_anomalies.__contains__))
+        has_position = (batch.lat != 0) & (batch.lon != 0)
+        hotspot = has_position & self.hotspot_index.contains_batch(batch.lat, batch.lon)
+        # Low altitude and slow speed, unless the aircraft's track has a verdict of its own
+        loitering = (batch.alt < 15000) & (batch.gspeed < 250)
+        if track_patterns:
+            has_pattern = lambda key: (track_patterns.get(key) or {}).get('pattern') is not None
+            # Tracks are keyed by flight id, else registration, like TrackStore.ingest_batch
+            by_id = batch.ids.map_vocabulary(bool)
+            tracked = np.where(by_id, batch.ids.map_vocabulary(track_patterns.__contains__),
+                               batch.registration.map_vocabulary(track_patterns.__contains__))
+            patterned = np.where(by_id, batch.ids.map_vocabulary(has_pattern),
+                                 batch.registration.map_vocabulary(has_pattern))
+            loitering = np.where(tracked, patterned, loitering)
+        scores = (identity
+                  + weights['hotspot_location'] * hotspot.astype(np.int64)
+                  + weights['loitering_pattern'] * loitering.astype(np.int64))
+        if self.baseline is not None and self.baseline.surges:
+            scores = scores + weights.get('regional_surge', 0) * self.baseline.surge_mask(batch).astype(np.int64)
+        return np.where(military, scores, 0)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+Sharded Classification
+Optional process pool for the columnar scan. The raw response body is copied
+once into shared memory and cut into byte ranges at aircraft boundaries; each
+worker decodes, parses and classifies its own range with rules compiled once
+per process, and only the military rows come back, merged in payload order
+"""
+
+import logging
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from core.columnar import FlightBatch
+
+logger = logging.getLogger(__name__)
+
+# Between two aircraft objects of the top-level "data" array
+_BOUNDARY = re.compile(rb'\}\s*,\s*\{')
+_DATA_ARRAY = re.compile(rb'^\s*\{\s*"data"\s*:\s*\[')
+_ARRAY_END = re.compile(rb'\]\s*\}\s*$')
+
+
+def split_array(body: bytes, shards: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Byte ranges of roughly equal size, each holding whole elements of the body's
+    "data" array; None when the body is not shaped like {"data": [...]}. A cut
+    that lands inside a string leaves its range undecodable, never silently wrong
+    """
+    start = _DATA_ARRAY.match(body)
+    end = _ARRAY_END.search(body)
+    if start is None or end is None or end.start() <= start.end():
+        return None
+    first, last = start.end(), end.start()
+    ranges = []
+    position = first
+    for shard in range(1, shards):
+        cut = _BOUNDARY.search(body, max(position, first + (last - first) * shard // shards), last)
+        if cut is None:
+            break
+        ranges.append((position, cut.start() + 1))
+        position = cut.end() - 1
+    ranges.append((position, last))
+    return ranges
+
+
+class ShardResult(NamedTuple):
+    batch: FlightBatch  # every row when kept, else only the military rows
+    mask: np.ndarray  # military rows of batch
+    total: int  # aircraft in the payload
+
+
+# Per-worker state: shared-memory attachments by role, rules by file mtime
+_attached: Dict[str, SharedMemory] = {}
+_rules = None
+_rules_mtime = None
+
+
+def _attach(role: str, name: str) -> SharedMemory:
+    block = _attached.get(role)
+    if block is None or block.name != name:
+        if block is not None:
+            block.close()
+        block = _attached[role] = SharedMemory(name=name)
+    return block
+
+
+def _warm_worker():
+    """Pool initializer: compile the rules before the first shard arrives"""
+    from core.rules import get_rule_engine
+
+    global _rules, _rules_mtime
+    engine = get_rule_engine()
+    _rules, _rules_mtime = engine.current, engine.mtime
+
+
+def _current_rules(mtime: Optional[float]):
+    """The rules the parent is scanning with: reloaded here whenever its file version moves"""
+    global _rules, _rules_mtime
+    if mtime != _rules_mtime:
+        from core.rules import RuleSet, get_rule_engine
+
+        engine = get_rule_engine()
+        try:
+            _rules = RuleSet.from_file(engine.path, engine.cache_size)
+        except Exception as e:
+            logger.error("❌ Shard worker kept its rules, reload failed: %s", e)
+        _rules_mtime = mtime
+    return _rules
+
+
+def _classify_shard(body_name: str, start: int, end: int, rules_mtime: Optional[float],
+                    military_name: Optional[str], military_dtype: str, military_count: int,
+                    keep_all: bool) -> Tuple[int, FlightBatch, Optional[np.ndarray]]:
+    """Decode, parse and classify one byte range of the shared body"""
+    import json
+
+    body = _attach('body', body_name)
+    rows = json.loads(b''.join((b'[', bytes(body.buf[start:end]), b']')))
+    batch = FlightBatch.from_api_payload({'data': rows})
+    mask = batch.military_mask(_current_rules(rules_mtime).classifier)
+    if military_count:
+        known = np.ndarray((military_count,), dtype=military_dtype, buffer=_attach('military', military_name).buf)
+        encoded = [value.upper().encode('ascii', 'replace') for value in batch.hex.vocabulary]
+        if encoded:
+            # Each distinct hex is looked up once by binary search, then broadcast to its rows
+            vocabulary = np.array(encoded, dtype=military_dtype)
+            found = np.searchsorted(known, vocabulary).clip(0, military_count - 1)
+            fits = np.fromiter((len(value) <= known.itemsize for value in encoded), dtype=bool, count=len(encoded))
+            mask |= ((known[found] == vocabulary) & fits)[batch.hex.codes]
+    if keep_all:
+        return len(batch), batch, mask
+    return len(batch), batch.filter(mask).compact(), None
+
+
+def _noop() -> bool:
+    return True
+
+
+class ShardedClassifier:
+    """
+    Pool of spawned worker processes that turns a raw flight-positions body into
+    its military rows. Rules stay compiled in every worker; the metadata
+    military flags travel to them as a sorted hex array in shared memory,
+    reread from the database every military_refresh seconds
+    """
+
+    def __init__(self, workers: int, engine, metadata=None, min_bytes: int = 1 << 20,
+                 military_refresh: float = 3600.0):
+        self.workers = workers
+        self.engine = engine
+        self.metadata = metadata
+        self.min_bytes = min_bytes
+        self.military_refresh = military_refresh
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_warm_worker)
+        self._body: Optional[SharedMemory] = None
+        self._military: Optional[SharedMemory] = None
+        self._military_count = 0
+        self._military_dtype = 'S6'
+        self._military_loaded_at: Optional[float] = None
+        self.sharded = 0
+        self.fallbacks = 0
+
+    def warm(self):
+        """Start every worker now rather than inside the first scan"""
+        for future in [self._executor.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+        logger.info("🧮 %s shard workers ready", self.workers)
+
+    def _refresh_military(self):
+        if self.metadata is None:
+            return
+        now = time.monotonic()
+        if self._military_loaded_at is not None and now - self._military_loaded_at < self.military_refresh:
+            return
+        self._military_loaded_at = now
+        encoded = sorted({hex_code.encode('ascii', 'replace') for hex_code in self.metadata.military_hexes()})
+        hexes = np.array(encoded, dtype=f"S{max([6] + [len(value) for value in encoded])}")
+        if self._military is not None:
+            # Workers reattach by name, so a new block never races a reader of the old one
+            self._military.close()
+            self._military.unlink()
+            self._military = None
+        self._military_count = len(hexes)
+        self._military_dtype = hexes.dtype.str
+        if len(hexes):
+            self._military = SharedMemory(create=True, size=hexes.nbytes)
+            self._military.buf[:hexes.nbytes] = hexes.tobytes()
+
+    def _share_body(self, body: bytes) -> SharedMemory:
+        if self._body is None or self._body.size < len(body):
+            if self._body is not None:
+                self._body.close()
+                self._body.unlink()
+            # Headroom so a growing feed does not reallocate every scan
+            self._body = SharedMemory(create=True, size=max(len(body) * 5 // 4, 1 << 20))
+        self._body.buf[:len(body)] = body
+        return self._body
+
+    def classify(self, body: bytes, keep_all: bool = False) -> Optional[ShardResult]:
+        """
+        Military rows of the payload, in payload order; None when the body is too
+        small to be worth sharding or not splittable, and the caller should parse it itself
+        """
+        ranges = split_array(body, self.workers) if len(body) >= self.min_bytes else None
+        if not ranges:
+            return None
+        self._refresh_military()
+        block = self._share_body(body)
+        military_name = self._military.name if self._military is not None else None
+        futures = [self._executor.submit(_classify_shard, block.name, start, end, self.engine.mtime,
+                                         military_name, self._military_dtype, self._military_count, keep_all)
+                   for start, end in ranges]
+        try:
+            results = [future.result() for future in futures]
+        except ValueError as e:
+            # A cut inside a string or a malformed body: let the serial path decide
+            self.fallbacks += 1
+            logger.debug("Sharded parse failed, falling back to a serial parse: %s", e)
+            return None
+        self.sharded += 1
+        return merge_shards(results)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for block in (self._body, self._military):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._body = self._military = None
+
+
+def merge_shards(results: Sequence[Tuple[int, FlightBatch, Optional[np.ndarray]]]) -> ShardResult:
+    """Concatenate shard results in range order, so the merge is independent of which worker finished first"""
+    total = sum(count for count, _, _ in results)
+    batch = FlightBatch.concat([shard for _, shard, _ in results])
+    if all(mask is None for _, _, mask in results):
+        return ShardResult(batch, np.ones(len(batch), dtype=bool), total)
+    return ShardResult(batch, np.concatenate([mask for _, _, mask in results]), total)
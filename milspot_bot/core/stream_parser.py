@@ -0,0 +1,132 @@
+"""
+Streaming JSON Parser
+Decodes FlightRadar24 responses incrementally from the socket so records can
+be filtered as they arrive instead of after the whole body is in memory
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Tuple
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+class StreamingJSONReader:
+    """Pull-style reader over an iterable of byte chunks"""
+
+    def __init__(self, chunks: Iterable[bytes], compact_threshold: int = 1 << 16):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._compact_threshold = compact_threshold
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer; False once the stream is exhausted"""
+        if self.eof:
+            return False
+        if self.pos >= self._compact_threshold:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.buffer += self._decoder.decode(b'', final=True)
+            self.eof = True
+            return False
+        self.bytes_read += len(chunk)
+        self.buffer += self._decoder.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it ('' at end of stream)"""
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            length = len(buffer)
+            while pos < length and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < length:
+                return buffer[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode one complete JSON value starting at the current position"""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut by a chunk boundary decodes as a shorter number
+            # ("45." -> 45), so only accept it once a terminator is buffered
+            if not self.eof and (end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARS):
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+    def members(self) -> Iterator[str]:
+        """
+        Iterate the keys of the object at the current position; the caller must
+        consume each member's value (value(), array_items() or skip) before advancing
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed object near offset {self.pos}")
+
+    def array_items(self) -> Iterator[Any]:
+        """Iterate the elements of the array at the current position one value at a time"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Malformed array near offset {self.pos}")
+
+
+def iter_array_field(chunks: Iterable[bytes], field: str) -> Iterator[Any]:
+    """Yield the elements of a top-level object's array field, e.g. the 'data' list of the live API"""
+    reader = StreamingJSONReader(chunks)
+    for key in reader.members():
+        if key == field and reader.peek() == '[':
+            yield from reader.array_items()
+        else:
+            reader.value()
+
+
+def iter_object_members(chunks: Iterable[bytes]) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) pairs of a top-level object, e.g. the flight entries of feed.js"""
+    reader = StreamingJSONReader(chunks)
+    for key in reader.members():
+        yield key, reader.value()
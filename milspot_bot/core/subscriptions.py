@@ -0,0 +1,132 @@
+"""
+Subscription Registry
+Routes each scored flight to the subscribers whose region, category, callsign
+and minimum-score filters it satisfies, using an index bucketed by category and
+region, and caps each subscriber at its own top-K alerts per scan
+"""
+
+import bisect
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+ANY = '*'
+
+
+class Subscriber:
+    """One recipient and its filters; an empty filter matches everything"""
+
+    def __init__(self, name: str, number: str, regions: Sequence[str] = (), categories: Sequence[str] = (),
+                 callsigns: Sequence[str] = (), min_score: int = 0, top_k: int = 1):
+        self.name = name
+        self.number = number
+        self.regions = tuple(regions)
+        self.categories = tuple(category.lower() for category in categories)
+        self.callsigns = tuple(prefix.upper() for prefix in callsigns)
+        self.min_score = min_score
+        self.top_k = top_k
+
+    @classmethod
+    def from_dict(cls, data: Dict, min_score: int = 0, top_k: int = 1) -> 'Subscriber':
+        """Subscriber from a SUBSCRIBERS_FILE entry; min_score and top_k apply when the entry has none"""
+        return cls(
+            name=data.get('name') or data['number'],
+            number=data['number'],
+            regions=data.get('regions') or (),
+            categories=data.get('categories') or (),
+            callsigns=data.get('callsigns') or (),
+            min_score=int(data.get('min_score', min_score)),
+            top_k=int(data.get('top_k', top_k)),
+        )
+
+    def accepts_callsign(self, callsign: str) -> bool:
+        return not self.callsigns or (callsign or '').upper().startswith(self.callsigns)
+
+
+class SubscriptionRegistry:
+    """
+    Subscribers are filed under every (category, region) pair they ask for, with
+    '*' standing in for an unfiltered dimension; each bucket is sorted by
+    min_score, so routing a flight is a handful of lookups and bisections
+    """
+
+    def __init__(self, subscribers: Iterable[Subscriber] = ()):
+        self.subscribers: List[Subscriber] = list(subscribers)
+        self._buckets: Dict[Tuple[str, str], List[Tuple[int, int]]] = defaultdict(list)
+        for sub_id, subscriber in enumerate(self.subscribers):
+            for category in subscriber.categories or (ANY,):
+                for region in subscriber.regions or (ANY,):
+                    self._buckets[(category, region)].append((subscriber.min_score, sub_id))
+        for bucket in self._buckets.values():
+            bucket.sort()
+        self._bucket_scores = {key: [min_score for min_score, _ in bucket] for key, bucket in self._buckets.items()}
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
+
+    @property
+    def min_score(self) -> int:
+        """Lowest score any subscriber accepts: flights below it can't reach anyone"""
+        return min((subscriber.min_score for subscriber in self.subscribers), default=0)
+
+    def match(self, score: int, categories: Sequence[str], regions: Sequence[str], callsign: str = '') -> List[Subscriber]:
+        """Subscribers that want a flight with this score, aircraft categories, callsign and any of its regions"""
+        matched = set()
+        for category in (*categories, ANY):
+            for region_key in (*regions, ANY):
+                key = (category, region_key)
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                # Everyone up to the first min_score above this flight's score qualifies
+                eligible = bisect.bisect_right(self._bucket_scores[key], score)
+                matched.update(sub_id for _, sub_id in bucket[:eligible])
+        return [self.subscribers[sub_id] for sub_id in sorted(matched)
+                if self.subscribers[sub_id].accepts_callsign(callsign)]
+
+    def route(self, ranked: Iterable[Tuple[FlightRecord, int]], analyzer) -> List[Tuple[FlightRecord, int, List[Subscriber]]]:
+        """
+        (flight, score, recipients) for every flight someone wants, each subscriber
+        receiving at most its top_k best; ranked must be ordered best first
+        """
+        quota = {id(subscriber): subscriber.top_k for subscriber in self.subscribers}
+        open_quotas = sum(1 for left in quota.values() if left > 0)
+        routed = []
+        for flight, score in ranked:
+            if not open_quotas:
+                break
+            recipients = [subscriber for subscriber in self.match(
+                score,
+                analyzer.categorize_aircraft(flight.aircraft_code),
+                analyzer.regions_of(flight.latitude, flight.longitude),
+                flight.callsign,
+            ) if quota[id(subscriber)] > 0]
+            if not recipients:
+                continue
+            for subscriber in recipients:
+                quota[id(subscriber)] -= 1
+                if not quota[id(subscriber)]:
+                    open_quotas -= 1
+            routed.append((flight, score, recipients))
+        return routed
+
+def load_subscriptions(config) -> SubscriptionRegistry:
+    """Subscribers from SUBSCRIBERS_FILE, else WHATSAPP_TO_NUMBER as a single unfiltered subscriber"""
+    if config.SUBSCRIBERS_FILE:
+        with open(config.SUBSCRIBERS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('subscribers', []) if isinstance(data, dict) else data
+        registry = SubscriptionRegistry(
+            Subscriber.from_dict(entry, min_score=config.ALERT_MIN_SCORE, top_k=config.ALERT_TOP_K)
+            for entry in entries
+        )
+        logger.info("👥 Loaded %s subscribers from %s", len(registry), config.SUBSCRIBERS_FILE)
+        return registry
+    if config.WHATSAPP_TO_NUMBER:
+        return SubscriptionRegistry([Subscriber('default', config.WHATSAPP_TO_NUMBER,
+                                                min_score=config.ALERT_MIN_SCORE, top_k=config.ALERT_TOP_K)])
+    return SubscriptionRegistry()
@@ -0,0 +1,133 @@
+"""
+Tiled Concurrent Fetching
+Splits the scan area into bounding-box tiles, fetches them concurrently and
+merges the results, subdividing any tile that hits the provider's row cap
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from core.flight_record import FlightRecord
+
+logger = logging.getLogger(__name__)
+
+
+class Tile(NamedTuple):
+    lat_min: float
+    lat_max: float
+    lon_min: float
+    lon_max: float
+
+    def bounds_param(self) -> str:
+        """FR24 API bounds string: north,south,west,east"""
+        return f"{self.lat_max:.3f},{self.lat_min:.3f},{self.lon_min:.3f},{self.lon_max:.3f}"
+
+    def split(self) -> List['Tile']:
+        """Quarter the tile"""
+        lat_mid = (self.lat_min + self.lat_max) / 2
+        lon_mid = (self.lon_min + self.lon_max) / 2
+        return [
+            Tile(self.lat_min, lat_mid, self.lon_min, lon_mid),
+            Tile(self.lat_min, lat_mid, lon_mid, self.lon_max),
+            Tile(lat_mid, self.lat_max, self.lon_min, lon_mid),
+            Tile(lat_mid, self.lat_max, lon_mid, self.lon_max),
+        ]
+
+
+def make_tiles(area: Tile, rows: int, cols: int) -> List[Tile]:
+    """Cut an area into a rows x cols grid of tiles"""
+    lat_step = (area.lat_max - area.lat_min) / rows
+    lon_step = (area.lon_max - area.lon_min) / cols
+    return [
+        Tile(area.lat_min + r * lat_step, area.lat_min + (r + 1) * lat_step,
+             area.lon_min + c * lon_step, area.lon_min + (c + 1) * lon_step)
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+def flight_key(flight: FlightRecord) -> Optional[str]:
+    """Identity used to merge aircraft reported by neighbouring tiles"""
+    return flight.id or flight.registration or flight.callsign or None
+
+
+def merge_flights(results: List[List[FlightRecord]]) -> List[FlightRecord]:
+    """Concatenate tile results, keeping the first occurrence of each aircraft"""
+    merged = []
+    seen = set()
+    for flights in results:
+        for flight in flights:
+            key = flight_key(flight)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(flight)
+    return merged
+
+
+def merge_payloads(payloads: Iterable[Dict]) -> Dict:
+    """One response body holding the aircraft of every tile response, deduplicated like merge_flights"""
+    rows = []
+    seen = set()
+    for payload in payloads:
+        data = payload.get('data') if isinstance(payload, dict) else None
+        for row in data if isinstance(data, list) else ():
+            if not isinstance(row, dict):
+                continue
+            key = row.get('fr24_id') or (row.get('reg') or '').upper() or (row.get('callsign') or '').upper() or None
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            rows.append(row)
+    return {'data': rows}
+
+
+class TiledFetcher:
+    def __init__(self, scanner, concurrency: int = 8, response_cap: int = 20000, max_depth: int = 3):
+        self.scanner = scanner
+        self.concurrency = concurrency
+        self.response_cap = response_cap
+        self.max_depth = max_depth
+        self.requests_made = 0
+        self.tiles_split = 0
+
+        # Size the client's connection pool so concurrent tiles reuse keep-alive connections
+        scanner.client.resize_pool(concurrency)
+
+    async def _fetch_tile(self, tile: Tile, depth: int, semaphore: asyncio.Semaphore) -> List[FlightRecord]:
+        async with semaphore:
+            self.requests_made += 1
+            flights = await asyncio.to_thread(self.scanner.get_flightradar24_api_data, tile.bounds_param())
+
+        # A full response means the provider truncated the tile; refetch it as quarters
+        if len(flights) >= self.response_cap and depth < self.max_depth:
+            self.tiles_split += 1
+            logger.info("🧩 Tile %s hit the %s row cap, splitting", tile.bounds_param(), self.response_cap)
+            children = await asyncio.gather(*(self._fetch_tile(child, depth + 1, semaphore) for child in tile.split()))
+            return merge_flights(children)
+        return flights
+
+    async def fetch_async(self, tiles: List[Tile]) -> List[FlightRecord]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._fetch_tile(tile, 0, semaphore) for tile in tiles))
+        return merge_flights(results)
+
+    def fetch(self, area: Tile, rows: int, cols: int) -> List[FlightRecord]:
+        """Fetch every tile of area concurrently and return the merged, deduplicated flights"""
+        tiles = make_tiles(area, rows, cols)
+        self.requests_made = 0
+        self.tiles_split = 0
+        flights = asyncio.run(self.fetch_async(tiles))
+        logger.info("🧩 Tiled fetch: %s tiles, %s requests, %s splits, %s unique aircraft",
+                    len(tiles), self.requests_made, self.tiles_split, len(flights))
+        return flights
+
+
+def parse_area(value: str) -> Tuple[float, float, float, float]:
+    """Parse "lat_min,lat_max,lon_min,lon_max" from configuration"""
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError(f"Expected lat_min,lat_max,lon_min,lon_max, got {value!r}")
+    return tuple(parts)
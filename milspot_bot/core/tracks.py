@@ -0,0 +1,139 @@
+"""
+Track History Store
+Keeps the last N positions of every tracked aircraft in one preallocated NumPy
+block of float32 ring buffers, evicting aircraft that stop appearing in the feed
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from core.flight_record import FlightRecord
+from core.tiling import flight_key
+
+# Column order of every stored sample
+TRACK_FIELDS = ('timestamp', 'lat', 'lon', 'alt', 'gspeed', 'heading')
+T, LAT, LON, ALT, GSPEED, HEADING = range(len(TRACK_FIELDS))
+
+
+class TrackStore:
+    def __init__(self, history: int = 32, stale_after: float = 900.0, initial_capacity: int = 1024):
+        self.history = history
+        self.stale_after = stale_after
+        # Samples are float32; timestamps are stored relative to epoch to keep sub-second precision
+        self.epoch = time.time()
+        self.samples = np.full((initial_capacity, history, len(TRACK_FIELDS)), np.nan, dtype=np.float32)
+        self.head = np.zeros(initial_capacity, dtype=np.int32)   # next write position per slot
+        self.count = np.zeros(initial_capacity, dtype=np.int32)  # samples held per slot
+        self.last_seen = np.zeros(initial_capacity, dtype=np.float64)
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = [None] * initial_capacity
+        self._free: List[int] = list(range(initial_capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    @property
+    def capacity(self) -> int:
+        return len(self._keys)
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        self.samples = np.concatenate([self.samples, np.full((new - old, self.history, len(TRACK_FIELDS)), np.nan, dtype=np.float32)])
+        self.head = np.concatenate([self.head, np.zeros(new - old, dtype=np.int32)])
+        self.count = np.concatenate([self.count, np.zeros(new - old, dtype=np.int32)])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(new - old, dtype=np.float64)])
+        self._keys.extend([None] * (new - old))
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _allocate(self, key: str) -> int:
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self.samples[slot] = np.nan
+        return slot
+
+    def append(self, key: str, lat: float, lon: float, alt: float, gspeed: float, heading: float, timestamp: float):
+        """Add one position to an aircraft's ring buffer, skipping exact repeats of the last fix"""
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key)
+        self.last_seen[slot] = timestamp
+
+        sample = np.array((timestamp - self.epoch, lat, lon, alt, gspeed, heading), dtype=np.float32)
+        head = self.head[slot]
+        if self.count[slot]:
+            last = self.samples[slot, head - 1]
+            if last[LAT] == sample[LAT] and last[LON] == sample[LON] and last[ALT] == sample[ALT]:
+                return
+        self.samples[slot, head] = sample
+        self.head[slot] = (head + 1) % self.history
+        if self.count[slot] < self.history:
+            self.count[slot] += 1
+
+    def ingest(self, flights: Iterable[FlightRecord], now: Optional[float] = None) -> int:
+        """Feed one scan's flights into the store, then evict stale aircraft; returns evictions"""
+        now = time.time() if now is None else now
+        for flight in flights:
+            key = flight_key(flight)
+            if key is None:
+                continue
+            self.append(key, flight.latitude, flight.longitude, flight.altitude, flight.ground_speed,
+                        flight.heading, now)
+        return self.evict_stale(now)
+
+    def ingest_batch(self, batch, now: Optional[float] = None) -> int:
+        """Columnar counterpart of ingest for a FlightBatch"""
+        now = time.time() if now is None else now
+        ids = batch.ids
+        registrations = batch.registration
+        columns = zip(batch.lat.tolist(), batch.lon.tolist(), batch.alt.tolist(),
+                      batch.gspeed.tolist(), batch.heading.tolist())
+        for i, (lat, lon, alt, gspeed, heading) in enumerate(columns):
+            key = ids[i] or registrations[i]
+            if key:
+                self.append(key, lat, lon, alt, gspeed, heading, now)
+        return self.evict_stale(now)
+
+    def evict_stale(self, now: float) -> int:
+        """Release slots of aircraft not seen for stale_after seconds"""
+        cutoff = now - self.stale_after
+        stale = [key for key, slot in self._slots.items() if self.last_seen[slot] < cutoff]
+        for key in stale:
+            self.remove(key)
+        return len(stale)
+
+    def remove(self, key: str):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._keys[slot] = None
+        self.count[slot] = 0
+        self._free.append(slot)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Chronological (n, len(TRACK_FIELDS)) float64 array of an aircraft's samples, absolute timestamps"""
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        track = self.ordered(slot).astype(np.float64)
+        track[:, T] += self.epoch
+        return track
+
+    def ordered(self, slot: int) -> np.ndarray:
+        """Chronological float32 samples of one slot, timestamps relative to epoch"""
+        count = self.count[slot]
+        if count < self.history:
+            return self.samples[slot, :count].copy()
+        return np.roll(self.samples[slot], -self.head[slot], axis=0)
+
+    def active_slots(self) -> Dict[str, int]:
+        """Mapping of tracked aircraft keys to their slot in the sample block"""
+        return dict(self._slots)
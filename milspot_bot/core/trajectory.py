@@ -0,0 +1,116 @@
+"""
+Trajectory Analytics
+Classifies orbit, racetrack and loiter patterns from track history, evaluating
+every tracked aircraft in one batched NumPy pass
+"""
+
+from typing import Dict
+import numpy as np
+from config import Config
+from core.tracks import TrackStore, LAT, LON
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320
+MIN_SEGMENT_KM = 0.05  # shorter hops carry no usable course
+
+
+class TrajectoryAnalyzer:
+    def __init__(self):
+        self.config = Config()
+        self.min_samples = self.config.TRAJECTORY_MIN_SAMPLES
+        self.max_radius_km = self.config.TRAJECTORY_MAX_RADIUS_KM
+        self.min_turn_deg = self.config.TRAJECTORY_MIN_TURN_DEG
+        self.min_path_ratio = self.config.TRAJECTORY_MIN_PATH_RATIO
+        self.racetrack_elongation = self.config.TRAJECTORY_RACETRACK_ELONGATION
+
+    def analyze(self, store: TrackStore) -> Dict[str, Dict]:
+        """
+        Return pattern metrics for every aircraft with enough history, keyed like
+        the store; 'pattern' is 'orbit', 'racetrack', 'loiter' or None
+        """
+        slots = store.active_slots()
+        if not slots:
+            return {}
+        keys = np.array(list(slots.keys()), dtype=object)
+        slot_ids = np.fromiter(slots.values(), dtype=np.int64, count=len(slots))
+        eligible = store.count[slot_ids] >= self.min_samples
+        keys = keys[eligible]
+        slot_ids = slot_ids[eligible]
+        if not len(slot_ids):
+            return {}
+
+        # Gather every ring buffer in chronological order; unfilled positions stay NaN
+        history = store.history
+        order = (store.head[slot_ids, None] + np.arange(history)) % history
+        samples = store.samples[slot_ids[:, None], order].astype(np.float64)
+        metrics = self._metrics(samples[:, :, LAT], samples[:, :, LON])
+
+        names = list(metrics)
+        columns = [metrics[name].tolist() for name in names]
+        return {key: dict(zip(names, row)) for key, row in zip(keys.tolist(), zip(*columns))}
+
+    def _metrics(self, lat: np.ndarray, lon: np.ndarray) -> Dict[str, np.ndarray]:
+        valid = ~np.isnan(lat)
+        n_valid = valid.sum(axis=1)
+
+        # Local equirectangular projection around each track's centroid; longitude
+        # offsets are wrapped so tracks straddling the antimeridian stay contiguous
+        lat0 = np.nanmean(lat, axis=1, keepdims=True)
+        lon_ref = lon[np.arange(len(lon)), valid.argmax(axis=1)][:, None]
+        dlon = (lon - lon_ref + 180.0) % 360.0 - 180.0
+        x = dlon * KM_PER_DEG_LON * np.cos(np.radians(lat0))
+        y = (lat - lat0) * KM_PER_DEG_LAT
+
+        # Radius of gyration and shape of the point cloud
+        cx = np.nanmean(x, axis=1, keepdims=True)
+        cy = np.nanmean(y, axis=1, keepdims=True)
+        dx = x - cx
+        dy = y - cy
+        gyration = np.sqrt(np.nanmean(dx * dx + dy * dy, axis=1))
+        sxx = np.nanmean(dx * dx, axis=1)
+        syy = np.nanmean(dy * dy, axis=1)
+        sxy = np.nanmean(dx * dy, axis=1)
+        spread = np.sqrt(((sxx - syy) / 2) ** 2 + sxy ** 2)
+        major = (sxx + syy) / 2 + spread
+        minor = np.maximum((sxx + syy) / 2 - spread, 1e-9)
+        elongation = np.sqrt(major / minor)
+
+        # Path length versus straight-line displacement
+        seg_x = np.diff(x, axis=1)
+        seg_y = np.diff(y, axis=1)
+        seg_len = np.hypot(seg_x, seg_y)
+        path = np.nansum(seg_len, axis=1)
+        first = valid.argmax(axis=1)
+        last = lat.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        rows = np.arange(len(lat))
+        displacement = np.hypot(x[rows, last] - x[rows, first], y[rows, last] - y[rows, first])
+        path_ratio = path / np.maximum(displacement, MIN_SEGMENT_KM)
+
+        # Cumulative signed turn from the course over ground between fixes
+        course = np.degrees(np.arctan2(seg_x, seg_y))
+        course[~(seg_len >= MIN_SEGMENT_KM)] = np.nan
+        # Pack usable courses to the left of each row so turns bridge over gaps
+        packed = np.take_along_axis(course, np.argsort(np.isnan(course), axis=1, kind='stable'), axis=1)
+        turns = (np.diff(packed, axis=1) + 180.0) % 360.0 - 180.0
+        total_turn = np.abs(np.nansum(turns, axis=1))
+
+        compact = gyration <= self.max_radius_km
+        circling = compact & (total_turn >= self.min_turn_deg)
+        meandering = compact & (path_ratio >= self.min_path_ratio)
+        racetrack = circling & (elongation >= self.racetrack_elongation)
+        orbit = circling & ~racetrack
+
+        pattern = np.full(len(lat), None, dtype=object)
+        pattern[meandering] = 'loiter'
+        pattern[orbit] = 'orbit'
+        pattern[racetrack] = 'racetrack'
+        pattern[n_valid < self.min_samples] = None
+
+        return {
+            'pattern': pattern,
+            'turn_deg': total_turn,
+            'gyration_km': gyration,
+            'path_ratio': path_ratio,
+            'elongation': elongation,
+            'samples': n_valid,
+        }
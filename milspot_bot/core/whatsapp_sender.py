@@ -5,13 +5,20 @@ Sends formatted messages to WhatsApp via Twilio
 
 import os
 import logging
+from typing import Callable, Optional
 from twilio.rest import Client
 from config import Config
+from core.dispatch import report
+from core.flight_record import FlightRecord
+from core.metrics import WHATSAPP_MESSAGES, span
+
+logger = logging.getLogger(__name__)
 
 class WhatsAppSender:
     def __init__(self):
         self.config = Config()
         self.client = None
+        self.dispatcher = None
         self._initialize_twilio()
     
     def _initialize_twilio(self):
@@ -22,69 +29,111 @@ class WhatsAppSender:
             from_number = self.config.TWILIO_WHATSAPP_NUMBER
             to_number = self.config.WHATSAPP_TO_NUMBER
             
-            if not all([account_sid, auth_token, from_number, to_number]):
-                logging.warning("⚠️ Missing Twilio credentials. WhatsApp notifications will be disabled.")
+            # WHATSAPP_TO_NUMBER is only the default recipient; subscribers bring their own numbers
+            if not all([account_sid, auth_token, from_number]):
+                logger.warning("⚠️ Missing Twilio credentials. WhatsApp notifications will be disabled.")
                 return
             
             self.client = Client(account_sid, auth_token)
+            if self.config.TWILIO_API_BASE_URL:
+                # e.g. the local fake endpoint in core/fake_twilio.py
+                self.client.api.base_url = self.config.TWILIO_API_BASE_URL
             self.from_number = from_number
             self.to_number = to_number
             
-            logging.info("✅ Twilio WhatsApp client initialized successfully")
+            if self.config.WHATSAPP_ASYNC:
+                from core.dispatch import DispatchQueue
+                self.dispatcher = DispatchQueue(
+                    self._create_message,
+                    workers=self.config.WHATSAPP_WORKERS,
+                    rate=self.config.WHATSAPP_RATE_PER_SECOND,
+                    burst=self.config.WHATSAPP_BURST,
+                    max_retries=self.config.WHATSAPP_MAX_RETRIES,
+                    coalesce_window=self.config.WHATSAPP_COALESCE_SECONDS,
+                )
+            
+            logger.info("✅ Twilio WhatsApp client initialized successfully")
             
         except Exception as e:
-            logging.error(f"❌ Failed to initialize Twilio client: {e}")
+            logger.error("❌ Failed to initialize Twilio client: %s", e)
             self.client = None
     
-    def send_message(self, message: str) -> bool:
+    def _create_message(self, to: str, body: str):
+        """Create the message through Twilio; raises TwilioRestException on HTTP errors"""
+        try:
+            with span('twilio'):
+                twilio_message = self.client.messages.create(
+                    from_=self.from_number,
+                    body=body,
+                    to=to
+                )
+        except Exception:
+            WHATSAPP_MESSAGES.labels('failed').inc()
+            raise
+        WHATSAPP_MESSAGES.labels('sent').inc()
+        
+        logger.info("✅ WhatsApp message sent successfully (SID: %s)", twilio_message.sid)
+        return twilio_message
+    
+    def send_message(self, message: str, to: str = None, on_done: Optional[Callable[[bool], None]] = None) -> bool:
         """
         Send a WhatsApp message via Twilio
         
         Args:
             message: The message to send
+            to: Destination number, defaults to WHATSAPP_TO_NUMBER
+            on_done: Called once with True when Twilio accepted the message, False when it
+                was given up on; from a dispatch worker when the message was queued
             
         Returns:
-            bool: True if message sent successfully, False otherwise
+            bool: True if message sent (or queued for delivery) successfully, False otherwise
         """
         if not self.client:
-            logging.warning("⚠️ Twilio client not initialized. Cannot send WhatsApp message.")
+            logger.warning("⚠️ Twilio client not initialized. Cannot send WhatsApp message.")
+            report(on_done, False)
             return False
         
         try:
-            if not self.to_number:
-                logging.error("❌ No destination number configured")
+            to = to or self.to_number
+            if not to:
+                logger.error("❌ No destination number given and WHATSAPP_TO_NUMBER is not set")
+                report(on_done, False)
                 return False
-                
-            twilio_message = self.client.messages.create(
-                from_=self.from_number,
-                body=message,
-                to=self.to_number
-            )
             
-            logging.info(f"✅ WhatsApp message sent successfully (SID: {twilio_message.sid})")
-            return True
+            if self.dispatcher is not None:
+                self.dispatcher.submit(to, message, on_done)
+                logger.info("📨 WhatsApp message queued for %s", to)
+                return True
+                
+            self._create_message(to, message)
             
         except Exception as e:
-            logging.error(f"❌ Failed to send WhatsApp message: {e}")
+            logger.error("❌ Failed to send WhatsApp message: %s", e)
+            report(on_done, False)
             return False
+        report(on_done, True)
+        return True
     
-    def send_flight_notification(self, flight_data: dict, fr24_url: str, intelligence_summary: str = "") -> bool:
+    def send_flight_notification(self, flight_data: FlightRecord, fr24_url: str, intelligence_summary: str = "",
+                                 to: str = None, on_done: Optional[Callable[[bool], None]] = None) -> bool:
         """
         Send a formatted military flight notification with intelligence analysis
         
         Args:
-            flight_data: Dictionary containing flight information
+            flight_data: FlightRecord of the aircraft
             fr24_url: FlightRadar24 tracking URL
             intelligence_summary: Detailed intelligence analysis
+            to: Destination number, defaults to WHATSAPP_TO_NUMBER
+            on_done: Delivery outcome callback, see send_message
             
         Returns:
-            bool: True if message sent successfully, False otherwise
+            bool: True if message sent (or queued for delivery) successfully, False otherwise
         """
-        callsign = flight_data.get('callsign', 'Unknown')
-        aircraft_type = flight_data.get('aircraft_code', 'Unknown')
-        registration = flight_data.get('registration', 'Unknown')
-        altitude = flight_data.get('altitude', 0)
-        speed = flight_data.get('ground_speed', 0)
+        callsign = flight_data.callsign or 'Unknown'
+        aircraft_type = flight_data.aircraft_code or 'Unknown'
+        registration = flight_data.registration or 'Unknown'
+        altitude = flight_data.altitude
+        speed = flight_data.ground_speed
         
         message = f"""🚁 MILITARY FLIGHT DETECTED
 
@@ -100,4 +149,28 @@ Live tracking: {fr24_url}
 
 Detected via Military Flight Tracker Bot"""
 
-        return self.send_message(message) 
\ No newline at end of file
+        return self.send_message(message, to, on_done)
+    
+    def close(self, timeout: float = None) -> bool:
+        """Deliver anything still queued before the process exits"""
+        if self.dispatcher is None:
+            return True
+        return self.dispatcher.close(timeout)
+
+
+class DryRunSender(WhatsAppSender):
+    """Formats notifications exactly like WhatsAppSender but logs them instead of calling Twilio"""
+    
+    def __init__(self):
+        self.config = Config()
+        self.client = None
+        self.dispatcher = None
+        self.to_number = self.config.WHATSAPP_TO_NUMBER or 'dry-run'
+        self.sent = []
+    
+    def send_message(self, message: str, to: str = None, on_done: Optional[Callable[[bool], None]] = None) -> bool:
+        to = to or self.to_number
+        self.sent.append((to, message))
+        logger.info("📝 [dry run] WhatsApp message for %s:\n%s", to, message)
+        report(on_done, True)
+        return True
@@ -4,83 +4,382 @@ Military Flight Tracker Bot Runner
 Scans FlightRadar24 for military flights and sends WhatsApp notifications
 """
 
+import argparse
 import logging
 import sys
 import os
+import time
+import numpy as np
 from datetime import datetime
+from typing import Optional
 from core.scanner import FlightScanner
 from core.scoring import FlightScorer
 from core.flight_analyzer import FlightAnalyzer
+from core.ranking import select_top_k, select_top_k_batch
+from core.tiling import flight_key
+from core.subscriptions import load_subscriptions
+from core.rules import get_rule_engine
+from core.flight_record import FlightRecord
+from core.http_client import FetchError
+from core import metrics
 from config import Config
 
 # Set up logging
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=Config.LOG_LEVEL,
+    format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
     handlers=[
         logging.FileHandler('bot.log'),
         logging.StreamHandler(sys.stdout)
     ]
 )
+if Config.PAYLOAD_DEBUG_SAMPLE > 0:
+    logging.getLogger('core.scanner.payload').setLevel(logging.DEBUG)
+logger = logging.getLogger(__name__)
 
-def main():
-    """Main bot runner function"""
-    logging.info("🚀 Starting Military Flight Tracker Bot")
+def annotate_track_patterns(flights, patterns):
+    """Attach the trajectory pattern of each flight's track (None when not loitering)"""
+    for flight in flights:
+        pattern_metrics = patterns.get(flight_key(flight))
+        if pattern_metrics is not None:
+            flight.track_pattern = pattern_metrics['pattern']
+
+def rank_flights(scanner, scorer, military_flights, k, min_score, alert_cache=None):
+    """Top-K (flight, score) pairs; flights whose upper bound can't make the cut are never fully scored"""
+    if scanner.delta is not None:
+        # Surges are judged per scan, so cached scores only hold while the same ones are active
+        scanner.delta.set_scan_inputs(scorer.scan_inputs())
+        score_fn = lambda flight: scanner.delta.score(flight, scorer.score_flight)
+    else:
+        score_fn = scorer.score_flight
+    if alert_cache is not None:
+        # Flights still cooling down score 0 so they never take a top-K slot
+        base_score_fn = score_fn
+        
+        def score_fn(flight):
+            score = base_score_fn(flight)
+            return score if alert_cache.should_alert(flight, score) else 0
+    return select_top_k(military_flights, score_fn, k, min_score, upper_bound_fn=scorer.score_upper_bound)
+
+def rank_batch(scorer, batch, k, min_score, track_patterns=None, alert_cache=None):
+    """Columnar path: score the whole batch at once and build records only for the top K rows"""
+    if not len(batch):
+        return []
     
-    try:
-        # Initialize components
-        config = Config()
-        scanner = FlightScanner()
-        scorer = FlightScorer()
-        analyzer = FlightAnalyzer()
-        
-        # Get military flights
-        logging.info("🔍 Scanning for military flights...")
-        military_flights = scanner.get_military_flights()
-        
-        if not military_flights:
-            logging.info("❌ No military flights found")
+    scores = scorer.score_batch(batch, track_patterns)
+    if alert_cache is not None:
+        registrations = batch.strings['registration']
+        callsigns = batch.strings['callsign']
+        for index in np.flatnonzero(scores >= min_score).tolist():
+            candidate = FlightRecord(callsign=callsigns[index], registration=registrations[index])
+            if not alert_cache.should_alert(candidate, int(scores[index])):
+                scores[index] = 0
+    return [(batch.row(index), score) for index, score in select_top_k_batch(scores, k, min_score)]
+
+class BotRunner:
+    """Keeps scanner, scorer, analyzer and sender warm across scan cycles"""
+    
+    def __init__(self, replay=None, recorder=None, dry_run: bool = False, archive_dir: Optional[str] = None):
+        self.config = Config()
+        self.rules = get_rule_engine()
+        self.dry_run = dry_run
+        # Replays run on the recorded timeline so cooldowns and track ages match the original run
+        self.replay = replay
+        self.clock = replay.time if replay is not None else time.time
+        self.scanner = FlightScanner()
+        self.scanner.replay = replay
+        self.scanner.recorder = recorder
+        
+        # Hourly position archive; a replay only writes one when given a directory explicitly
+        if archive_dir is None:
+            archive_dir = self.config.ARCHIVE_DIR if replay is None else ''
+        if archive_dir:
+            from core.archive import ArchiveWriter
+            self.scanner.archive = ArchiveWriter(archive_dir, military_only=self.config.ARCHIVE_SCOPE != 'all',
+                                                 compress_after=self.config.ARCHIVE_COMPRESS_AFTER_HOURS * 3600,
+                                                 retention=self.config.ARCHIVE_RETENTION_DAYS * 86400,
+                                                 max_bytes=int(self.config.ARCHIVE_MAX_MB * (1 << 20)),
+                                                 clock=self.clock)
+        
+        # Columnar scans can decode, parse and classify each response across worker processes
+        if self.config.COLUMNAR_SCAN and self.config.SHARD_WORKERS > 1:
+            from core.sharding import ShardedClassifier
+            self.scanner.shards = ShardedClassifier(self.config.SHARD_WORKERS, self.rules,
+                                                    metadata=self.scanner.metadata,
+                                                    min_bytes=self.config.SHARD_MIN_BYTES)
+            self.scanner.shards.warm()
+        self.scorer = FlightScorer()
+        self.scorer.metadata = self.scanner.metadata
+        self.analyzer = FlightAnalyzer()
+        
+        # Usual military traffic per region, category and hour of week, for surge scoring
+        self.baseline = None
+        if self.config.SURGE_DETECTION:
+            from core.baselines import SurgeBaseline
+            # Like cooldowns, a replay learns in memory and leaves the live baselines alone
+            state_path = self.config.SURGE_STATE_PATH if replay is None else ''
+            self.baseline = SurgeBaseline(self.analyzer.region_index, self.rules, path=state_path or ':memory:',
+                                          alpha=self.config.SURGE_ALPHA,
+                                          z_threshold=self.config.SURGE_Z_THRESHOLD,
+                                          min_count=self.config.SURGE_MIN_COUNT,
+                                          min_samples=self.config.SURGE_MIN_SAMPLES,
+                                          clock=self.clock)
+            self.scorer.baseline = self.baseline
+            self.analyzer.baseline = self.baseline
+        self._sender = None
+        self.subscriptions = load_subscriptions(self.config)
+        
+        # Cooldowns for already-alerted aircraft, persisted across restarts
+        self.alert_cache = None
+        if self.config.ALERT_STATE_PATH:
+            from core.alert_cache import AlertCache
+            # A replay keeps its cooldowns in memory so it neither reads nor disturbs live state
+            self.alert_cache = AlertCache(':memory:' if replay is not None else self.config.ALERT_STATE_PATH,
+                                          cooldown=self.config.ALERT_COOLDOWN_SECONDS,
+                                          rescore_delta=self.config.ALERT_RESCORE_DELTA,
+                                          clock=self.clock)
+        
+        # Recent positions per aircraft, kept across daemon cycles
+        self.tracks = None
+        if self.config.TRACK_HISTORY > 0:
+            from core.tracks import TrackStore
+            from core.trajectory import TrajectoryAnalyzer
+            self.tracks = TrackStore(history=self.config.TRACK_HISTORY,
+                                     stale_after=self.config.TRACK_STALE_SECONDS)
+            self.trajectory = TrajectoryAnalyzer()
+            metrics.TRACKED_AIRCRAFT.set_function(lambda: len(self.tracks))
+        
+        self.stages = metrics.StageBreakdown()
+    
+    @property
+    def sender(self):
+        """WhatsApp sender, built on first use so the Twilio client is reused by later cycles"""
+        if self._sender is None:
+            from core.whatsapp_sender import DryRunSender, WhatsAppSender
+            self._sender = DryRunSender() if self.dry_run else WhatsAppSender()
+        return self._sender
+    
+    def _log_tracks(self, evicted: int):
+        logger.info("🛰️ Tracking %s aircraft (%s stale tracks evicted)", len(self.tracks), evicted)
+    
+    def _analyze_tracks(self):
+        with metrics.span('trajectory'):
+            patterns = self.trajectory.analyze(self.tracks)
+        found = sum(1 for pattern_metrics in patterns.values() if pattern_metrics['pattern'])
+        logger.info("🔄 Trajectory patterns: %s of %s tracks orbiting/loitering", found, len(patterns))
+        return patterns
+    
+    def run_cycle(self):
+        """Run one scan → score → analyze → notify cycle, logging where the time went"""
+        self.stages.start()
+        try:
+            with metrics.span('cycle'):
+                self._run_cycle()
+        except FetchError as e:
+            # Distinct from "no military flights": nothing was scanned, so nothing can be alerted
+            logger.error("🚫 FR24 unavailable: %s — scan skipped, no alerts this cycle", e)
+        finally:
+            metrics.CYCLES.inc()
+            stages = self.stages.stop()
+            cycle = stages.pop('cycle', 0.0)
+            breakdown = ', '.join(f"{stage} {seconds * 1000:.0f}ms"
+                                  for stage, seconds in sorted(stages.items(), key=lambda item: -item[1]))
+            logger.info("⏱️ Cycle took %.2fs (%s)", cycle, breakdown or 'no stages recorded')
+    
+    def _run_cycle(self):
+        # Pick up an edited rules file between scans, never in the middle of one
+        self.rules.poll()
+        
+        # Get military flights and select the most interesting ones. Subscribers each
+        # filter the full scored set and take their own top K, so ranking keeps every
+        # flight that scores at least the lowest minimum any of them accepts
+        logger.info("🔍 Scanning for military flights...")
+        k = self.config.ALERT_TOP_K
+        subscribed = len(self.subscriptions) > 0
+        # A score of 0 means not military or still cooling down, never worth an alert
+        min_score = max(1, self.subscriptions.min_score) if subscribed else self.config.ALERT_MIN_SCORE
+        patterns = None
+        if self.config.COLUMNAR_SCAN:
+            batch = self.scanner.get_military_batch()
+            found = len(batch)
+            if self.tracks is not None:
+                with metrics.span('tracks'):
+                    evicted = self.tracks.ingest_batch(batch, now=self.clock())
+                self._log_tracks(evicted)
+                patterns = self._analyze_tracks()
+            if self.baseline is not None:
+                with metrics.span('baseline'):
+                    self.baseline.observe_batch(batch)
+            with metrics.span('rank'):
+                ranked = rank_batch(self.scorer, batch, found if subscribed else k, min_score, patterns,
+                                    self.alert_cache)
+        else:
+            military_flights = self.scanner.get_military_flights()
+            found = len(military_flights)
+            if self.tracks is not None:
+                with metrics.span('tracks'):
+                    evicted = self.tracks.ingest(military_flights, now=self.clock())
+                self._log_tracks(evicted)
+                annotate_track_patterns(military_flights, self._analyze_tracks())
+            if self.baseline is not None:
+                with metrics.span('baseline'):
+                    self.baseline.observe(military_flights)
+            with metrics.span('rank'):
+                ranked = rank_flights(self.scanner, self.scorer, military_flights, found if subscribed else k,
+                                      min_score, self.alert_cache)
+        
+        if not found:
+            logger.info("❌ No military flights found")
             return
         
-        # Score and select the most interesting flight
-        best_flight = None
-        best_score = 0
+        if self.alert_cache is not None:
+            self.alert_cache.prune()
         
-        for flight in military_flights:
-            score = scorer.score_flight(flight)
-            if score > best_score:
-                best_score = score
-                best_flight = flight
+        if not ranked:
+            logger.info("❌ No suitable military flights found (or all are cooling down)")
+            return
         
-        if best_flight:
-            logging.info(f"🎯 Selected flight: {best_flight.get('callsign', 'Unknown')} (Score: {best_score})")
-            
-            # Create FlightRadar24 URL
-            lat = best_flight.get('latitude', 0)
-            lon = best_flight.get('longitude', 0)
-            callsign = best_flight.get('callsign', 'Unknown')
-            
-            fr24_url = f"https://www.flightradar24.com/{callsign}"
-            
-            # Generate intelligence analysis
-            intelligence_summary = analyzer.generate_intelligence_summary(best_flight, best_score)
+        if subscribed:
+            logger.info("🏆 %s of %s military flights score at least %s", len(ranked), found, min_score)
+            with metrics.span('route'):
+                routed = self.subscriptions.route(ranked, self.analyzer)
+            logger.info("👥 %s flights routed to %s subscribers", len(routed), len(self.subscriptions))
+        else:
+            logger.info("🏆 %s of %s military flights selected for alerts (top %s, min score %s)",
+                        len(ranked), found, k, min_score)
+            routed = [(flight, score, None) for flight, score in ranked]
+        if self.config.COLUMNAR_SCAN:
+            # Batch rows only carry the payload fields; fill in the rest for the flights being alerted
+            selected = [flight for flight, _, _ in routed]
+            if self.scanner.metadata is not None:
+                self.scanner.metadata.enrich_many(selected)
+            if patterns is not None:
+                annotate_track_patterns(selected, patterns)
+        for flight, score, recipients in routed:
+            self.notify(flight, score, recipients)
+    
+    def notify(self, flight, score, recipients=None):
+        """Summarise one selected flight and send it to each matching subscriber (default number if None)"""
+        logger.info("🎯 Selected flight: %s (Score: %s)", flight.callsign or 'Unknown', score)
+        
+        # Create FlightRadar24 URL
+        callsign = flight.callsign or 'Unknown'
+        
+        fr24_url = f"https://www.flightradar24.com/{callsign}"
+        
+        # Generate intelligence analysis
+        with metrics.span('analyze'):
+            intelligence_summary = self.analyzer.generate_intelligence_summary(flight, score)
+        
+        # Send WhatsApp notification; metrics and the cooldown follow the delivery outcome,
+        # which with the background queue arrives only after Twilio accepted (or dropped) it
+        numbers = [subscriber.number for subscriber in recipients] if recipients else [None]
+        on_done = lambda delivered: self._record_delivery(flight, score, delivered)
+        try:
+            with metrics.span('send'):
+                accepted = [to for to in numbers
+                            if self.sender.send_flight_notification(flight, fr24_url, intelligence_summary, to, on_done)]
+            if accepted:
+                logger.info("✅ WhatsApp notification with intelligence analysis sent to %s recipient(s)", len(accepted))
             
-            # Send WhatsApp notification
-            try:
-                from core.whatsapp_sender import WhatsAppSender
-                sender = WhatsAppSender()
-                
-                sender.send_flight_notification(best_flight, fr24_url, intelligence_summary)
-                logging.info("✅ WhatsApp notification with intelligence analysis sent successfully")
-                
-            except Exception as e:
-                logging.error(f"❌ Failed to send WhatsApp notification: {e}")
+        except Exception as e:
+            logger.error("❌ Failed to send WhatsApp notification: %s", e)
+    
+    def _record_delivery(self, flight, score, delivered: bool):
+        """Count one copy of an alert; a copy Twilio accepted starts the flight's cooldown"""
+        if not delivered:
+            metrics.ALERTS_FAILED.inc()
+            return
+        metrics.ALERTS_SENT.inc()
+        if self.alert_cache is not None:
+            self.alert_cache.record(flight, score)
+
+    def close(self):
+        """Drain queued notifications and release persistent state"""
+        if self._sender is not None:
+            self._sender.close(timeout=self.config.SCAN_INTERVAL_SECONDS)
+        if self.alert_cache is not None:
+            self.alert_cache.close()
+        if self.baseline is not None:
+            self.baseline.close()
+        if self.scanner.metadata is not None:
+            self.scanner.metadata.close()
+        if self.scanner.recorder is not None:
+            self.scanner.recorder.close()
+        if self.scanner.archive is not None:
+            self.scanner.archive.close()
+        if self.scanner.shards is not None:
+            self.scanner.shards.close()
+
+def run_daemon(runner: BotRunner):
+    """Scan on a fixed cadence until SIGTERM/SIGINT"""
+    from core.scheduler import FixedRateScheduler
+    
+    interval = runner.config.SCAN_INTERVAL_SECONDS
+    jitter = runner.config.SCAN_JITTER_SECONDS
+    logger.info("🔁 Daemon mode: scanning every %ss (±%ss jitter)", interval, jitter)
+    
+    scheduler = FixedRateScheduler(runner.run_cycle, interval=interval, jitter=jitter)
+    scheduler.install_signal_handlers()
+    scheduler.run(shutdown_timeout=interval)
+    
+    logger.info("👋 Daemon stopped after %s scans (%s ticks skipped)", scheduler.ticks_run, scheduler.ticks_skipped)
+
+def run_replay(runner: BotRunner):
+    """Push every recorded snapshot through the full pipeline, paced by the replay source"""
+    started = time.perf_counter()
+    cycles = 0
+    while not runner.replay.exhausted:
+        runner.run_cycle()
+        cycles += 1
+    logger.info("⏹️ Replay finished: %s snapshots in %.2fs", cycles, time.perf_counter() - started)
+
+def main():
+    """Main bot runner function"""
+    parser = argparse.ArgumentParser(description="Military Flight Tracker Bot")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running and scan every SCAN_INTERVAL_SECONDS instead of once")
+    parser.add_argument('--record', metavar='DIR',
+                        help="write every raw FR24 response to DIR as a gzip snapshot")
+    parser.add_argument('--replay', metavar='DIR',
+                        help="feed recorded snapshots from DIR through the pipeline instead of the live API (implies --dry-run)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed multiplier; 0 replays as fast as possible (default 1)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="log notifications instead of sending them")
+    parser.add_argument('--archive', metavar='DIR',
+                        help="append scan positions to the archive in DIR (overrides ARCHIVE_DIR; replays only archive with it)")
+    args = parser.parse_args()
+    
+    logger.info("🚀 Starting Military Flight Tracker Bot")
+    
+    runner = None
+    try:
+        replay = recorder = None
+        if args.replay:
+            from core.replay import ReplaySource
+            replay = ReplaySource(args.replay, speed=args.speed)
+        elif args.record:
+            from core.replay import SnapshotRecorder
+            recorder = SnapshotRecorder(args.record)
+        runner = BotRunner(replay=replay, recorder=recorder, dry_run=args.dry_run or replay is not None,
+                           archive_dir=args.archive)
+        if runner.config.METRICS_PORT:
+            metrics.MetricsServer(host=runner.config.METRICS_HOST, port=runner.config.METRICS_PORT).start()
+        
+        if replay is not None:
+            run_replay(runner)
+        elif args.daemon:
+            run_daemon(runner)
         else:
-            logging.info("❌ No suitable military flights found")
+            runner.run_cycle()
             
     except Exception as e:
-        logging.error(f"❌ Bot error: {e}")
+        logger.error("❌ Bot error: %s", e)
         raise
+    finally:
+        if runner is not None:
+            runner.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Shared fixtures; tests import modules the way run_bot does, from milspot_bot/
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+class FakeClock:
+    """Monotonic clock the test advances by hand"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scratch_config(monkeypatch, tmp_path):
+    """Config with its SQLite state files in tmp_path, so tests never touch the production ones"""
+    monkeypatch.setattr(Config, 'AIRCRAFT_DB_PATH', str(tmp_path / 'aircraft_metadata.sqlite3'))
+    monkeypatch.setattr(Config, 'ALERT_STATE_PATH', str(tmp_path / 'alert_state.sqlite3'))
+    return Config
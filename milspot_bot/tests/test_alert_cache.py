@@ -0,0 +1,95 @@
+"""
+Alert cooldowns: expiry, rescoring and persistence across restarts
+"""
+
+import pytest
+
+from core.alert_cache import AlertCache
+from core.flight_record import FlightRecord
+
+COOLDOWN = 3600.0
+
+
+@pytest.fixture
+def open_cache(tmp_path, clock):
+    caches = []
+
+    def build():
+        cache = AlertCache(str(tmp_path / 'alert_state.sqlite3'), cooldown=COOLDOWN, rescore_delta=3, clock=clock)
+        caches.append(cache)
+        return cache
+
+    yield build
+    for cache in caches:
+        cache.close()
+
+
+def flight(registration='AE-01', callsign='RCH101'):
+    return FlightRecord('id', callsign=callsign, registration=registration, aircraft_code='C17')
+
+
+def test_cooldown_holds_until_it_expires(open_cache, clock):
+    cache = open_cache()
+    cache.record(flight(), 20)
+    assert not cache.should_alert(flight(), 20)
+    # Keyed by registration, so a new callsign is the same aircraft
+    assert not cache.should_alert(flight(callsign='RCH202'), 20)
+    assert cache.should_alert(flight(registration='AE-02'), 20)
+
+    clock.advance(COOLDOWN - 1)
+    assert not cache.should_alert(flight(), 20)
+    clock.advance(1)
+    assert cache.should_alert(flight(), 20)
+
+
+def test_score_jump_breaks_the_cooldown(open_cache, clock):
+    cache = open_cache()
+    cache.record(flight(), 20)
+    assert not cache.should_alert(flight(), 22)
+    assert cache.should_alert(flight(), 23)
+
+    # Re-alerting restarts the cooldown from the new score
+    clock.advance(60)
+    cache.record(flight(), 23)
+    clock.advance(COOLDOWN - 30)
+    assert not cache.should_alert(flight(), 25)
+
+
+def test_aircraft_without_registration_or_callsign_always_alert(open_cache):
+    cache = open_cache()
+    anonymous = flight(registration='', callsign='')
+    cache.record(anonymous, 20)
+    assert cache.should_alert(anonymous, 20)
+    assert len(cache) == 0
+
+
+def test_cooldowns_survive_a_restart(open_cache, clock):
+    cache = open_cache()
+    cache.record(flight(), 20)
+    cache.record(flight(registration='AE-02'), 15)
+    clock.advance(COOLDOWN / 2)
+    cache.record(flight(registration='AE-03'), 15)
+    cache.close()
+
+    restarted = open_cache()
+    assert len(restarted) == 3
+    assert not restarted.should_alert(flight(), 20)
+    assert restarted.should_alert(flight(), 23)
+
+    # Cooldowns that ran out while the bot was down are dropped on load
+    clock.advance(COOLDOWN / 2)
+    restarted.close()
+    assert len(open_cache()) == 1
+
+
+def test_prune_drops_expired_entries_from_disk(open_cache, clock):
+    cache = open_cache()
+    cache.record(flight(), 20)
+    clock.advance(COOLDOWN / 2)
+    cache.record(flight(registration='AE-02'), 20)
+    clock.advance(COOLDOWN / 2 + 1)
+
+    assert cache.prune() == 1
+    assert len(cache) == 1
+    rows = cache._db.execute("SELECT key FROM alerts").fetchall()
+    assert rows == [('AE-02',)]
@@ -0,0 +1,120 @@
+"""
+Position archive: hourly partitions, memory-mapped and gzip reads, and time-range queries
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from core.archive import (RECORD_DTYPE, ArchiveReader, ArchiveWriter, _compress, list_partitions, partition_path,
+                          records_from_flights)
+from core.flight_record import FlightRecord
+
+HOUR = 1717246800  # 2024-06-01 13:00 UTC
+
+
+def flight(registration, lat=50.0, lon=0.0, aircraft_code='C17', callsign='RCH1', hex='AE0001'):
+    return FlightRecord(registration, callsign=callsign, aircraft_code=aircraft_code, registration=registration,
+                        hex=hex, latitude=lat, longitude=lon, altitude=30000, ground_speed=450)
+
+
+@pytest.fixture
+def writer(tmp_path, clock):
+    clock.now = HOUR
+    writer = ArchiveWriter(str(tmp_path / 'archive'), military_only=False, compress_after=3600,
+                           retention=3 * 86400, clock=clock)
+    yield writer
+    if writer._writer.is_alive():
+        writer.close()
+
+
+def test_scans_roll_over_into_hourly_partitions(writer, clock):
+    civil, military = flight('D-AIBA', aircraft_code='A320'), flight('05-5140')
+    clock.now = HOUR + 3599
+    writer.append([civil, military], [military])
+    clock.now = HOUR + 3600
+    writer.append([military], [military])
+    writer.close()
+
+    partitions = list_partitions(writer.directory)
+    assert [p.hour for p in partitions] == [HOUR, HOUR + 3600]
+    assert partitions[0].path == os.path.join(writer.directory, '20240601', '13.rec')
+    first, second = (np.fromfile(p.path, dtype=RECORD_DTYPE) for p in partitions)
+    assert first['registration'].tolist() == [b'D-AIBA', b'05-5140']
+    assert first['military'].tolist() == [0, 1]
+    assert second['time'].tolist() == [HOUR + 3600]
+
+
+def test_torn_row_is_cut_before_the_next_append(writer):
+    writer.write(records_from_flights([flight('05-5140')], np.ones(1, dtype=np.uint8), HOUR), HOUR)
+    path = partition_path(writer.directory, HOUR)
+    with open(path, 'ab') as f:
+        f.write(b'\x00' * 7)
+    writer.write(records_from_flights([flight('05-5141')], np.ones(1, dtype=np.uint8), HOUR + 60), HOUR + 60)
+
+    rows = np.fromfile(path, dtype=RECORD_DTYPE)
+    assert rows['registration'].tolist() == [b'05-5140', b'05-5141']
+
+
+def test_uncompressed_partitions_are_read_through_a_memmap_in_chunks(writer):
+    flights = [flight(f'05-51{i:02d}') for i in range(10)]
+    writer.write(records_from_flights(flights, np.ones(10, dtype=np.uint8), HOUR), HOUR)
+    reader = ArchiveReader(writer.directory, chunk_rows=3)
+    partition, = reader.partitions()
+
+    chunks = list(reader.chunks(partition))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert all(isinstance(chunk, np.memmap) for chunk in chunks)
+    raw = np.concatenate(chunks)
+
+    # Past the hot window the partition is gzipped; reads stream the same rows
+    writer.maintain(HOUR + 3 * 3600, force=True)
+    partition, = reader.partitions()
+    assert partition.compressed
+    chunks = list(reader.chunks(partition))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+    assert not any(isinstance(chunk, np.memmap) for chunk in chunks)
+    assert np.array_equal(np.concatenate(chunks), raw)
+
+
+def test_retention_drops_old_partitions(writer):
+    for hour in (HOUR - 4 * 86400, HOUR):
+        writer.write(records_from_flights([flight('05-5140')], np.ones(1, dtype=np.uint8), hour), hour)
+    writer.maintain(HOUR + 60, force=True)
+    assert [p.hour for p in list_partitions(writer.directory)] == [HOUR]
+
+
+@pytest.fixture
+def reader(writer):
+    """Three hours of scans every 20 minutes; the middle hour compressed"""
+    for scan in range(9):
+        scan_time = HOUR + scan * 1200
+        flights = [flight('05-5140', lat=50.0 + scan), flight('D-AIBA', lat=50.0, aircraft_code='A320',
+                                                               callsign='DLH1', hex='3C6401')]
+        writer.write(records_from_flights(flights, np.array([1, 0], dtype=np.uint8), scan_time), scan_time)
+    _compress(partition_path(writer.directory, HOUR + 3600))
+    return ArchiveReader(writer.directory, chunk_rows=2)
+
+
+def test_range_queries_trim_partitions_at_the_edges(reader):
+    # 13:40 to 14:40 inclusive: the last scan of the first hour through the third of the second
+    rows = reader.sightings(registration='05-5140', start=HOUR + 2400, end=HOUR + 6000)
+    assert rows['time'].tolist() == [HOUR + 2400, HOUR + 3600, HOUR + 4800, HOUR + 6000]
+    assert reader.partitions(HOUR + 3600, HOUR + 3601) == reader.partitions()[1:2]
+
+    # Lower-case input, limit, and unbounded ranges
+    assert len(reader.sightings(hex='3c6401')) == 9
+    assert reader.sightings(callsign='dlh1', limit=4)['time'].tolist() == [HOUR + i * 1200 for i in range(4)]
+    with pytest.raises(ValueError):
+        reader.sightings()
+
+
+def test_box_and_daily_counts(reader):
+    rows = reader.in_box(52.5, 56.5, -1.0, 1.0)
+    assert rows['lat'].tolist() == [53.0, 54.0, 55.0, 56.0]
+    assert len(reader.in_box(49.0, 51.0, -1.0, 1.0, military_only=False)) == 11
+    assert len(reader.in_box(52.5, 56.5, -1.0, 1.0, start=HOUR + 3600, end=HOUR + 7199)) == 3
+
+    assert reader.daily_type_counts() == {'2024-06-01': {'C17': 1, 'A320': 1}}
+    assert reader.daily_type_counts(military_only=True) == {'2024-06-01': {'C17': 1}}
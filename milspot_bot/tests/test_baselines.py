@@ -0,0 +1,84 @@
+"""
+Surge baselines learn one sample per hour visit, so a sustained surge is still judged against earlier weeks
+"""
+
+import pytest
+
+from core.baselines import ANY_HOUR, SurgeBaseline, week_slot
+from core.flight_analyzer import FlightAnalyzer
+from core.flight_record import FlightRecord
+from core.rules import get_rule_engine
+
+MONDAY = 1704067200.0  # 2024-01-01 00:00 UTC
+WEEK = 7 * 86400
+SCANS_PER_HOUR = 60
+
+
+@pytest.fixture
+def make_baseline(tmp_path):
+    analyzer = FlightAnalyzer()
+    baselines = []
+
+    def build(**kwargs):
+        options = dict(path=str(tmp_path / 'surge_baseline.sqlite3'), min_samples=4)
+        options.update(kwargs)
+        baseline = SurgeBaseline(analyzer.region_index, get_rule_engine(), **options)
+        baselines.append(baseline)
+        return baseline
+
+    yield build
+    for baseline in baselines:
+        baseline.close()
+
+
+def recon(count):
+    # Black Sea only, so the flights fall in one region
+    return [FlightRecord(f'r{i}', aircraft_code='RC135', latitude=42.0, longitude=35.0) for i in range(count)]
+
+
+def run_hour(baseline, start, count):
+    """One hour of minute scans; the surges flagged by each"""
+    return [baseline.observe(recon(count), now=start + minute * 60) for minute in range(SCANS_PER_HOUR)]
+
+
+def test_hour_is_folded_as_one_sample(make_baseline):
+    baseline = make_baseline()
+    start = MONDAY + 13 * 3600
+    for minute in range(SCANS_PER_HOUR):
+        baseline.observe(recon(minute % 2), now=start + minute * 60)
+    # Nothing is learnt until the hour is over
+    assert len(baseline) == 0
+
+    baseline.observe([], now=start + 3600)
+    slot = week_slot(start)
+    assert baseline._stats(('black_sea', 'reconnaissance', slot)) == (1, pytest.approx(0.5), 0.0)
+    assert baseline._stats(('black_sea', 'reconnaissance', ANY_HOUR))[:2] == (1, pytest.approx(0.5))
+
+
+def test_sustained_surge_is_flagged_until_the_end_of_the_hour(make_baseline):
+    baseline = make_baseline()
+    for week in range(5):
+        start = MONDAY + week * WEEK + 13 * 3600
+        run_hour(baseline, start, week % 2)
+        run_hour(baseline, start + 3600, 0)
+
+    surges = run_hour(baseline, MONDAY + 5 * WEEK + 13 * 3600, 5)
+    assert all(('black_sea', 'reconnaissance') in scan for scan in surges)
+    last = surges[-1][('black_sea', 'reconnaissance')]
+    assert last.slot == week_slot(MONDAY + 13 * 3600)
+    assert last.mean < 1
+
+
+def test_unfinished_hour_survives_a_restart(make_baseline):
+    start = MONDAY + 13 * 3600
+    baseline = make_baseline()
+    for minute in range(30):
+        baseline.observe(recon(2), now=start + minute * 60)
+    # What close() writes at shutdown
+    baseline.save()
+
+    baseline = make_baseline()
+    for minute in range(30, SCANS_PER_HOUR):
+        baseline.observe([], now=start + minute * 60)
+    baseline.observe([], now=start + 3600)
+    assert baseline._stats(('black_sea', 'reconnaissance', week_slot(start)))[:2] == (1, pytest.approx(1.0))
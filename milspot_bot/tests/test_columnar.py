@@ -0,0 +1,128 @@
+"""
+Columnar scoring and row materialization must agree with the FlightRecord path
+"""
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import TrafficGenerator
+from core.aircraft_db import AircraftMetadataCache, AircraftRecord
+from core.columnar import FlightBatch
+from core.flight_record import FlightRecord
+from core.rules import get_rule_engine
+from core.scoring import FlightScorer
+from core.tiling import flight_key
+
+
+@pytest.fixture
+def rules():
+    return get_rule_engine().current
+
+
+@pytest.fixture
+def payload(rules):
+    payload = TrafficGenerator(seed=7).payload(2000)
+    operator = sorted(rules.operator_codes)[0]
+    payload['data'] += [
+        # Military only according to the metadata database
+        {'fr24_id': 'meta-only', 'hex': 'ABC123', 'callsign': 'XYZ1', 'type': 'GLF5', 'reg': 'N1',
+         'lat': 50.0, 'lon': 20.0, 'alt': 10000, 'gspeed': 200, 'squawk': '7700', 'painted_as': '', 'operating_as': ''},
+        # Payload without operator or type; both come from metadata
+        {'fr24_id': 'meta-fill', 'hex': 'DEF456', 'callsign': 'RCH871', 'type': '', 'reg': '',
+         'lat': 35.0, 'lon': 30.0, 'alt': 31000, 'gspeed': 451, 'squawk': '', 'painted_as': '', 'operating_as': ''},
+        # Military operator with a lower-case code in the payload
+        {'fr24_id': 'operator', 'hex': '123ABC', 'callsign': 'ZZZ9', 'type': 'A332', 'reg': 'X-1',
+         'lat': 0.0, 'lon': 0.0, 'alt': 0, 'gspeed': 0, 'squawk': '', 'painted_as': operator.lower(),
+         'operating_as': ''},
+    ]
+    return payload
+
+
+@pytest.fixture
+def metadata(tmp_path, rules, payload):
+    cache = AircraftMetadataCache(str(tmp_path / 'aircraft_metadata.sqlite3'))
+    cache.store(AircraftRecord('ABC123', 'N1', 'GLF5', '', '', 'US AIR FORCE', True))
+    cache.store(AircraftRecord('DEF456', '', 'C17', sorted(rules.operator_codes)[0]))
+    cache.flush()
+    yield cache
+    cache.close()
+
+
+def dict_scores(scorer, metadata, payload, classifier, patterns=None):
+    """Scores the way the dict path produces them: parse, enrich, classify, annotate, score"""
+    records = [FlightRecord.from_api(row) for row in payload['data']]
+    if metadata is not None:
+        records = metadata.enrich_many(records)
+    scores = {}
+    for record in records:
+        if not (classifier.is_military_flight(record) or record.get('military') is True):
+            continue
+        if patterns is not None and flight_key(record) in patterns:
+            record.track_pattern = patterns[flight_key(record)]['pattern']
+        scores[record.id] = scorer.score_flight(record)
+    return scores
+
+
+def columnar_scores(scorer, metadata, payload, classifier, patterns=None):
+    """Scores the way run_bot's columnar path produces them: scanner mask, then score_batch"""
+    batch = FlightBatch.from_api_payload(payload)
+    mask = batch.military_mask(classifier)
+    if metadata is not None:
+        mask |= batch.hex.map_vocabulary(metadata.known_military)
+    batch = batch.filter(mask).compact()
+    scores = scorer.score_batch(batch, patterns)
+    return {batch.ids[i]: int(score) for i, score in enumerate(scores.tolist())}
+
+
+def test_scores_match_without_metadata(rules, payload):
+    scorer = FlightScorer()
+    expected = dict_scores(scorer, None, payload, rules.classifier)
+    assert len(expected) > 10
+    assert columnar_scores(scorer, None, payload, rules.classifier) == expected
+
+
+def test_scores_match_with_metadata(rules, payload, metadata):
+    scorer = FlightScorer()
+    scorer.metadata = metadata
+    # Columnar first: enrichment learns from the payload, the columnar path reads only what was imported
+    actual = columnar_scores(scorer, metadata, payload, rules.classifier)
+    expected = dict_scores(scorer, metadata, payload, rules.classifier)
+
+    assert expected['meta-only'] > 0
+    assert expected['meta-fill'] > 0
+    assert actual == expected
+
+
+def test_scores_match_with_partial_track_patterns(rules, payload):
+    scorer = FlightScorer()
+    records = [FlightRecord.from_api(row) for row in payload['data']]
+    military = [record for record in records if rules.classifier.is_military_flight(record)]
+    # A third loiter on their track, a third are tracked without a pattern, the rest are untracked
+    patterns = {}
+    for i, record in enumerate(military):
+        if i % 3 == 0:
+            patterns[flight_key(record)] = {'pattern': 'orbit'}
+        elif i % 3 == 1:
+            patterns[flight_key(record)] = {'pattern': None}
+
+    expected = dict_scores(scorer, None, payload, rules.classifier, patterns)
+    assert columnar_scores(scorer, None, payload, rules.classifier, patterns) == expected
+    assert expected != dict_scores(scorer, None, payload, rules.classifier)
+
+
+def test_upper_bound_never_below_score(rules, payload):
+    scorer = FlightScorer()
+    for row in payload['data']:
+        record = FlightRecord.from_api(row)
+        assert scorer.score_upper_bound(record) >= scorer.score_flight(record)
+
+
+def test_row_matches_from_api(payload):
+    batch = FlightBatch.from_api_payload(payload)
+    fields = ('id', 'callsign', 'aircraft_code', 'registration', 'hex', 'squawk', 'painted_as', 'operating_as',
+              'latitude', 'longitude', 'heading', 'altitude', 'ground_speed')
+    for index in np.arange(0, len(batch), 97).tolist() + [len(batch) - 2]:
+        row = batch.row(index)
+        record = FlightRecord.from_api(payload['data'][index])
+        assert {f: getattr(row, f) for f in fields} == {f: getattr(record, f) for f in fields}
+        assert type(row.altitude) is int and type(row.ground_speed) is int
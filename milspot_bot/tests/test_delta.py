@@ -0,0 +1,121 @@
+"""
+Delta polling: snapshot diffs, and cached verdicts and scores that match classifying and scoring every aircraft
+"""
+
+import pytest
+
+from core.aircraft_db import AircraftRecord
+from core.delta import DeltaTracker, SnapshotDelta
+from core.flight_record import FlightRecord
+
+
+class CountingClassifier:
+    """C17s are military; records which flights had to be classified"""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, flight):
+        self.seen.append(flight.id)
+        return flight.aircraft_code == 'C17'
+
+
+def c17(flight_id, lat=50.0, **fields):
+    return FlightRecord(flight_id, callsign=f'RCH{flight_id}', aircraft_code='C17', latitude=lat, longitude=20.0,
+                        **fields)
+
+
+@pytest.fixture
+def scanner(scratch_config):
+    from core.scanner import FlightScanner
+
+    scanner = FlightScanner()
+    yield scanner
+    scanner.client.close()
+    if scanner.metadata is not None:
+        scanner.metadata.close()
+
+
+def test_hex_only_aircraft_do_not_share_verdicts(scanner):
+    """A metadata-flagged airframe with no callsign, type or registration must not inherit a civil verdict"""
+    scanner.metadata.store(AircraftRecord('AE1234', '', military=True))
+    civil = FlightRecord('civil', hex='A00001')
+    military = FlightRecord('military', hex='AE1234')
+    flights = scanner.metadata.enrich_many([civil, military])
+    assert scanner.is_military_flight(military)
+
+    delta = DeltaTracker(scanner.is_military_flight)
+    assert [f.id for f in delta.update(flights)] == ['military']
+    # Same again from the cache, and with the aircraft in the other order
+    assert [f.id for f in delta.update(flights)] == ['military']
+    assert [f.id for f in delta.update(flights[::-1])] == ['military']
+
+
+def test_verdict_follows_metadata_military_flag(scanner):
+    delta = DeltaTracker(scanner.is_military_flight)
+    flight = FlightRecord('abc', callsign='N123AB', aircraft_code='GLF5', registration='N123AB', hex='A11111')
+    assert delta.update([flight]) == []
+
+    # The airframe is flagged by a later database import: same payload identity, new verdict
+    flagged = FlightRecord('abc', callsign='N123AB', aircraft_code='GLF5', registration='N123AB', hex='A11111')
+    flagged.military = True
+    assert delta.update([flagged]) == [flagged]
+
+
+def test_delta_sorts_aircraft_into_added_changed_unchanged_and_removed():
+    classify = CountingClassifier()
+    delta = DeltaTracker(classify)
+    civil = FlightRecord('civil', callsign='DLH1', aircraft_code='A320', latitude=48.0, longitude=11.0)
+    assert [f.id for f in delta.update([c17('a'), c17('b'), c17('c'), civil])] == ['a', 'b', 'c']
+    assert delta.last_delta == SnapshotDelta(['a', 'b', 'c', 'civil'], [], [], [])
+
+    # a moved, b held still, c departed, d arrived; only the new identity is classified
+    classify.seen.clear()
+    military = delta.update([c17('a', lat=50.5), c17('b'), civil, c17('d')])
+    assert [f.id for f in military] == ['a', 'b', 'd']
+    assert delta.last_delta == SnapshotDelta(['d'], ['c'], ['a'], ['b', 'civil'])
+    assert classify.seen == ['d']
+
+
+def test_scores_are_reused_until_the_aircraft_changes():
+    delta = DeltaTracker(CountingClassifier())
+    scored = []
+
+    def score(flight):
+        scored.append(flight.id)
+        return 10
+
+    delta.update([c17('a'), c17('b')])
+    for flight in (c17('a'), c17('b')):
+        delta.score(flight, score)
+    assert scored == ['a', 'b']
+
+    # Unchanged aircraft keep their score; a move or a new squawk rescores
+    delta.update([c17('a', lat=51.0), c17('b', squawk='7700')])
+    delta.score(c17('a', lat=51.0), score)
+    delta.score(c17('b', squawk='7700'), score)
+    delta.score(c17('b', squawk='7700'), score)
+    assert scored == ['a', 'b', 'a', 'b']
+
+    # A departed aircraft that comes back is scored afresh, as is everything once the scan inputs change
+    delta.update([c17('b', squawk='7700')])
+    delta.update([c17('a', lat=51.0), c17('b', squawk='7700')])
+    delta.score(c17('a', lat=51.0), score)
+    delta.set_scan_inputs(('black_sea', 'transport'))
+    delta.score(c17('b', squawk='7700'), score)
+    assert scored == ['a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_hex_only_aircraft_are_classified_once_and_never_keyed():
+    classify = CountingClassifier()
+    delta = DeltaTracker(classify)
+    anonymous = FlightRecord('', aircraft_code='C17', hex='AE0001', latitude=50.0, longitude=20.0)
+    scored = []
+
+    for _ in range(3):
+        assert delta.update([anonymous]) == [anonymous]
+        delta.score(anonymous, lambda flight: scored.append(flight.hex) or 10)
+    # The verdict is cached by identity, but without a key there is no delta entry or cached score
+    assert len(classify.seen) == 1
+    assert delta.last_delta == SnapshotDelta([], [], [], [])
+    assert scored == ['AE0001'] * 3
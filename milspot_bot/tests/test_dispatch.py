@@ -0,0 +1,257 @@
+"""
+Dispatch queue and WhatsApp sender against scripted failures and the fake Twilio endpoint
+"""
+
+import threading
+
+import pytest
+
+from config import Config
+from core.dispatch import COALESCE_SEPARATOR, DispatchQueue, TokenBucket, coalesce, is_retryable, pack
+from core.fake_twilio import FakeTwilioServer
+
+
+class SendError(Exception):
+    def __init__(self, status=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class ScriptedSend:
+    """send(to, body) that raises the scripted errors first, then records deliveries"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+        self.delivered = []
+        self._lock = threading.Lock()
+
+    def __call__(self, to, body):
+        with self._lock:
+            self.calls.append((to, body))
+            if self.errors:
+                raise self.errors.pop(0)
+            self.delivered.append((to, body))
+
+
+class Outcomes:
+    """Collects on_done results"""
+
+    def __init__(self):
+        self.results = []
+        self._lock = threading.Lock()
+
+    def callback(self):
+        return lambda delivered: self._record(delivered)
+
+    def _record(self, delivered):
+        with self._lock:
+            self.results.append(delivered)
+
+
+def make_queue(send, **kwargs):
+    options = dict(workers=1, rate=1000.0, burst=1000.0, backoff_base=0.001, backoff_max=0.01, coalesce_window=0)
+    options.update(kwargs)
+    return DispatchQueue(send, **options)
+
+
+def test_token_bucket_spends_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3.0, clock=clock)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock.advance(0.5)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    # Idle time never banks more than the capacity
+    clock.advance(60)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() > 0
+
+
+def test_is_retryable():
+    assert is_retryable(SendError(429))
+    assert is_retryable(SendError(503))
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(SendError(400))
+    assert not is_retryable(SendError(404))
+
+
+def test_pack_counts_bodies_per_message_and_respects_limit():
+    bodies = ['a' * 40, 'b' * 40, 'c' * 40, 'd' * 200]
+    packed = list(pack(bodies, limit=100))
+    assert [count for _, count in packed] == [2, 1, 1]
+    assert packed[0][0] == 'a' * 40 + COALESCE_SEPARATOR + 'b' * 40
+    # Oversized bodies are truncated to the limit rather than rejected by Twilio
+    assert len(packed[-1][0]) == 100 and packed[-1][0].endswith('…')
+    assert coalesce(bodies, limit=100) == [message for message, _ in packed]
+
+
+def test_retries_retryable_errors_then_delivers():
+    send = ScriptedSend(SendError(429), SendError(503))
+    outcomes = Outcomes()
+    dispatch = make_queue(send, max_retries=3)
+    dispatch.submit('whatsapp:+1', 'hello', outcomes.callback())
+    assert dispatch.close(timeout=5)
+
+    assert len(send.calls) == 3
+    assert send.delivered == [('whatsapp:+1', 'hello')]
+    assert (dispatch.sent, dispatch.failed, dispatch.retried) == (1, 0, 2)
+    assert outcomes.results == [True]
+
+
+def test_gives_up_after_max_retries():
+    send = ScriptedSend(*[SendError(503)] * 5)
+    outcomes = Outcomes()
+    dispatch = make_queue(send, max_retries=2)
+    dispatch.submit('whatsapp:+1', 'hello', outcomes.callback())
+    assert dispatch.close(timeout=5)
+
+    assert len(send.calls) == 3
+    assert (dispatch.sent, dispatch.failed, dispatch.retried) == (0, 1, 2)
+    assert outcomes.results == [False]
+
+
+def test_client_errors_are_not_retried():
+    send = ScriptedSend(SendError(400))
+    outcomes = Outcomes()
+    dispatch = make_queue(send, max_retries=4)
+    dispatch.submit('whatsapp:+1', 'hello', outcomes.callback())
+    assert dispatch.close(timeout=5)
+
+    assert len(send.calls) == 1
+    assert (dispatch.failed, dispatch.retried) == (1, 0)
+    assert outcomes.results == [False]
+
+
+def test_coalesces_bodies_per_recipient_and_reports_each():
+    send = ScriptedSend()
+    outcomes = Outcomes()
+    dispatch = make_queue(send, coalesce_window=0.2)
+    for body in ('one', 'two', 'three'):
+        dispatch.submit('whatsapp:+1', body, outcomes.callback())
+    dispatch.submit('whatsapp:+2', 'other', outcomes.callback())
+    assert dispatch.close(timeout=5)
+
+    messages = dict(send.delivered)
+    assert messages['whatsapp:+1'] == COALESCE_SEPARATOR.join(['one', 'two', 'three'])
+    assert messages['whatsapp:+2'] == 'other'
+    assert (dispatch.sent, dispatch.coalesced) == (2, 2)
+    assert outcomes.results == [True] * 4
+
+
+def test_failing_callback_does_not_stop_delivery():
+    send = ScriptedSend()
+    outcomes = Outcomes()
+    dispatch = make_queue(send)
+
+    def broken(delivered):
+        raise RuntimeError("callback bug")
+
+    dispatch.submit('whatsapp:+1', 'first', broken)
+    assert dispatch.flush(timeout=5)
+    dispatch.submit('whatsapp:+1', 'second', outcomes.callback())
+    assert dispatch.close(timeout=5)
+
+    assert [body for _, body in send.delivered] == ['first', 'second']
+    assert outcomes.results == [True]
+
+
+@pytest.fixture
+def twilio():
+    server = FakeTwilioServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def sender_factory(monkeypatch, twilio):
+    monkeypatch.setattr(Config, 'TWILIO_ACCOUNT_SID', 'AC' + '0' * 32)
+    monkeypatch.setattr(Config, 'TWILIO_AUTH_TOKEN', 'token')
+    monkeypatch.setattr(Config, 'TWILIO_WHATSAPP_NUMBER', 'whatsapp:+10000000000')
+    monkeypatch.setattr(Config, 'WHATSAPP_TO_NUMBER', 'whatsapp:+15550000')
+    monkeypatch.setattr(Config, 'TWILIO_API_BASE_URL', twilio.base_url)
+    monkeypatch.setattr(Config, 'WHATSAPP_WORKERS', 1)
+    monkeypatch.setattr(Config, 'WHATSAPP_RATE_PER_SECOND', 1000.0)
+    monkeypatch.setattr(Config, 'WHATSAPP_BURST', 1000.0)
+    monkeypatch.setattr(Config, 'WHATSAPP_COALESCE_SECONDS', 0.0)
+    monkeypatch.setattr(Config, 'WHATSAPP_MAX_RETRIES', 2)
+    senders = []
+
+    def build(asynchronous=True):
+        from core.whatsapp_sender import WhatsAppSender
+
+        monkeypatch.setattr(Config, 'WHATSAPP_ASYNC', asynchronous)
+        sender = WhatsAppSender()
+        if sender.dispatcher is not None:
+            sender.dispatcher.backoff_base = 0.001
+        senders.append(sender)
+        return sender
+
+    yield build
+    for sender in senders:
+        if sender.dispatcher is not None:
+            sender.dispatcher.close(timeout=5)
+
+
+def test_sender_defaults_to_configured_recipient(sender_factory, twilio):
+    sender = sender_factory()
+    outcomes = Outcomes()
+    assert sender.send_message("hello", on_done=outcomes.callback())
+    assert sender.dispatcher.flush(timeout=10)
+
+    assert [(m['to'], m['body']) for m in twilio.messages] == [('whatsapp:+15550000', 'hello')]
+    assert outcomes.results == [True]
+
+
+def test_sender_without_default_recipient(sender_factory, monkeypatch):
+    # WHATSAPP_TO_NUMBER is only a fallback; subscribers bring their own numbers
+    monkeypatch.setattr(Config, 'WHATSAPP_TO_NUMBER', '')
+    sender = sender_factory()
+    assert sender.client is not None
+
+    outcomes = Outcomes()
+    assert not sender.send_message("hello", on_done=outcomes.callback())
+    assert sender.send_message("hello", to='whatsapp:+15550001', on_done=outcomes.callback())
+    assert sender.dispatcher.flush(timeout=10)
+    assert outcomes.results == [False, True]
+
+
+def test_sender_retries_rate_limited_messages_through_fake_twilio(sender_factory, twilio):
+    sender = sender_factory()
+    twilio.fail_next(429, 500)
+
+    outcomes = Outcomes()
+    assert sender.send_message("hello", to='whatsapp:+15550001', on_done=outcomes.callback())
+    assert sender.dispatcher.flush(timeout=10)
+
+    assert [(m['to'], m['body']) for m in twilio.messages] == [('whatsapp:+15550001', 'hello')]
+    assert twilio.failures == 2
+    assert sender.dispatcher.retried == 2
+    assert outcomes.results == [True]
+
+
+def test_sender_reports_rejected_messages(sender_factory, twilio):
+    sender = sender_factory()
+    twilio.fail_next(400)
+
+    outcomes = Outcomes()
+    assert sender.send_message("hello", to='whatsapp:+15550001', on_done=outcomes.callback())
+    assert sender.dispatcher.flush(timeout=10)
+
+    assert twilio.messages == []
+    assert sender.dispatcher.failed == 1
+    assert outcomes.results == [False]
+
+
+def test_synchronous_sender_reports_outcome(sender_factory, twilio):
+    sender = sender_factory(asynchronous=False)
+    assert sender.dispatcher is None
+
+    outcomes = Outcomes()
+    assert sender.send_message("hello", to='whatsapp:+15550001', on_done=outcomes.callback())
+    twilio.fail_next(500)
+    assert not sender.send_message("again", to='whatsapp:+15550001', on_done=outcomes.callback())
+    assert outcomes.results == [True, False]
+    assert len(twilio.messages) == 1
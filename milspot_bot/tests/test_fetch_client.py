@@ -0,0 +1,213 @@
+"""
+FetchClient retries, circuit breaker and conditional requests against the fake FR24 endpoint
+"""
+
+import pytest
+
+from config import Config
+from core.fake_fr24 import POSITIONS_PATH, FakeFR24Server
+from core.http_client import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, FetchClient, FetchError,
+                              parse_retry_after)
+
+PAYLOAD = {'data': [{'fr24_id': 'abc', 'callsign': 'RCH123', 'type': 'C17', 'lat': 50.0, 'lon': 8.0}]}
+
+
+@pytest.fixture
+def fr24():
+    server = FakeFR24Server(PAYLOAD).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def sleeps():
+    return []
+
+
+@pytest.fixture
+def client_factory(sleeps):
+    clients = []
+
+    def build(**kwargs):
+        options = dict(max_retries=3, backoff_base=0.01, backoff_max=0.05, sleep=sleeps.append)
+        options.update(kwargs)
+        client = FetchClient(**options)
+        clients.append(client)
+        return client
+
+    yield build
+    for client in clients:
+        client.close()
+
+
+def url(server):
+    return server.base_url + POSITIONS_PATH
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470.0) == pytest.approx(10.0)
+
+
+def test_retries_server_errors_then_succeeds(fr24, client_factory, sleeps):
+    client = client_factory()
+    fr24.fail_next(503, 502)
+
+    response = client.get(url(fr24), params={'bounds': 'x'})
+    assert response.status == 200
+    assert response.attempts == 3
+    assert len(sleeps) == 2 and all(0 <= delay <= 0.05 for delay in sleeps)
+    assert client.breaker.state == CLOSED
+
+
+def test_honours_retry_after_up_to_the_cap(fr24, client_factory, sleeps):
+    client = client_factory(retry_after_max=5.0)
+    fr24.fail_next((429, 2), (429, 600))
+
+    assert client.get(url(fr24)).status == 200
+    assert sleeps[0] >= 2.0
+    assert sleeps[1] == 5.0
+
+
+def test_gives_up_after_max_retries(fr24, client_factory, sleeps):
+    client = client_factory(max_retries=2)
+    fr24.fail_next(503, 503, 503)
+
+    with pytest.raises(FetchError) as raised:
+        client.get(url(fr24))
+    assert raised.value.status == 503
+    assert len(fr24.requests) == 3 and len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(fr24, client_factory, sleeps):
+    client = client_factory()
+    fr24.fail_next(401)
+
+    with pytest.raises(FetchError) as raised:
+        client.get(url(fr24))
+    assert raised.value.status == 401
+    assert len(fr24.requests) == 1 and sleeps == []
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_probe(fr24, client_factory, clock):
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30.0, clock=clock)
+    client = client_factory(max_retries=0, breaker=breaker)
+    fr24.fail_next(503, 503)
+
+    for _ in range(2):
+        with pytest.raises(FetchError):
+            client.get(url(fr24))
+    assert breaker.state == OPEN
+
+    # Open: rejected without a request going out
+    with pytest.raises(CircuitOpenError):
+        client.get(url(fr24))
+    assert len(fr24.requests) == 2
+
+    clock.advance(30.0)
+    assert breaker.state == HALF_OPEN
+    assert client.get(url(fr24)).status == 200
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_breaker_reopens_when_the_probe_fails(fr24, client_factory, clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=30.0, clock=clock)
+    client = client_factory(max_retries=0, breaker=breaker)
+    fr24.fail_next(503, 503)
+
+    with pytest.raises(FetchError):
+        client.get(url(fr24))
+    clock.advance(30.0)
+    with pytest.raises(FetchError):
+        client.get(url(fr24))
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        client.get(url(fr24))
+    assert len(fr24.requests) == 2
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.advance(10.0)
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+
+def test_not_modified_reuses_the_cached_body(fr24, client_factory):
+    client = client_factory()
+    first = client.get(url(fr24), params={'bounds': 'x'})
+    second = client.get(url(fr24), params={'bounds': 'x'})
+
+    assert first.status == 200 and first.revalidatable
+    assert second.not_modified and second.content == first.content
+    assert fr24.not_modified == 1
+    assert fr24.requests[1]['headers'].get('If-None-Match') == fr24.etag
+
+    # Validators are per URL and parameters
+    assert not client.get(url(fr24), params={'bounds': 'y'}).not_modified
+
+    fr24.set_payload({'data': []})
+    third = client.get(url(fr24), params={'bounds': 'x'})
+    assert third.status == 200 and third.content != first.content
+
+
+def test_unconditional_client_sends_no_validators(fr24, client_factory):
+    client = client_factory(conditional=False)
+    client.get(url(fr24))
+    response = client.get(url(fr24))
+
+    assert response.status == 200 and not response.revalidatable
+    assert 'If-None-Match' not in fr24.requests[1]['headers']
+    assert fr24.not_modified == 0
+
+
+@pytest.fixture
+def scanner_factory(monkeypatch, scratch_config, fr24):
+    monkeypatch.setattr(Config, 'FR24_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'FR24_API_BASE_URL', fr24.base_url)
+    monkeypatch.setattr(Config, 'FR24_BACKOFF_BASE', 0.01)
+    scanners = []
+
+    def build(conditional=True):
+        from core.scanner import FlightScanner
+
+        monkeypatch.setattr(Config, 'FR24_CONDITIONAL_REQUESTS', conditional)
+        scanner = FlightScanner()
+        scanners.append(scanner)
+        return scanner
+
+    yield build
+    for scanner in scanners:
+        scanner.client.close()
+        if scanner.metadata is not None:
+            scanner.metadata.close()
+
+
+def test_scanner_reuses_decoded_payload_on_not_modified(scanner_factory, fr24):
+    scanner = scanner_factory()
+    first = scanner.fetch_flightradar24_api_payload('1,0,0,1')
+    second = scanner.fetch_flightradar24_api_payload('1,0,0,1')
+
+    assert first == PAYLOAD
+    assert second is first
+    assert fr24.not_modified == 1
+
+
+def test_scanner_keeps_no_payload_without_validators(scanner_factory, fr24):
+    scanner = scanner_factory(conditional=False)
+    assert scanner.fetch_flightradar24_api_payload('1,0,0,1') == PAYLOAD
+    assert scanner._payloads == {}
+
+
+def test_scanner_drops_payload_once_validators_are_gone(scanner_factory, fr24):
+    scanner = scanner_factory(conditional=False)
+    scanner._payloads['1,0,0,1'] = {'data': []}
+    assert scanner.fetch_flightradar24_api_payload('1,0,0,1') == PAYLOAD
+    assert scanner._payloads == {}
@@ -0,0 +1,74 @@
+"""
+Snapshot recording: one snapshot per scan, whatever the fetch strategy
+"""
+
+import glob
+import gzip
+import json
+import threading
+
+import pytest
+
+from config import Config
+from core.fake_fr24 import FakeFR24Server
+from core.replay import SNAPSHOT_PREFIX, SnapshotRecorder, snapshot_time
+
+PAYLOAD = {'data': [
+    {'fr24_id': 'a1', 'callsign': 'RCH123', 'type': 'C17', 'lat': 10.0, 'lon': 10.0},
+    {'fr24_id': 'b2', 'callsign': 'BAW1', 'type': 'A320', 'lat': -10.0, 'lon': -10.0},
+    {'fr24_id': '', 'reg': 'g-abcd', 'callsign': 'GABCD', 'type': 'PA28', 'lat': 5.0, 'lon': 5.0},
+]}
+
+
+def snapshots(directory):
+    return sorted(glob.glob(str(directory / f"{SNAPSHOT_PREFIX}*")))
+
+
+def test_recorder_numbers_concurrent_snapshots_uniquely(tmp_path):
+    recorder = SnapshotRecorder(str(tmp_path))
+    threads = [threading.Thread(target=lambda: [recorder.record(b'{}', fetched_at=1700000000.0) for _ in range(50)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    recorder.close()
+
+    paths = snapshots(tmp_path)
+    assert len(paths) == recorder.recorded == 400
+    assert {snapshot_time(path) for path in paths} == {1700000000.0}
+
+
+@pytest.fixture
+def fr24():
+    server = FakeFR24Server(PAYLOAD).start()
+    yield server
+    server.stop()
+
+
+def test_tiled_fetch_records_one_merged_snapshot_per_cycle(monkeypatch, scratch_config, tmp_path, fr24):
+    from core.scanner import FlightScanner
+
+    monkeypatch.setattr(Config, 'FR24_API_KEY', 'test')
+    monkeypatch.setattr(Config, 'FR24_API_BASE_URL', fr24.base_url)
+    monkeypatch.setattr(Config, 'TILE_ROWS', 2)
+    monkeypatch.setattr(Config, 'TILE_COLS', 2)
+    directory = tmp_path / 'snapshots'
+    scanner = FlightScanner()
+    scanner.recorder = SnapshotRecorder(str(directory))
+    try:
+        # The fake serves every tile the same aircraft, as neighbouring tiles report edge traffic
+        for _ in range(2):
+            flights = scanner.get_tiled_api_data()
+            assert len(flights) == 3
+    finally:
+        scanner.recorder.close()
+        scanner.client.close()
+        scanner.metadata.close()
+
+    assert len(fr24.requests) == 8
+    paths = snapshots(directory)
+    assert len(paths) == 2
+    for path in paths:
+        with gzip.open(path, 'rb') as f:
+            assert json.loads(f.read()) == PAYLOAD
@@ -0,0 +1,123 @@
+"""
+Rules hot reload: poll() swaps in a changed file once it has compiled in the background
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from config import Config
+from core.flight_record import FlightRecord
+from core.rules import RuleEngine, RuleSet
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / 'military_rules.json'
+    shutil.copy(Config.RULES_FILE, path)
+    return path
+
+
+def rewrite(path, text, stamp):
+    """Replace the rules file and give it a distinct modification time"""
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (stamp, stamp))
+
+
+def with_type(path, aircraft_code):
+    document = json.loads(path.read_text(encoding='utf-8'))
+    document['aircraft_types'].append(aircraft_code)
+    return json.dumps(document)
+
+
+def poll_until_swapped(engine):
+    wait_for(engine.poll)
+
+
+UNKNOWN = FlightRecord('x', callsign='ZZZ123', aircraft_code='QQ77', registration='N1QQ')
+
+
+def test_changed_file_is_swapped_in_by_poll(rules_path):
+    engine = RuleEngine(str(rules_path))
+    first = engine.current
+    assert not engine.poll()
+    assert not first.classifier.is_military_flight(UNKNOWN)
+
+    rewrite(rules_path, with_type(rules_path, 'QQ77'), engine.mtime + 10)
+    poll_until_swapped(engine)
+
+    assert engine.version == 2
+    assert engine.current is not first
+    assert engine.current.classifier.is_military_flight(UNKNOWN)
+    # Nothing more to do until the file changes again
+    assert not engine.poll()
+
+
+def test_malformed_file_keeps_the_last_good_rules(rules_path):
+    engine = RuleEngine(str(rules_path))
+    good = engine.current
+    stamp = engine.mtime + 10
+
+    rewrite(rules_path, '{"weights": ', stamp)
+    assert not engine.poll()
+    wait_for(lambda: not engine._compiling)
+    assert not engine.poll()
+    assert engine.current is good and engine.version == 1
+    # The broken version is not recompiled on every poll
+    assert engine.mtime == os.stat(rules_path).st_mtime and not engine._compiling
+
+    # A missing section is rejected the same way
+    rewrite(rules_path, json.dumps({'weights': {}}), stamp + 10)
+    engine.poll()
+    wait_for(lambda: not engine._compiling)
+    assert not engine.poll() and engine.current is good
+
+    shutil.copy(Config.RULES_FILE, rules_path)
+    rewrite(rules_path, with_type(rules_path, 'QQ77'), stamp + 20)
+    poll_until_swapped(engine)
+    assert engine.version == 2 and engine.current.classifier.is_military_flight(UNKNOWN)
+
+
+def test_no_swap_or_second_compile_while_one_is_pending(rules_path, monkeypatch):
+    engine = RuleEngine(str(rules_path))
+    first = engine.current
+    release = threading.Event()
+    loads = []
+    load = RuleSet.from_file
+
+    def slow_load(path, cache_size=4096):
+        loads.append(path)
+        release.wait(5)
+        return load(path, cache_size)
+
+    monkeypatch.setattr(RuleSet, 'from_file', staticmethod(slow_load))
+    stamp = engine.mtime + 10
+    rewrite(rules_path, with_type(rules_path, 'QQ77'), stamp)
+    assert not engine.poll()
+    wait_for(lambda: loads)
+
+    # The file changes again mid-compile: no second thread, and the old rules stay in place
+    rewrite(rules_path, with_type(rules_path, 'QQ88'), stamp + 10)
+    for _ in range(3):
+        assert not engine.poll()
+    assert len(loads) == 1 and engine.current is first
+
+    release.set()
+    poll_until_swapped(engine)
+    assert engine.current is not first
+    # The newer file is compiled once the first compile is done and installed by a later poll
+    # (or by the same one, when it finished first and superseded the older result)
+    wait_for(lambda: engine.poll() or engine.mtime == os.stat(rules_path).st_mtime)
+    assert len(loads) == 2
+    assert engine.current.classifier.is_military_flight(FlightRecord('y', aircraft_code='QQ88'))
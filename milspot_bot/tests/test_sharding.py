@@ -0,0 +1,103 @@
+"""
+Sharded classification must return the serial columnar path's military rows and leave no shared memory behind
+"""
+
+import json
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import TrafficGenerator
+from core.aircraft_db import AircraftMetadataCache, AircraftRecord
+from core.columnar import FlightBatch
+from core.rules import get_rule_engine
+from core.sharding import ShardedClassifier, split_array
+
+FIELDS = ('id', 'callsign', 'aircraft_code', 'registration', 'hex', 'squawk', 'painted_as', 'operating_as',
+          'latitude', 'longitude', 'heading', 'altitude', 'ground_speed')
+
+
+@pytest.fixture
+def payload():
+    payload = TrafficGenerator(seed=11).payload(3000)
+    # Military only according to the metadata database
+    payload['data'].append({'fr24_id': 'meta-only', 'hex': 'ABC123', 'callsign': 'XYZ1', 'type': 'GLF5',
+                            'reg': 'N1', 'lat': 50.0, 'lon': 20.0, 'alt': 10000, 'gspeed': 200, 'squawk': '',
+                            'painted_as': '', 'operating_as': ''})
+    return payload
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    cache = AircraftMetadataCache(str(tmp_path / 'aircraft_metadata.sqlite3'))
+    cache.store(AircraftRecord('ABC123', 'N1', 'GLF5', '', '', 'US AIR FORCE', True))
+    cache.flush()
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return get_rule_engine()
+
+
+def serial_military(payload, engine, metadata):
+    batch = FlightBatch.from_api_payload(payload)
+    mask = batch.military_mask(engine.current.classifier) | batch.hex.map_vocabulary(metadata.known_military)
+    return batch, mask
+
+
+def rows(batch):
+    return [{field: getattr(record, field) for field in FIELDS} for record in batch.to_records()]
+
+
+def shared_memory_exists(name):
+    try:
+        block = SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    return True
+
+
+def test_split_array_covers_every_element(payload):
+    body = json.dumps(payload).encode('utf-8')
+    ranges = split_array(body, 4)
+    assert len(ranges) == 4
+    decoded = [row for start, end in ranges for row in json.loads(b'[' + body[start:end] + b']')]
+    assert decoded == payload['data']
+    assert split_array(b'[1, 2]', 4) is None
+
+
+def test_sharded_classification_matches_serial(payload, engine, metadata):
+    body = json.dumps(payload).encode('utf-8')
+    expected_batch, expected_mask = serial_military(payload, engine, metadata)
+    shards = ShardedClassifier(3, engine, metadata=metadata, min_bytes=0)
+    try:
+        result = shards.classify(body)
+        assert result is not None and shards.sharded == 1
+        assert result.total == len(payload['data'])
+        assert 'meta-only' in [result.batch.ids[i] for i in range(len(result.batch))]
+        assert rows(result.batch) == rows(expected_batch.filter(expected_mask).compact())
+
+        kept = shards.classify(body, keep_all=True)
+        assert len(kept.batch) == len(payload['data'])
+        assert np.array_equal(kept.mask, expected_mask)
+    finally:
+        shards.close()
+
+
+def test_shared_memory_is_released(payload, engine, metadata):
+    shards = ShardedClassifier(2, engine, metadata=metadata, min_bytes=0, military_refresh=0)
+    try:
+        assert shards.classify(json.dumps(payload).encode('utf-8')) is not None
+        old_military = shards._military.name
+        # A refreshed military list replaces its block and unlinks the old one
+        assert shards.classify(json.dumps(payload).encode('utf-8')) is not None
+        assert not shared_memory_exists(old_military)
+        names = [shards._body.name, shards._military.name]
+        assert all(shared_memory_exists(name) for name in names)
+    finally:
+        shards.close()
+    assert not any(shared_memory_exists(name) for name in names)
@@ -0,0 +1,48 @@
+"""
+Routing scored flights to subscribers by region, category, callsign and score
+"""
+
+from core.flight_analyzer import FlightAnalyzer
+from core.flight_record import FlightRecord
+from core.subscriptions import Subscriber, SubscriptionRegistry
+
+
+def tanker(flight_id, lat, lon, callsign='QID01'):
+    return FlightRecord(flight_id, callsign=callsign, aircraft_code='KC135', latitude=lat, longitude=lon)
+
+
+def test_overlapping_regions_reach_every_region_subscriber():
+    analyzer = FlightAnalyzer()
+    # Inside both the eastern_europe and the black_sea boxes; eastern_europe is listed first
+    assert analyzer.region_of(47.0, 27.0) == 'eastern_europe'
+    assert analyzer.regions_of(47.0, 27.0) == ['eastern_europe', 'black_sea']
+
+    registry = SubscriptionRegistry([
+        Subscriber('east', 'whatsapp:+1', regions=['eastern_europe']),
+        Subscriber('black', 'whatsapp:+2', regions=['black_sea']),
+        Subscriber('baltic', 'whatsapp:+3', regions=['baltic_sea']),
+    ])
+    routed = registry.route([(tanker('a', 47.0, 27.0), 20)], analyzer)
+
+    assert [(flight.id, [s.name for s in recipients]) for flight, _, recipients in routed] == [('a', ['east', 'black'])]
+
+
+def test_route_filters_and_caps_per_subscriber():
+    analyzer = FlightAnalyzer()
+    registry = SubscriptionRegistry([
+        Subscriber('black', 'whatsapp:+1', regions=['black_sea'], categories=['tanker'], min_score=15, top_k=1),
+        Subscriber('qid', 'whatsapp:+2', callsigns=['QID'], top_k=2),
+        Subscriber('fighters', 'whatsapp:+3', categories=['fighter']),
+    ])
+    ranked = [
+        (tanker('a', 42.0, 35.0), 22),
+        (tanker('b', 43.0, 36.0, callsign='LAGR1'), 18),
+        (tanker('c', 10.0, 10.0), 12),
+        (tanker('d', 44.0, 37.0), 10),
+    ]
+    routed = registry.route(ranked, analyzer)
+
+    assert [(flight.id, [s.name for s in recipients]) for flight, _, recipients in routed] == [
+        ('a', ['black', 'qid']),
+        ('c', ['qid']),
+    ]